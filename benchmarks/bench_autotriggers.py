@@ -0,0 +1,106 @@
+"""
+Benchmark auto trigger matching against the naive per-trigger scan.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_autotriggers [--triggers 2000] [--messages 500] [--hit-rate 0.2]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from core.triggers import TriggerMatcher
+
+TOPICS = (
+    "appeal ban unban mute report bug crash payment refund order account password login verify role "
+    "staff server invite partner application apply ticket nitro boost giveaway event tournament scam "
+    "hacked spam raid bot error billing premium subscription warning kick timeout channel"
+).split()
+ACTIONS = "request status issue problem help question info update form reset delay missing".split()
+FILLER = (
+    "hi hello hey i my me you your the a an to is it and was have has been can could would please "
+    "thanks thank just still not yet since yesterday today why what when how know need want got "
+    "about after before with without this that there here some any sorry again really"
+).split()
+
+
+def make_keywords(rng: random.Random, count: int):
+    """Trigger phrases such as "refund status" or "ban appeal form"."""
+    keywords = set()
+    while len(keywords) < count:
+        words = [rng.choice(TOPICS), rng.choice(ACTIONS)]
+        if rng.random() < 0.5:
+            words.append(rng.choice(TOPICS + ACTIONS))
+        keywords.add(" ".join(words))
+    return list(keywords)
+
+
+def make_patterns(rng: random.Random, keywords):
+    patterns = []
+    for i, keyword in enumerate(keywords):
+        escaped = re.escape(keyword)
+        if i % 4 == 0:
+            patterns.append(rf"\b{escaped}\b")
+        elif i % 4 == 1:
+            patterns.append(escaped.replace(r"\ ", r"\s+"))
+        elif i % 4 == 2:
+            patterns.append(rf"{escaped}\s*#?\d+")
+        else:
+            patterns.append(rf"{escaped}s?")
+    return patterns
+
+
+def make_messages(rng: random.Random, count: int, keywords, hit_rate: float = 0.2):
+    """Opening messages of a thread, a fraction of them mentioning a trigger phrase."""
+    messages = []
+    for _ in range(count):
+        words = rng.choices(FILLER * 3 + TOPICS + ACTIONS, k=rng.randint(8, 120))
+        if rng.random() < hit_rate:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords) + f" #{rng.randint(1, 9999)}")
+        messages.append(" ".join(words).capitalize() + rng.choice([".", "?", "!"]))
+    return messages
+
+
+def naive_keyword(triggers, text):
+    return next(filter(lambda x: x.lower() in text.lower(), triggers), None)
+
+
+def naive_regex(triggers, text):
+    return next(filter(lambda x: re.search(x, text), triggers), None)
+
+
+def bench(name, func, messages):
+    start = time.perf_counter()
+    hits = sum(func(m) is not None for m in messages)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed * 1000:9.1f} ms  {elapsed / len(messages) * 1e6:9.1f} us/msg  {hits} hits")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--triggers", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--hit-rate", type=float, default=0.2, help="share of messages with a trigger")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keywords = make_keywords(rng, args.triggers)
+    patterns = make_patterns(rng, keywords)
+    messages = make_messages(rng, args.messages, keywords, args.hit_rate)
+    print(f"{len(keywords)} triggers, {len(messages)} messages\n")
+
+    for mode, triggers, naive in (("keyword", keywords, naive_keyword), ("regex", patterns, naive_regex)):
+        start = time.perf_counter()
+        matcher = TriggerMatcher(triggers, regex=mode == "regex")
+        print(f"[{mode}] compiled in {(time.perf_counter() - start) * 1000:.1f} ms")
+        before = bench(f"{mode}: per-trigger scan", lambda m: naive(triggers, m), messages)
+        after = bench(f"{mode}: TriggerMatcher", matcher.match, messages)
+        print(f"{'speedup':<28} {before / after:9.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
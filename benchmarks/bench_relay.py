@@ -0,0 +1,224 @@
+"""
+Benchmark the message relay path against a fake guild, without network access.
+
+Drives ConfigManager.get, ThreadManager.find, ModmailBot.get_contexts, the auto
+trigger match of new threads, Thread.send, Thread.reply and
+ModmailBot.process_dm_modmail for every combination of the given guild sizes,
+alias, snippet and trigger counts and thread recipient counts. Discord and
+MongoDB are replaced by the in-memory stand-ins of `benchmarks.fakes`.
+
+For each stage it reports the throughput, then, in a second pass under
+tracemalloc, the peak memory allocated by one operation and the number of
+memory blocks still allocated after it. The latter stays near zero unless
+something leaks or a cache has no bound, bounded caches that have not filled
+up yet (e.g. in stages timed for a few hundred operations only) add to it too.
+Messages stored by the fake database are not counted.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_relay [--channels 10 100 1000 10000] [--aliases 100] [--snippets 100]
+        [--triggers 100] [--recipients 1 5] [--min-time 1.0]
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import random
+import time
+import tracemalloc
+
+from benchmarks.bench_autotriggers import make_keywords, make_messages
+from benchmarks.fakes import OfflineModmail
+
+# Configurations read while relaying a DM, with each kind of conversion.
+CONFIG_KEYS = (
+    "guild_id",
+    "main_category_id",
+    "dm_disabled",
+    "show_timestamp",
+    "mod_tag",
+    "anon_username",
+    "subscriptions",
+    "notification_squad",
+    "mod_color",
+    "recipient_color",
+    "thread_auto_close",
+    "account_age",
+    "guild_age",
+    "blocked",
+    "blocked_roles",
+    "sent_emoji",
+    "snooze_behavior",
+)
+
+
+def cycle(items):
+    """Call the returned function for the next item, round robin."""
+    return itertools.cycle(items).__next__
+
+
+async def run(op, count: int) -> None:
+    """Run `op` `count` times, letting the tasks each run schedules finish too."""
+    baseline = asyncio.all_tasks()
+    for _ in range(count):
+        await op()
+        pending = asyncio.all_tasks() - baseline
+        if pending:
+            await asyncio.wait(pending, timeout=5)
+
+
+async def measure(name: str, op, env: OfflineModmail, min_time: float):
+    await run(op, 10)  # warm up caches
+
+    count, elapsed = 0, 0.0
+    batch = 10
+    while elapsed < min_time:
+        start = time.perf_counter()
+        await run(op, batch)
+        elapsed += time.perf_counter() - start
+        count += batch
+        batch = min(batch * 2, 1000)
+
+    # allocations are measured separately, tracemalloc slows everything down
+    samples = min(count, 200)
+    env.db.truncate()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    peak = 0
+    for _ in range(samples):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        await run(op, 1)
+        peak += tracemalloc.get_traced_memory()[1] - current
+    env.db.truncate()
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    growth = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "filename")
+    kept = sum(stat.count_diff for stat in growth)
+
+    print(
+        f"  {name:<30} {count / elapsed:10.0f} ops/s {elapsed / count * 1e6:9.1f} us/op"
+        f" {peak / samples / 1024:9.1f} KiB peak {kept / samples:8.1f} blocks kept"
+    )
+
+
+async def bench(
+    args, rng: random.Random, channels: int, aliases: int, snippets: int, triggers: int, recipients: int
+):
+    keywords = make_keywords(rng, triggers)
+    env = await OfflineModmail.create(
+        channels,
+        aliases={f"alias{i}": "reply Thanks, we are looking into it." for i in range(aliases)},
+        snippets={f"snippet{i}": f"Canned response number {i}." for i in range(snippets)},
+        auto_triggers={keyword: "reply Thanks for reaching out." for keyword in keywords},
+    )
+    bot = env.bot
+    print(
+        f"{channels} channels, {len(bot.threads)} threads, {aliases} aliases, {snippets} snippets, "
+        f"{triggers} triggers, {recipients} recipients"
+    )
+
+    threads = list(bot.threads)
+    thread = threads[0]
+    await env.add_recipients(thread, recipients - 1)
+    recipient, channel, moderator = thread.recipient, thread.channel, env.moderator
+
+    next_key = cycle(CONFIG_KEYS)
+
+    async def config_get():
+        bot.config.get(next_key())
+
+    await measure("ConfigManager.get", config_get, env, args.min_time)
+
+    next_recipient = cycle([t.recipient for t in threads])
+
+    async def find_cached():
+        await bot.threads.find(recipient=next_recipient())
+
+    await measure("ThreadManager.find (cached)", find_cached, env, args.min_time)
+
+    async def find_missing():
+        await bot.threads.find(recipient_id=1)
+
+    await measure("ThreadManager.find (no thread)", find_missing, env, args.min_time)
+
+    next_channel = cycle([t.channel for t in threads])
+
+    async def find_channel():
+        await bot.threads.find(channel=next_channel())
+
+    await measure("ThreadManager.find (channel)", find_channel, env, args.min_time)
+
+    for kind, content in (
+        ("text", "Let me check with the team."),
+        ("command", "?reply Let me check with the team."),
+        ("alias", f"?alias{aliases - 1}" if aliases else None),
+        ("snippet", f"?snippet{snippets - 1}" if snippets else None),
+    ):
+        if content is None:
+            continue
+        next_message = cycle([env.channel_message(channel, moderator, content) for _ in range(16)])
+
+        async def get_contexts():
+            await bot.get_contexts(next_message())
+
+        await measure(f"get_contexts ({kind})", get_contexts, env, args.min_time)
+
+    next_opening = cycle(make_messages(rng, 256, keywords or ["help"]))
+
+    async def match_trigger():
+        bot.match_auto_trigger(next_opening())
+
+    await measure("match_auto_trigger", match_trigger, env, args.min_time)
+
+    next_dm = cycle([env.dm(recipient, "Hi, any update on my ticket?") for _ in range(16)])
+
+    async def send():
+        await thread.send(next_dm())
+
+    await measure("Thread.send", send, env, args.min_time)
+
+    next_reply = cycle([env.channel_message(channel, moderator, "We are on it.") for _ in range(16)])
+
+    async def reply():
+        await thread.reply(next_reply(), "We are on it.")
+
+    await measure("Thread.reply", reply, env, args.min_time)
+
+    async def process_dm():
+        await bot.process_dm_modmail(next_dm())
+
+    await measure("process_dm_modmail", process_dm, env, args.min_time)
+
+    requests = sum(env.http.requests.values())
+    print(f"  {requests} Discord requests answered offline\n")
+    await env.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--channels", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--aliases", type=int, nargs="+", default=[100])
+    parser.add_argument("--snippets", type=int, nargs="+", default=[100])
+    parser.add_argument("--triggers", type=int, nargs="+", default=[100])
+    parser.add_argument("--recipients", type=int, nargs="+", default=[1, 5], help="recipients per thread")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds each stage is timed for")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if min(args.channels) < 2 or min(args.recipients) < 1:
+        parser.error("a guild needs at least 2 channels for a thread, and a thread at least 1 recipient")
+
+    async def run_all():
+        grid = itertools.product(args.channels, args.aliases, args.snippets, args.triggers, args.recipients)
+        for params in grid:
+            await bench(args, random.Random(args.seed), *params)
+
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+"""
+Offline stand-ins for Discord and MongoDB, to run the bot's relay path in benchmarks.
+
+Guilds, channels, members and messages are discord.py's own models built from
+synthetic gateway payloads, so their code runs unchanged. Only the transports
+are replaced: the HTTP client answers the REST calls of the relay path from
+memory, and the database is a list of dicts behind the real `MongoDBClient`
+methods. Any other request raises instead of reaching the network.
+"""
+
+import asyncio
+import itertools
+import os
+import secrets
+import typing
+from collections import Counter
+
+# Keep the bot's own logging out of the measurements, LOG_LEVEL can still override it.
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import discord  # noqa: E402
+from discord.http import HTTPClient, Route  # noqa: E402
+
+from bot import ModmailBot  # noqa: E402
+from core.clients import ApiClient, InstrumentedApiClient, MongoDBClient  # noqa: E402
+from core.thread import Thread  # noqa: E402
+
+_snowflakes = itertools.count(discord.utils.time_snowflake(discord.utils.utcnow()))
+
+
+def snowflake() -> int:
+    return next(_snowflakes)
+
+
+def _timestamp() -> str:
+    return discord.utils.utcnow().isoformat()
+
+
+def user_payload(user_id: int, name: str, *, bot: bool = False) -> dict:
+    return {
+        "id": str(user_id),
+        "username": name,
+        "discriminator": "0",
+        "global_name": None,
+        "avatar": None,
+        "bot": bot,
+    }
+
+
+def member_payload(user: dict, roles: typing.Sequence[int] = ()) -> dict:
+    return {
+        "user": user,
+        "roles": [str(role) for role in roles],
+        "joined_at": "2020-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def role_payload(role_id: int, name: str, position: int, *, hoist: bool = False) -> dict:
+    return {
+        "id": str(role_id),
+        "name": name,
+        "permissions": "0",
+        "position": position,
+        "color": 0,
+        "hoist": hoist,
+        "managed": False,
+        "mentionable": False,
+    }
+
+
+def channel_payload(
+    channel_id: int,
+    guild_id: int,
+    name: str,
+    *,
+    type_: int = 0,
+    parent_id: typing.Optional[int] = None,
+    topic: typing.Optional[str] = None,
+    position: int = 0,
+) -> dict:
+    return {
+        "id": str(channel_id),
+        "type": type_,
+        "guild_id": str(guild_id),
+        "name": name,
+        "position": position,
+        "parent_id": str(parent_id) if parent_id is not None else None,
+        "topic": topic,
+        "nsfw": False,
+        "permission_overwrites": [],
+        "rate_limit_per_user": 0,
+        "last_message_id": None,
+    }
+
+
+def message_payload(
+    channel_id: int,
+    author: dict,
+    content: str = "",
+    *,
+    embeds: typing.Sequence[dict] = (),
+    guild_id: typing.Optional[int] = None,
+    member: typing.Optional[dict] = None,
+) -> dict:
+    data = {
+        "id": str(snowflake()),
+        "channel_id": str(channel_id),
+        "type": 0,
+        "content": content,
+        "author": author,
+        "attachments": [],
+        "embeds": list(embeds),
+        "mentions": [],
+        "mention_roles": [],
+        "mention_everyone": False,
+        "pinned": False,
+        "tts": False,
+        "timestamp": _timestamp(),
+        "edited_timestamp": None,
+        "flags": 0,
+        "components": [],
+    }
+    if guild_id is not None:
+        data["guild_id"] = str(guild_id)
+    if member is not None:
+        data["member"] = {k: v for k, v in member.items() if k != "user"}
+    return data
+
+
+class OfflineHTTPClient(HTTPClient):
+    """
+    An HTTP client that answers the REST calls of the relay path from memory.
+
+    Requests are counted per route in `requests`. Routes without a handler raise
+    `RuntimeError`, so a benchmark never reaches Discord by accident.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, bot_user: dict):
+        super().__init__(loop)
+        self.bot_user = bot_user
+        self.users: typing.Dict[int, dict] = {}
+        self.requests: typing.Counter[str] = Counter()
+        self.guild: typing.Optional[discord.Guild] = None
+
+    async def request(self, route: Route, *, files=None, form=None, **kwargs) -> typing.Any:
+        key = f"{route.method} {route.path}"
+        self.requests[key] += 1
+        handler = self.ROUTES.get(key)
+        if handler is None:
+            raise RuntimeError(f"{key} is not available offline.")
+        return handler(self, route, kwargs.get("json") or {})
+
+    def _send_message(self, route: Route, payload: dict) -> dict:
+        return message_payload(
+            route.channel_id,
+            self.bot_user,
+            payload.get("content") or "",
+            embeds=payload.get("embeds") or (),
+        )
+
+    def _start_private_message(self, route: Route, payload: dict) -> dict:
+        user_id = int(payload["recipient_id"])
+        return {
+            "id": str(snowflake()),
+            "type": 1,
+            "recipients": [self.users[user_id]],
+            "last_message_id": None,
+        }
+
+    def _no_content(self, route: Route, payload: dict) -> None:
+        return None
+
+    def _delete_channel(self, route: Route, payload: dict) -> None:
+        # what the CHANNEL_DELETE gateway event would do
+        channel = self.guild and self.guild.get_channel(int(route.channel_id))
+        if channel is not None:
+            self.guild._remove_channel(channel)
+
+    ROUTES = {
+        "POST /channels/{channel_id}/messages": _send_message,
+        "POST /channels/{channel_id}/typing": _no_content,
+        "DELETE /channels/{channel_id}": _delete_channel,
+        "DELETE /channels/{channel_id}/messages/{message_id}": _no_content,
+        "PUT /channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me": _no_content,
+        "POST /users/@me/channels": _start_private_message,
+    }
+
+
+def _get_path(document: dict, path: str) -> typing.Any:
+    for part in path.split("."):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(part)
+    return document
+
+
+def _set_path(document: dict, path: str, value: typing.Any) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[last] = value
+
+
+class MemoryCollection:
+    """
+    A MongoDB collection kept in a list.
+
+    Queries match on equality of (dotted) fields, updates support ``$set``,
+    ``$unset`` and ``$push``. That covers the calls of the relay path, query
+    operators are not supported.
+    """
+
+    def __init__(self):
+        self.documents: typing.List[dict] = []
+
+    def _matches(self, document: dict, query: dict) -> bool:
+        return all(_get_path(document, key) == value for key, value in query.items())
+
+    def _find(self, query: dict) -> typing.Optional[dict]:
+        return next((d for d in self.documents if self._matches(d, query)), None)
+
+    def _update(self, query: dict, update: dict, upsert: bool) -> typing.Optional[dict]:
+        document = self._find(query)
+        if document is None:
+            if not upsert:
+                return None
+            document = dict(query)
+            self.documents.append(document)
+        for path, value in update.get("$set", {}).items():
+            _set_path(document, path, value)
+        for path in update.get("$unset", {}):
+            document.pop(path, None)
+        for path, value in update.get("$push", {}).items():
+            array = _get_path(document, path)
+            if array is None:
+                _set_path(document, path, [value])
+            else:
+                array.append(value)
+        return document
+
+    async def insert_one(self, document: dict) -> None:
+        self.documents.append(document)
+
+    async def find_one(self, query: dict, *args, **kwargs) -> typing.Optional[dict]:
+        return self._find(query)
+
+    async def find_one_and_update(self, query: dict, update: dict, *, upsert: bool = False, **kwargs):
+        return self._update(query, update, upsert)
+
+    async def update_one(self, query: dict, update: dict, *, upsert: bool = False) -> None:
+        self._update(query, update, upsert)
+
+
+class MemoryDatabase:
+    """The collections of the Modmail database, created on first use."""
+
+    def __init__(self):
+        self.collections: typing.Dict[str, MemoryCollection] = {}
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.collections.setdefault(name, MemoryCollection())
+
+    def truncate(self) -> None:
+        """Drop the messages appended to the logs, e.g. so they do not count as retained memory."""
+        for document in self.logs.documents:
+            document["messages"] = []
+
+
+class MemoryApiClient(MongoDBClient):
+    """The MongoDB client running its queries against a `MemoryDatabase`."""
+
+    def __init__(self, bot):
+        ApiClient.__init__(self, bot, MemoryDatabase())
+
+
+class OfflineModmail:
+    """
+    A Modmail bot serving a fake guild, without a gateway, Discord or a database.
+
+    Use `create` to build one. The guild has `channels` text channels, half of
+    them thread channels in the Modmail category, and a member for every
+    recipient and the moderator.
+
+    Parameters
+    ----------
+    bot : ModmailBot
+        The bot, set up by `create`.
+    guild : discord.Guild
+        The guild the bot serves and creates threads in.
+    """
+
+    def __init__(self, bot: ModmailBot, guild: discord.Guild):
+        self.bot = bot
+        self.guild = guild
+        self.moderator: typing.Optional[discord.Member] = None
+        self.thread_channels: typing.List[discord.TextChannel] = []
+
+    @property
+    def http(self) -> OfflineHTTPClient:
+        return self.bot.http
+
+    @property
+    def db(self) -> MemoryDatabase:
+        return self.bot.api.client.db
+
+    @classmethod
+    async def create(
+        cls,
+        channels: int,
+        *,
+        aliases: typing.Optional[typing.Dict[str, str]] = None,
+        snippets: typing.Optional[typing.Dict[str, str]] = None,
+        auto_triggers: typing.Optional[typing.Dict[str, str]] = None,
+        extensions: typing.Sequence[str] = ("cogs.modmail",),
+    ) -> "OfflineModmail":
+        """Build the guild and a bot serving it. Must be called in the event loop the bot runs in."""
+        bot = ModmailBot()
+        await bot._async_setup_hook()
+        state = bot._connection
+
+        bot_user = user_payload(snowflake(), "Modmail", bot=True)
+        bot.http = state.http = OfflineHTTPClient(bot.loop, bot_user)
+        state.user = discord.ClientUser(state=state, data=bot_user)
+        bot._api = InstrumentedApiClient(MemoryApiClient(bot), bot._observe_api_call)
+
+        guild_id = snowflake()
+        category_id = snowflake()
+        mod_role_id = snowflake()
+        moderator = user_payload(snowflake(), "moderator")
+        guild_channels = [channel_payload(category_id, guild_id, "Modmail", type_=4)]
+        threads = channels // 2
+        users = []
+        for i in range(channels):
+            if i < threads:
+                user = user_payload(snowflake(), f"user{i}")
+                users.append(user)
+                topic = f"User ID: {user['id']}"
+                name, parent_id = f"user{i}", category_id
+            else:
+                topic, name, parent_id = None, f"channel-{i}", None
+            guild_channels.append(
+                channel_payload(snowflake(), guild_id, name, parent_id=parent_id, topic=topic, position=i)
+            )
+
+        guild = discord.Guild(
+            state=state,
+            data={
+                "id": str(guild_id),
+                "name": "Benchmark",
+                "owner_id": moderator["id"],
+                "member_count": len(users) + 2,
+                "roles": [
+                    role_payload(guild_id, "@everyone", 0),
+                    role_payload(mod_role_id, "Moderator", 1, hoist=True),
+                ],
+                "channels": guild_channels,
+                "members": [
+                    member_payload(bot_user),
+                    member_payload(moderator, [mod_role_id]),
+                    *(member_payload(user) for user in users),
+                ],
+                "emojis": [],
+                "stickers": [],
+                "features": [],
+            },
+        )
+        state._add_guild(guild)
+        bot.http.guild = guild
+        for user in users:
+            bot.http.users[int(user["id"])] = user
+
+        self = cls(bot, guild)
+        self.moderator = guild.get_member(int(moderator["id"]))
+        self.thread_channels = [c for c in guild.text_channels if c.topic]
+
+        bot.config["guild_id"] = str(guild_id)
+        bot.config["main_category_id"] = str(category_id)
+        if aliases is not None:
+            bot.config["aliases"] = aliases
+        if snippets is not None:
+            bot.config["snippets"] = snippets
+        if auto_triggers is not None:
+            bot.config["auto_triggers"] = auto_triggers
+
+        for extension in extensions:
+            await bot.load_extension(extension)
+        await bot.threads.populate_cache()
+        for thread in bot.threads:
+            await self.db.logs.insert_one(
+                {
+                    "key": secrets.token_hex(6),
+                    "open": True,
+                    "channel_id": str(thread.channel.id),
+                    "recipient": {"id": str(thread.id)},
+                    "messages": [],
+                }
+            )
+        return self
+
+    async def add_recipients(self, thread: Thread, count: int) -> None:
+        """Make `count` new members of the guild other recipients of `thread`."""
+        users = []
+        for i in range(count):
+            user = user_payload(snowflake(), f"extra{len(self.guild.members)}-{i}")
+            self.http.users[int(user["id"])] = user
+            member = discord.Member(data=member_payload(user), guild=self.guild, state=self.bot._connection)
+            self.guild._add_member(member)
+            users.append(member)
+        thread._other_recipients = users
+
+    def dm(self, user: discord.abc.User, content: str) -> discord.Message:
+        """A DM sent by `user` to the bot."""
+        state = self.bot._connection
+        channel = state._get_private_channel_by_user(user.id)
+        if channel is None:
+            channel = state.add_dm_channel(
+                {"id": str(snowflake()), "type": 1, "recipients": [self.http.users[user.id]]}
+            )
+        data = message_payload(channel.id, self.http.users[user.id], content)
+        return state.create_message(channel=channel, data=data)
+
+    def channel_message(
+        self, channel: discord.TextChannel, author: discord.Member, content: str
+    ) -> discord.Message:
+        """A message sent by `author` in a channel of the guild."""
+        user = user_payload(author.id, author.name, bot=author.bot)
+        member = member_payload(user, [role.id for role in author.roles[1:]])
+        data = message_payload(channel.id, user, content, guild_id=self.guild.id, member=member)
+        return self.bot._connection.create_message(channel=channel, data=data)
+
+    async def close(self) -> None:
+        """Shut the bot down and cancel the tasks it left waiting, e.g. for a gateway connection."""
+        for extension in list(self.bot.extensions):
+            await self.bot.unload_extension(extension)
+        await self.bot.close()
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
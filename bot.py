@@ -3,15 +3,13 @@ __version__ = "4.2.1"
 
 import asyncio
 import copy
-import hashlib
 import os
-import re
 import string
 import struct
 import sys
 import platform
+import time
 import typing
-from datetime import datetime, timezone
 from subprocess import PIPE
 from types import SimpleNamespace
 
@@ -32,22 +30,43 @@ try:
 except ImportError:
     pass
 
-from core import checks
+from core import checks, tracing
 from core.changelog import Changelog
-from core.clients import ApiClient, MongoDBClient, PluginDatabaseClient
+from core.clients import (
+    ApiCall,
+    ApiClient,
+    InstrumentedApiClient,
+    MongoDBClient,
+    PluginDatabaseClient,
+    QueryStats,
+)
 from core.config import ConfigManager
+from core.dispatch import DispatchTable
+from core.loopmonitor import LoopMonitor
+from core.metrics import MetricsServer, ModmailMetrics
 from core.models import (
     DMDisabled,
     HostingMethod,
     InvalidConfigError,
+    MessageRoute,
     PermissionLevel,
     SafeFormatter,
     configure_logging,
     getLogger,
+    log_queue_depth,
+    logging_context,
+    stop_logging,
+    update_log_context,
 )
+from core.scheduler import JobScheduler
+from core.stickers import StickerCache
 from core.thread import ThreadManager
+from core.triggers import TriggerMatch, TriggerMatcher
+from core.workers import KeyedWorkerPool, OverloadPolicy, blocking_wait
 from core.time import human_timedelta
+from core.typing_relay import TypingRelay
 from core.utils import (
+    expand_alias,
     extract_block_timestamp,
     normalize_alias,
     parse_alias,
@@ -55,6 +74,8 @@ from core.utils import (
     tryint,
     human_join,
     extract_forwarded_content,
+    random_channel_name,
+    ChannelNameIndex,
 )
 
 logger = getLogger(__name__)
@@ -94,7 +115,29 @@ class ModmailBot(commands.Bot):
         self._started = False
 
         self.threads = ThreadManager(self)
-        self._message_queues = {}  # User ID -> asyncio.Queue for message ordering
+        self.jobs = JobScheduler(self)
+        self.jobs.register("close", self.threads._run_scheduled_close)
+        self.jobs.register("auto_close", self.threads._run_scheduled_close)
+        self.dm_workers = KeyedWorkerPool(
+            self.process_dm_modmail,
+            workers=self._int_config("dm_workers"),
+            limit=self._int_config("dm_queue_limit"),
+            name="DM",
+        )
+        self.sticker_cache = StickerCache(self, os.path.join(temp_dir, "stickers"))
+        self.typing_relay = TypingRelay(self)
+        self.channel_names = ChannelNameIndex()
+        self.dispatch_table = DispatchTable(self)
+        self.permission_index = checks.PermissionIndex(self)
+        self._trigger_matcher: typing.Optional[TriggerMatcher] = None
+        self._trigger_matcher_version = None
+        self._emoji_cache: typing.Dict[typing.Tuple[typing.Optional[int], str], typing.Any] = {}
+        loop_lag_threshold = self._int_config("loop_lag_threshold")
+        self.loop_monitor = LoopMonitor(loop_lag_threshold / 1000) if loop_lag_threshold > 0 else None
+        self.metrics = ModmailMetrics(self)
+        self.metrics_server: typing.Optional[MetricsServer] = None
+        self.query_stats = QueryStats(self._int_config("slow_query_threshold") / 1000)
+        self.tracer = self._create_tracer()
 
         log_dir = os.path.join(temp_dir, "logs")
         if not os.path.exists(log_dir):
@@ -208,12 +251,18 @@ class ModmailBot(commands.Bot):
     def api(self) -> ApiClient:
         if self._api is None:
             if self.config["database_type"].lower() == "mongodb":
-                self._api = MongoDBClient(self)
+                self._api = InstrumentedApiClient(MongoDBClient(self), self._observe_api_call)
             else:
                 logger.critical("Invalid database type.")
                 raise RuntimeError
         return self._api
 
+    def _observe_api_call(self, call: ApiCall) -> None:
+        self.metrics.api_call_seconds.observe(call.duration, method=call.method)
+        self.query_stats.record(call)
+        end = time.perf_counter()
+        tracing.record_span(f"api.{call.method}", end - call.duration, end)
+
     @property
     def db(self):
         # deprecated
@@ -227,6 +276,10 @@ class ModmailBot(commands.Bot):
             async with self:
                 self._connected = asyncio.Event()
                 self.session = ClientSession(loop=self.loop)
+                if self.loop_monitor is not None:
+                    self.loop_monitor.start()
+                if self.config["metrics_port"]:
+                    await self.start_metrics_server()
 
                 if self.config["enable_presence_intent"]:
                     logger.info("Starting bot with presence intent.")
@@ -291,6 +344,52 @@ class ModmailBot(commands.Bot):
             finally:
                 logger.info("Closing the event loop.")
 
+    async def close(self):
+        if self.loop_monitor is not None:
+            self.loop_monitor.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        self.dm_workers.stop()
+        self.sticker_cache.close()
+        await self.jobs.stop()
+        await super().close()
+        stop_logging()
+
+    def cache_sizes(self) -> typing.Dict[str, int]:
+        """The number of entries in the caches and queues of the bot, to find the ones that keep growing."""
+        sizes = {
+            "threads": len(self.threads.cache),
+            "last closed threads": len(self.threads._last_closed),
+            "DMs in flight": len(self.dm_workers),
+            "scheduled jobs": len(self.jobs),
+            "stickers": len(self.sticker_cache),
+            "emojis": len(self._emoji_cache),
+            "channel names": len(self.channel_names),
+            "compiled aliases": len(self.dispatch_table.aliases),
+            "permission index": len(self.permission_index.levels) + len(self.permission_index.commands),
+            "typing cooldowns": len(self.typing_relay._expires),
+            "query shapes": len(self.query_stats.shapes),
+            "queued log records": log_queue_depth(),
+            "discord.py users": len(self.users),
+            "discord.py messages": len(self.cached_messages),
+        }
+        modmail = self.get_cog("Modmail")
+        if modmail is not None:
+            sizes["snooze timers"] = len(modmail.snooze_timers)
+        plugins = self.get_cog("Plugins")
+        if plugins is not None:
+            sizes["loaded plugins"] = len(plugins.loaded_plugins)
+        return sizes
+
+    async def start_metrics_server(self) -> None:
+        try:
+            port = int(self.config["metrics_port"])
+        except (ValueError, TypeError):
+            logger.error("Invalid metrics_port %s, metrics are not served.", self.config["metrics_port"])
+            return
+        self.metrics_server = MetricsServer(self.metrics, self.config["metrics_host"], port)
+        await self.metrics_server.start()
+
     @property
     def bot_owner_ids(self):
         owner_ids = self.config["owners"]
@@ -369,9 +468,10 @@ class ModmailBot(commands.Bot):
         return self.log_channel
 
     async def wait_for_connected(self) -> None:
-        await self.wait_until_ready()
-        await self._connected.wait()
-        await self.config.wait_until_ready()
+        async with blocking_wait():
+            await self.wait_until_ready()
+            await self._connected.wait()
+            await self.config.wait_until_ready()
 
     @property
     def snippets(self) -> typing.Dict[str, str]:
@@ -532,6 +632,9 @@ class ModmailBot(commands.Bot):
         # Wait until config cache is populated with stuff from db and on_connect ran
         await self.wait_for_connected()
 
+        # The guild cache was (re)built, events may have been missed in between
+        self.channel_names.invalidate()
+
         if self.guild is None:
             logger.error("Logging out due to invalid GUILD_ID.")
             return await self.close()
@@ -567,43 +670,10 @@ class ModmailBot(commands.Bot):
 
         await self.threads.populate_cache()
 
-        # closures
-        closures = self.config["closures"]
-        logger.info("There are %d thread(s) pending to be closed.", len(closures))
+        # scheduled closures
+        await self.jobs.start()
         logger.line()
 
-        for recipient_id, items in tuple(closures.items()):
-            after = (
-                datetime.fromisoformat(items["time"]).astimezone(timezone.utc) - discord.utils.utcnow()
-            ).total_seconds()
-            if after <= 0:
-                logger.debug("Closing thread for recipient %s.", recipient_id)
-                after = 0
-            else:
-                logger.debug(
-                    "Thread for recipient %s will be closed after %s seconds.",
-                    recipient_id,
-                    after,
-                )
-
-            thread = await self.threads.find(recipient_id=int(recipient_id))
-
-            if not thread:
-                # If the channel is deleted
-                logger.debug("Failed to close thread for recipient %s.", recipient_id)
-                self.config["closures"].pop(recipient_id)
-                await self.config.update()
-                continue
-
-            await thread.close(
-                closer=await self.get_or_fetch_user(items["closer_id"]),
-                after=after,
-                silent=items["silent"],
-                delete_channel=items["delete_channel"],
-                message=items["message"],
-                auto_close=items.get("auto_close", False),
-            )
-
         for log in await self.api.get_open_logs():
             if log.get("channel_id") is None or self.get_channel(int(log["channel_id"])) is None:
                 logger.debug("Unable to resolve thread with channel %s.", log["channel_id"])
@@ -646,16 +716,29 @@ class ModmailBot(commands.Bot):
         self._started = True
 
     async def convert_emoji(self, name: str) -> str:
-        ctx = SimpleNamespace(bot=self, guild=self.modmail_guild)
+        if is_emoji(name):
+            return name
+
+        # Resolved emojis are cached by the configured value, which changes
+        # whenever the config does. Emoji updates in the guild clear the cache.
+        guild = self.modmail_guild
+        key = (getattr(guild, "id", None), name)
+        emoji = self._emoji_cache.get(key)
+        if emoji is not None:
+            return emoji
+
+        ctx = SimpleNamespace(bot=self, guild=guild)
         converter = commands.EmojiConverter()
+        try:
+            emoji = await converter.convert(ctx, name.strip(":"))
+        except commands.BadArgument as e:
+            logger.warning("%s is not a valid emoji: %s", name, e)
+            raise
 
-        if not is_emoji(name):
-            try:
-                name = await converter.convert(ctx, name.strip(":"))
-            except commands.BadArgument as e:
-                logger.warning("%s is not a valid emoji: %s", name, e)
-                raise
-        return name
+        if len(self._emoji_cache) >= 256:
+            self._emoji_cache.clear()
+        self._emoji_cache[key] = emoji
+        return emoji
 
     async def get_or_fetch_user(self, id: int) -> discord.User:
         """
@@ -698,7 +781,7 @@ class ModmailBot(commands.Bot):
 
         return sent_emoji, blocked_emoji
 
-    def check_account_age(self, author: discord.Member) -> bool:
+    def check_account_age(self, author: discord.Member, *, update: bool = True) -> bool:
         account_age = self.config.get("account_age")
         now = discord.utils.utcnow()
 
@@ -706,21 +789,22 @@ class ModmailBot(commands.Bot):
             min_account_age = author.created_at + account_age
         except ValueError:
             logger.warning("Error with 'account_age'.", exc_info=True)
-            min_account_age = author.created_at + self.config.remove("account_age")
+            fallback = self.config.remove("account_age") if update else self.config.defaults["account_age"]
+            min_account_age = author.created_at + fallback
 
         if min_account_age > now:
             # User account has not reached the required time
             delta = human_timedelta(min_account_age)
             logger.debug("Blocked due to account age, user %s.", author.name)
 
-            if str(author.id) not in self.blocked_users:
+            if update and str(author.id) not in self.blocked_users:
                 new_reason = f"System Message: New Account. User can try again {delta}."
                 self.blocked_users[str(author.id)] = new_reason
 
             return False
         return True
 
-    def check_guild_age(self, author: discord.Member) -> bool:
+    def check_guild_age(self, author: discord.Member, *, update: bool = True) -> bool:
         guild_age = self.config.get("guild_age")
         now = discord.utils.utcnow()
 
@@ -732,21 +816,22 @@ class ModmailBot(commands.Bot):
             min_guild_age = author.joined_at + guild_age
         except ValueError:
             logger.warning("Error with 'guild_age'.", exc_info=True)
-            min_guild_age = author.joined_at + self.config.remove("guild_age")
+            fallback = self.config.remove("guild_age") if update else self.config.defaults["guild_age"]
+            min_guild_age = author.joined_at + fallback
 
         if min_guild_age > now:
             # User has not stayed in the guild for long enough
             delta = human_timedelta(min_guild_age)
             logger.debug("Blocked due to guild age, user %s.", author.name)
 
-            if str(author.id) not in self.blocked_users:
+            if update and str(author.id) not in self.blocked_users:
                 new_reason = f"System Message: Recently Joined. User can try again {delta}."
                 self.blocked_users[str(author.id)] = new_reason
 
             return False
         return True
 
-    def check_manual_blocked_roles(self, author: discord.Member) -> bool:
+    def check_manual_blocked_roles(self, author: discord.Member, *, update: bool = True) -> bool:
         if isinstance(author, discord.Member):
             for r in author.roles:
                 if str(r.id) in self.blocked_roles:
@@ -760,7 +845,8 @@ class ModmailBot(commands.Bot):
                     if end_time is not None:
                         if after <= 0:
                             # No longer blocked
-                            self.blocked_roles.pop(str(r.id))
+                            if update:
+                                self.blocked_roles.pop(str(r.id))
                             logger.debug("No longer blocked, role %s.", r.name)
                             return True
                     logger.debug("User blocked, role %s.", r.name)
@@ -768,7 +854,7 @@ class ModmailBot(commands.Bot):
 
         return True
 
-    def check_manual_blocked(self, author: discord.Member) -> bool:
+    def check_manual_blocked(self, author: discord.Member, *, update: bool = True) -> bool:
         if str(author.id) not in self.blocked_users:
             return True
 
@@ -777,7 +863,8 @@ class ModmailBot(commands.Bot):
         if blocked_reason.startswith("System Message:"):
             # Met the limits already, otherwise it would've been caught by the previous checks
             logger.debug("No longer internally blocked, user %s.", author.name)
-            self.blocked_users.pop(str(author.id))
+            if update:
+                self.blocked_users.pop(str(author.id))
             return True
 
         try:
@@ -788,7 +875,8 @@ class ModmailBot(commands.Bot):
         if end_time is not None:
             if after <= 0:
                 # No longer blocked
-                self.blocked_users.pop(str(author.id))
+                if update:
+                    self.blocked_users.pop(str(author.id))
                 logger.debug("No longer blocked, user %s.", author.name)
                 return True
         logger.debug("User blocked, user %s.", author.name)
@@ -801,13 +889,8 @@ class ModmailBot(commands.Bot):
             return True
         return False
 
-    async def is_blocked(
-        self,
-        author: discord.User,
-        *,
-        channel: discord.TextChannel = None,
-        send_message: bool = False,
-    ) -> bool:
+    def _block_subject(self, author: discord.User) -> typing.Union[discord.User, discord.Member]:
+        """The member of a guild the bot is in for `author`, whose roles and join date the blocks check."""
         member = self.guild.get_member(author.id)
         if member is None:
             # try to find in other guilds
@@ -819,35 +902,59 @@ class ModmailBot(commands.Bot):
             if member is None:
                 logger.debug("User not in guild, %s.", author.id)
 
-        if member is not None:
-            author = member
+        return member if member is not None else author
+
+    def check_blocked(self, author: discord.User, *, update: bool = True) -> bool:
+        """
+        Whether `author` is blocked, by the whitelist, `account_age`, `guild_age`,
+        blocked users and blocked roles.
 
+        With `update`, expired blocks are lifted and users failing an age check are
+        blocked with a system message, in the cached config only, see `is_blocked`.
+        Without it, the config is left untouched.
+        """
+        author = self._block_subject(author)
         if str(author.id) in self.blocked_whitelisted_users:
-            if str(author.id) in self.blocked_users:
-                self.blocked_users.pop(str(author.id))
-                await self.config.update()
+            if update:
+                self.blocked_users.pop(str(author.id), None)
             return False
 
+        if not self.check_account_age(author, update=update):
+            return True
+        if not self.check_guild_age(author, update=update):
+            return True
+        if not self.check_manual_blocked(author, update=update):
+            return True
+        return not self.check_manual_blocked_roles(author, update=update)
+
+    @tracing.traced("is_blocked")
+    async def is_blocked(
+        self,
+        author: discord.User,
+        *,
+        channel: discord.TextChannel = None,
+        send_message: bool = False,
+    ) -> bool:
+        listed = str(author.id) in self.blocked_users
         blocked_reason = self.blocked_users.get(str(author.id)) or ""
 
-        if not self.check_account_age(author) or not self.check_guild_age(author):
+        if self.check_blocked(author):
             new_reason = self.blocked_users.get(str(author.id))
-            if new_reason != blocked_reason:
-                if send_message:
-                    await channel.send(
-                        embed=discord.Embed(
-                            title="Message not sent!",
-                            description=new_reason,
-                            color=self.error_color,
-                        )
+            # only an age check adds a new reason to a blocked user
+            if send_message and new_reason and new_reason != blocked_reason:
+                await channel.send(
+                    embed=discord.Embed(
+                        title="Message not sent!",
+                        description=new_reason,
+                        color=self.error_color,
                     )
+                )
             return True
 
-        if not self.check_manual_blocked(author):
-            return True
-
-        if not self.check_manual_blocked_roles(author):
-            return True
+        if str(author.id) in self.blocked_whitelisted_users:
+            if listed:
+                await self.config.update()
+            return False
 
         await self.config.update()
         return False
@@ -859,25 +966,17 @@ class ModmailBot(commands.Bot):
         if thread_cooldown == isodate.Duration():
             return
 
-        last_log = await self.api.get_latest_user_logs(author.id)
+        last_closed_at = await self.threads.get_last_closed(author.id)
 
-        if last_log is None:
-            logger.debug("Last thread wasn't found, %s.", author.name)
-            return
-
-        last_log_closed_at = last_log.get("closed_at")
-
-        if not last_log_closed_at:
-            logger.debug("Last thread was not closed, %s.", author.name)
+        if last_closed_at is None:
+            logger.debug("Last closed thread wasn't found, %s.", author.name)
             return
 
         try:
-            cooldown = datetime.fromisoformat(last_log_closed_at).astimezone(timezone.utc) + thread_cooldown
+            cooldown = last_closed_at + thread_cooldown
         except ValueError:
             logger.warning("Error with 'thread_cooldown'.", exc_info=True)
-            cooldown = datetime.fromisoformat(last_log_closed_at).astimezone(
-                timezone.utc
-            ) + self.config.remove("thread_cooldown")
+            cooldown = last_closed_at + self.config.remove("thread_cooldown")
 
         if cooldown > now:
             # User messaged before thread cooldown ended
@@ -899,38 +998,47 @@ class ModmailBot(commands.Bot):
                 return False
         return True
 
-    async def _queue_dm_message(self, message: discord.Message) -> None:
-        """Queue DM messages to ensure they're processed in order per user."""
-        user_id = message.author.id
-
-        if user_id not in self._message_queues:
-            self._message_queues[user_id] = asyncio.Queue()
-            # Start processing task for this user
-            self.loop.create_task(self._process_user_messages(user_id))
-
-        await self._message_queues[user_id].put(message)
+    def _create_tracer(self) -> tracing.Tracer:
+        try:
+            sample_rate = float(self.config["trace_sample_rate"])
+        except (ValueError, TypeError):
+            logger.warning(
+                "Invalid trace_sample_rate %s, using the default.", self.config["trace_sample_rate"]
+            )
+            sample_rate = float(self.config.remove("trace_sample_rate"))
+        exporter = str(self.config["trace_exporter"]).lower()
+        return tracing.Tracer(sample_rate, exporter, os.path.join(temp_dir, "traces.jsonl"))
 
-    async def _process_user_messages(self, user_id: int) -> None:
-        """Process messages for a specific user in order."""
-        queue = self._message_queues[user_id]
+    def _int_config(self, key: str) -> int:
+        try:
+            return int(self.config[key])
+        except (ValueError, TypeError):
+            logger.warning("Invalid %s %s, using the default.", key, self.config[key])
+            return int(self.config.remove(key))
 
-        while True:
-            try:
-                # Wait for a message with timeout to clean up inactive queues
-                message = await asyncio.wait_for(queue.get(), timeout=300)  # 5 minutes
-                await self.process_dm_modmail(message)
-                queue.task_done()
-            except asyncio.TimeoutError:
-                # Clean up inactive queue
-                if queue.empty():
-                    self._message_queues.pop(user_id, None)
-                    break
-            except Exception as e:
-                logger.error(f"Error processing message for user {user_id}: {e}", exc_info=True)
-                queue.task_done()
+    async def _queue_dm_message(self, message: discord.Message) -> None:
+        """Queue DM messages to ensure they're processed in order per user."""
+        self.metrics.dms_received.inc()
+        policy = str(self.config["dm_overload_policy"]).lower()
+        if policy not in OverloadPolicy.ALL:
+            policy = OverloadPolicy.DEFER
+
+        trace = self.tracer.start("dm_relay", recipient_id=message.author.id, message_id=message.id)
+        with tracing.activate(trace):
+            submitted = await self.dm_workers.submit(message.author.id, message, policy=policy)
+
+        if not submitted:
+            if trace is not None:
+                trace.error = "rejected"
+                trace.finish()
+            if policy == OverloadPolicy.REACT:
+                _, blocked_emoji = await self.retrieve_emoji()
+                await self.add_reaction(message, blocked_emoji)
 
+    @tracing.traced("process_dm_modmail")
     async def process_dm_modmail(self, message: discord.Message) -> None:
         """Processes messages sent to the bot."""
+        update_log_context(recipient_id=message.author.id)
         blocked = await self._process_blocked(message)
         if blocked:
             return
@@ -1212,15 +1320,10 @@ class ModmailBot(commands.Bot):
                                         exc_info=True,
                                     )
                                 else:
-                                    for user in new_thread.recipients:
-                                        if user != message.author:
-                                            try:
-                                                await new_thread.send(message, user)
-                                            except Exception:
-                                                logger.error(
-                                                    "Failed to send message to additional recipient:",
-                                                    exc_info=True,
-                                                )
+                                    await new_thread.send_to_recipients(
+                                        message,
+                                        [user for user in new_thread.recipients if user != message.author],
+                                    )
                                     await self.add_reaction(message, sent_emoji)
                                     self.dispatch(
                                         "thread_reply",
@@ -1236,14 +1339,16 @@ class ModmailBot(commands.Bot):
                         exc_info=True,
                     )
             else:
-                for user in thread.recipients:
-                    # send to all other recipients
-                    if user != message.author:
-                        try:
-                            await thread.send(message, user)
-                        except Exception:
-                            # silently ignore
-                            logger.error("Failed to send message:", exc_info=True)
+                # send to all other recipients, failures are logged per recipient
+                _, failed = await thread.send_to_recipients(
+                    message, [user for user in thread.recipients if user != message.author]
+                )
+                if failed:
+                    logger.warning(
+                        "Message from %s could not be relayed to %d of the other recipients.",
+                        message.author,
+                        len(failed),
+                    )
 
                 await self.add_reaction(message, sent_emoji)
                 self.dispatch("thread_reply", thread, False, message, False, False)
@@ -1258,24 +1363,29 @@ class ModmailBot(commands.Bot):
 
         return self.get_command(f"{modifiers}reply")
 
-    async def get_contexts(self, message, *, cls=commands.Context):
+    async def get_contexts(self, message, *, cls=commands.Context, thread=discord.utils.MISSING):
         """
         Returns all invocation contexts from the message.
         Supports getting the prefix from database as well as command aliases.
+
+        The thread of the message's channel is looked up unless `thread` is passed.
         """
 
         view = StringView(message.content)
         ctx = cls(prefix=self.prefix, view=view, bot=self, message=message)
-        thread = await self.threads.find(channel=ctx.channel)
+        if thread is discord.utils.MISSING:
+            thread = await self.threads.find(channel=ctx.channel)
 
         if message.author.id == self.user.id:  # type: ignore
             return [ctx]
 
         prefixes = await self.get_prefix()
+        table = self.dispatch_table.refresh(prefixes)
 
-        invoked_prefix = discord.utils.find(view.skip_string, prefixes)
+        invoked_prefix = table.match_prefix(message.content)
         if invoked_prefix is None:
             return [ctx]
+        view.skip_string(invoked_prefix)
 
         invoker = view.get_word().lower()
 
@@ -1289,13 +1399,14 @@ class ModmailBot(commands.Bot):
             snippet_text = None
 
         # Check if there is any aliases being called.
-        alias = self.aliases.get(invoker)
+        alias = table.aliases.get(invoker)
         if alias is not None and snippet_text is None:
             ctxs = []
-            aliases = normalize_alias(alias, message.content[len(f"{invoked_prefix}{invoker}") :])
+            aliases = expand_alias(alias, message.content[len(f"{invoked_prefix}{invoker}") :])
             if not aliases:
                 logger.warning("Alias %s is invalid, removing.", invoker)
-                self.aliases.pop(invoker)
+                self.aliases.pop(invoker, None)
+                self.config.mark_changed("aliases")
 
             for alias in aliases:
                 command = None
@@ -1340,23 +1451,13 @@ class ModmailBot(commands.Bot):
         thread = await self.threads.find(channel=ctx.channel)
 
         invoked_prefix = self.prefix
-        invoker = None
 
-        if self.config.get("use_regex_autotrigger"):
-            trigger = next(filter(lambda x: re.search(x, message.content), self.auto_triggers.keys()))
-            if trigger:
-                invoker = re.search(trigger, message.content).group(0)
-        else:
-            trigger = next(
-                filter(
-                    lambda x: x.lower() in message.content.lower(),
-                    self.auto_triggers.keys(),
-                )
-            )
-            if trigger:
-                invoker = trigger.lower()
+        match = self.match_auto_trigger(message.content)
+        if match is None:
+            return
+        invoker = match.text
 
-        alias = self.auto_triggers[trigger]
+        alias = self.auto_triggers[match.trigger]
 
         ctxs = []
 
@@ -1379,11 +1480,26 @@ class ModmailBot(commands.Bot):
                 old_checks = copy.copy(ctx.command.checks)
                 ctx.command.checks = [checks.has_permissions(PermissionLevel.INVALID)]
 
-                await self.invoke(ctx)
+                with logging_context(command=ctx.command.qualified_name, auto_trigger=True):
+                    await self.invoke(ctx)
 
                 ctx.command.checks = old_checks
                 continue
 
+    def match_auto_trigger(self, content: str) -> typing.Optional[TriggerMatch]:
+        """
+        Find the auto trigger matching `content`.
+
+        The triggers are compiled into a single matcher, which is only
+        rebuilt when the triggers or `use_regex_autotrigger` change.
+        """
+        regex = bool(self.config.get("use_regex_autotrigger"))
+        version = (regex, self.config.generation("auto_triggers"), len(self.auto_triggers))
+        if self._trigger_matcher is None or self._trigger_matcher_version != version:
+            self._trigger_matcher = TriggerMatcher(self.auto_triggers.keys(), regex=regex)
+            self._trigger_matcher_version = version
+        return self._trigger_matcher.match(content)
+
     async def get_context(self, message, *, cls=commands.Context):
         """
         Returns the invocation context from the message.
@@ -1465,30 +1581,47 @@ class ModmailBot(commands.Bot):
                 content = ""
             await self.mention_channel.send(content=content, embed=em)
 
-        # --- MODERATOR-ONLY MESSAGE LOGGING ---
-        # If a moderator sends a message directly in a thread channel (not via modmail command), log it
+        route = None
         if not message.author.bot and not isinstance(message.channel, discord.DMChannel):
-            thread = await self.threads.find(channel=message.channel)
-            if thread is not None:
-                ctxs = await self.get_contexts(message)
-                is_command = any(ctx.command for ctx in ctxs)
-                if not is_command:
-                    # Only log if not a command
-                    perms = message.channel.permissions_for(message.author)
-                    if perms.manage_messages or perms.administrator:
-                        await self.api.append_log(message, type_="internal")
+            route = await self.route_message(message)
+
+            # --- MODERATOR-ONLY MESSAGE LOGGING ---
+            # If a moderator sends a message directly in a thread channel (not via modmail command), log it
+            if route.thread is not None and not route.is_command:
+                if route.permissions.manage_messages or route.permissions.administrator:
+                    await self.api.append_log(message, type_="internal")
 
-        await self.process_commands(message)
+        await self.process_commands(message, route=route)
+
+    async def route_message(self, message) -> MessageRoute:
+        """Resolve the thread and invocation contexts of a guild message once."""
+        thread = await self.threads.find(channel=message.channel)
+        contexts = await self.get_contexts(message, thread=thread)
+        return MessageRoute(
+            thread=thread,
+            contexts=tuple(contexts),
+            permissions=message.channel.permissions_for(message.author),
+        )
 
-    async def process_commands(self, message):
+    async def process_commands(self, message, *, route: typing.Optional[MessageRoute] = None):
         if message.author.bot:
             return
 
         if isinstance(message.channel, discord.DMChannel):
             return await self._queue_dm_message(message)
 
-        ctxs = await self.get_contexts(message)
-        for ctx in ctxs:
+        if route is None:
+            route = await self.route_message(message)
+
+        thread = route.thread
+        # on_message runs in a task of its own, so this does not outlive the message.
+        update_log_context(channel_id=message.channel.id, thread_id=getattr(thread, "id", None))
+        for index, ctx in enumerate(route.contexts):
+            if index:
+                # An earlier step of the alias may have closed or moved the thread. The
+                # topic of a deleted channel would still resolve, so look it up first.
+                channel = self.get_channel(message.channel.id)
+                thread = ctx.thread = await self.threads.find(channel=channel) if channel else None
             if ctx.command:
                 if not any(1 for check in ctx.command.checks if hasattr(check, "permission_level")):
                     logger.debug(
@@ -1498,7 +1631,6 @@ class ModmailBot(commands.Bot):
                     checks.has_permissions(PermissionLevel.INVALID)(ctx.command)
 
                 # Check if thread is unsnoozing and queue command if so
-                thread = await self.threads.find(channel=ctx.channel)
                 if thread and thread._unsnoozing:
                     queued = await thread.queue_command(ctx, ctx.command)
                     if queued:
@@ -1509,10 +1641,10 @@ class ModmailBot(commands.Bot):
                             logger.warning("Failed to add queued-reaction: %s", e)
                         continue
 
-                await self.invoke(ctx)
+                with logging_context(command=ctx.command.qualified_name):
+                    await self.invoke(ctx)
                 continue
 
-            thread = await self.threads.find(channel=ctx.channel)
             if thread is not None:
                 # If thread is snoozed (moved), auto-unsnooze when a mod sends a message directly in channel
                 behavior = (self.config.get("snooze_behavior") or "delete").lower()
@@ -1561,36 +1693,10 @@ class ModmailBot(commands.Bot):
             return
 
         if isinstance(channel, discord.DMChannel):
-            if not self.config.get("user_typing"):
-                return
-
-            thread = await self.threads.find(recipient=user)
-
-            if thread:
-                try:
-                    await thread.channel.typing()
-                except Exception:
-                    logger.debug(
-                        "Failed to trigger typing indicator in recipient DM.",
-                        exc_info=True,
-                    )
-        else:
-            if not self.config.get("mod_typing"):
-                return
-
-            thread = await self.threads.find(channel=channel)
-            if thread is not None and thread.recipient:
-                for user in thread.recipients:
-                    if await self.is_blocked(user):
-                        continue
-                    try:
-                        await user.typing()
-                    except Exception:
-                        logger.debug(
-                            "Failed to trigger typing for recipient %s.",
-                            getattr(user, "id", "?"),
-                            exc_info=True,
-                        )
+            if self.config.get("user_typing"):
+                await self.typing_relay.from_recipient(user)
+        elif self.config.get("mod_typing"):
+            await self.typing_relay.from_staff(channel)
 
     async def handle_reaction_events(self, payload):
         user = self.get_user(payload.user_id)
@@ -1741,7 +1847,18 @@ class ModmailBot(commands.Bot):
         if self.config["transfer_reactions"]:
             await self.handle_reaction_events(payload)
 
+    async def on_guild_emojis_update(self, guild, before, after):
+        self._emoji_cache.clear()
+
+    async def on_guild_channel_create(self, channel):
+        self.channel_names.channel_created(channel)
+
+    async def on_guild_channel_update(self, before, after):
+        self.channel_names.channel_updated(after)
+
     async def on_guild_channel_delete(self, channel):
+        self.channel_names.channel_deleted(channel)
+
         if channel.guild != self.modmail_guild:
             return
 
@@ -2184,9 +2301,7 @@ class ModmailBot(commands.Bot):
             name = new_name = "null"
         else:
             if self.config["use_random_channel_name"]:
-                to_hash = self.token.split(".")[-1] + str(author.id)
-                digest = hashlib.md5(to_hash.encode("utf8"), usedforsecurity=False)
-                name = new_name = digest.hexdigest()[-8:]
+                name = new_name = random_channel_name(self.token.split(".")[-1], author.id)
             elif self.config["use_user_id_channel_name"]:
                 name = new_name = str(author.id)
             elif self.config["use_timestamp_channel_name"]:
@@ -2206,13 +2321,7 @@ class ModmailBot(commands.Bot):
                     name += f"-{author.discriminator}"
                 new_name = name
 
-        counter = 1
-        existed = set(c.name for c in guild.text_channels if c != exclude_channel)
-        while new_name in existed:
-            new_name = f"{name}_{counter}"  # multiple channels with same name
-            counter += 1
-
-        return new_name
+        return self.channel_names.unique_name(guild, new_name, exclude_channel)
 
 
 def main():
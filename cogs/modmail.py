@@ -7,7 +7,6 @@ import logging
 
 import discord
 from discord.ext import commands
-from discord.ext import tasks
 from discord.ext.commands.view import StringView
 from discord.ext.commands.cooldowns import BucketType
 from discord.role import Role
@@ -18,6 +17,7 @@ from dateutil import parser
 from core import checks
 from core.models import DMDisabled, PermissionLevel, SimilarCategoryConverter, getLogger
 from core.paginator import EmbedPaginatorSession
+from core.scheduler import DeadlineScheduler
 from core.thread import Thread
 from core.time import UserFriendlyTime, human_timedelta
 from core.utils import *
@@ -30,61 +30,45 @@ class Modmail(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self._snoozed_cache = []
-        self._auto_unsnooze_task = self.bot.loop.create_task(self.auto_unsnooze_task())
+        # Recipient ID -> snooze_until, woken only when the earliest deadline is due
+        self.snooze_timers = DeadlineScheduler(self.bot, self._auto_unsnooze, name="auto-unsnooze")
 
-    async def auto_unsnooze_task(self):
+    async def _load_snooze_deadlines(self):
         await self.bot.wait_until_ready()
-        last_db_query = 0
-        while not self.bot.is_closed():
-            now = datetime.now(timezone.utc)
+        for entry in await self.bot.api.get_snooze_deadlines():
             try:
-                # Query DB every 2 minutes
-                if (now.timestamp() - last_db_query) > 120:
-                    snoozed_threads = await self.bot.api.logs.find(
-                        {"snooze_until": {"$gte": now.isoformat()}}
-                    ).to_list(None)
-                    self._snoozed_cache = snoozed_threads or []
-                    last_db_query = now.timestamp()
-                # Check cache every 10 seconds
-                to_unsnooze = []
-                for thread_data in list(self._snoozed_cache):
-                    snooze_until = thread_data.get("snooze_until")
-                    recipient = thread_data.get("recipient")
-                    if not recipient or not recipient.get("id"):
-                        continue
-                    thread_id = int(recipient.get("id"))
-                    if snooze_until:
-                        try:
-                            dt = parser.isoparse(snooze_until)
-                        except Exception:
-                            continue
-                        if now >= dt:
-                            to_unsnooze.append(thread_data)
-                for thread_data in to_unsnooze:
-                    recipient = thread_data.get("recipient")
-                    if not recipient or not recipient.get("id"):
-                        continue
-                    thread_id = int(recipient.get("id"))
-                    thread = self.bot.threads.cache.get(thread_id) or await self.bot.threads.find(
-                        id=thread_id
-                    )
-                    if thread and thread.snoozed:
-                        await thread.restore_from_snooze()
-                        logging.info(f"[AUTO-UNSNOOZE] Thread {thread_id} auto-unsnoozed.")
-                        try:
-                            channel = thread.channel
-                            if channel:
-                                await channel.send("⏰ This thread has been automatically unsnoozed.")
-                        except Exception as e:
-                            logger.info(
-                                "Failed to notify channel after auto-unsnooze: %s",
-                                e,
-                            )
-                        self._snoozed_cache.remove(thread_data)
+                thread_id = int(entry["recipient"]["id"])
+                until_dt = datetime.fromisoformat(entry["snooze_until"])
+            except (KeyError, ValueError, TypeError) as e:
+                logger.debug("Skipping snoozed log with an invalid snooze_until: %s", e)
+                continue
+            if thread_id not in self.snooze_timers:
+                self.snooze_timers.schedule(thread_id, until_dt)
+        logger.debug("Loaded %d auto-unsnooze deadlines.", len(self.snooze_timers))
+
+    async def _auto_unsnooze(self, thread_id: int):
+        thread = self.bot.threads.cache.get(thread_id) or await self.bot.threads.find(recipient_id=thread_id)
+        if not thread or not thread.snoozed:
+            return
+        if not thread.snooze_data:
+            log_entry = await self.bot.api.logs.find_one({"recipient.id": str(thread_id), "snoozed": True})
+            if log_entry:
+                thread.snooze_data = log_entry.get("snooze_data")
+        if await thread.restore_from_snooze():
+            logging.info(f"[AUTO-UNSNOOZE] Thread {thread_id} auto-unsnoozed.")
+            try:
+                channel = thread.channel
+                if channel:
+                    await channel.send("⏰ This thread has been automatically unsnoozed.")
             except Exception as e:
-                logging.error(f"Error in auto_unsnooze_task: {e}")
-            await asyncio.sleep(10)
+                logger.info(
+                    "Failed to notify channel after auto-unsnooze: %s",
+                    e,
+                )
+
+    @commands.Cog.listener()
+    async def on_thread_unsnoozed(self, thread):
+        self.snooze_timers.cancel(thread.id)
 
     def _resolve_user(self, user_str):
         """Helper to resolve a user from mention, ID, or username."""
@@ -344,6 +328,7 @@ class Modmail(commands.Cog):
             return await ctx.send(embed=embed)
 
         self.bot.snippets[name] = value
+        self.bot.config.mark_changed("snippets")
         await self.bot.config.update()
 
         embed = discord.Embed(
@@ -392,6 +377,7 @@ class Modmail(commands.Cog):
 
             if not save_aliases:
                 original_value = self.bot.aliases.pop(alias)
+                self.bot.config.mark_changed("aliases")
                 deleted[alias] = original_value
             else:
                 original_alias = self.bot.aliases[alias]
@@ -399,6 +385,7 @@ class Modmail(commands.Cog):
 
                 if original_alias != new_alias:
                     self.bot.aliases[alias] = new_alias
+                    self.bot.config.mark_changed("aliases")
                     edited[alias] = original_alias
 
         return deleted, edited
@@ -452,6 +439,7 @@ class Modmail(commands.Cog):
                 description=description,
             )
             self.bot.snippets.pop(name)
+            self.bot.config.mark_changed("snippets")
             await self.bot.config.update()
         else:
             embed = create_not_found_embed(name, self.bot.snippets.keys(), "Snippet")
@@ -469,6 +457,7 @@ class Modmail(commands.Cog):
         """
         if name in self.bot.snippets:
             self.bot.snippets[name] = value
+            self.bot.config.mark_changed("snippets")
             await self.bot.config.update()
 
             embed = discord.Embed(
@@ -2577,12 +2566,18 @@ class Modmail(commands.Cog):
             color=self.bot.error_color,
         )
         await ctx.send(embed=embed)
-        ok = await thread.snooze(moderator=ctx.author, snooze_for=snooze_for)
+        progress_msg = await ctx.send("Saving thread history...")
+
+        async def report_progress(count):
+            await progress_msg.edit(content=f"Saving thread history... {count} messages saved.")
+
+        ok = await thread.snooze(moderator=ctx.author, snooze_for=snooze_for, progress=report_progress)
         if ok:
             logging.info(
                 f"[SNOOZE] Thread for {getattr(thread.recipient, 'id', None)} snoozed for {snooze_for}s."
             )
             self.bot.threads.cache[thread.id] = thread
+            self.snooze_timers.schedule(thread.id, snooze_until)
         else:
             await ctx.send("Failed to snooze this thread.")
             logging.error(f"[SNOOZE] Failed to snooze thread for {getattr(thread.recipient, 'id', None)}.")
@@ -2694,30 +2689,11 @@ class Modmail(commands.Cog):
         await ctx.send("Snoozed threads:\n" + "\n".join(lines))
 
     async def cog_load(self):
-        self.snooze_auto_unsnooze.start()
-
-    @tasks.loop(seconds=10)
-    async def snooze_auto_unsnooze(self):
-        now = datetime.now(timezone.utc)
-        snoozed = await self.bot.api.logs.find({"snoozed": True}).to_list(None)
-        for entry in snoozed:
-            snooze_until = entry.get("snooze_until")
-            if snooze_until:
-                try:
-                    until_dt = datetime.fromisoformat(snooze_until)
-                    if now >= until_dt:
-                        thread = await self.bot.threads.find(recipient_id=int(entry["recipient"]["id"]))
-                        if thread and thread.snoozed:
-                            await thread.restore_from_snooze()
-                except (ValueError, TypeError) as e:
-                    logger.debug(
-                        "Failed parsing snooze_until timestamp for auto-unsnooze loop: %s",
-                        e,
-                    )
+        self.snooze_timers.start()
+        self.bot.loop.create_task(self._load_snooze_deadlines())
 
-    @snooze_auto_unsnooze.before_loop
-    async def _snooze_auto_unsnooze_before(self):
-        await self.bot.wait_until_ready()
+    async def cog_unload(self):
+        self.snooze_timers.stop()
 
     async def process_dm_modmail(self, message: discord.Message) -> None:
         # ... existing code ...
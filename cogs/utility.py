@@ -1,10 +1,12 @@
 from core.utils import trigger_typing, truncate
 import asyncio
 import inspect
+import logging
 import os
 import random
-import re
+import threading
 import traceback
+import tracemalloc
 from contextlib import redirect_stdout
 from difflib import get_close_matches
 from io import BytesIO, StringIO
@@ -33,7 +35,9 @@ from core.models import (
     getLogger,
 )
 from core.utils import DummyParam
-from core.paginator import EmbedPaginatorSession, MessagePaginatorSession
+from core.logreader import LogTailReader, iter_file_chunks
+from core.paginator import EmbedPaginatorSession, LazyMessagePaginatorSession
+from core.profiler import StackSampler, loop_idle_stack
 
 
 logger = getLogger(__name__)
@@ -225,6 +229,7 @@ class ModmailHelpCommand(commands.HelpCommand):
                 )
                 embed.add_field(name=f"{command}` used to be:", value=val)
                 self.context.bot.aliases.pop(command)
+                self.context.bot.config.mark_changed("aliases")
                 await self.context.bot.config.update()
             else:
                 if len(values) == 1:
@@ -277,6 +282,9 @@ class Utility(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self._original_help_command = bot.help_command
+        self._profiling = False
+        self._memory_snapshot: typing.Optional[tracemalloc.Snapshot] = None
+        self._cache_sizes = None
         self.bot.help_command = ModmailHelpCommand(
             command_attrs={
                 "help": "Shows this help message.",
@@ -411,47 +419,57 @@ class Utility(commands.Cog):
     @commands.group(invoke_without_command=True)
     @checks.has_permissions(PermissionLevel.OWNER)
     @utils.trigger_typing
-    async def debug(self, ctx):
-        """Shows the recent application logs of the bot."""
+    async def debug(self, ctx, level: str = None, logger_name: str = None):
+        """
+        Shows the recent application logs of the bot.
+
+        Only the most recent logs are loaded, older ones are loaded when navigating back.
+
+        Optionally filter by `level`, to only show logs of that level or above,
+        and by `logger_name`, to only show logs of a logger such as `cogs.modmail`.
+        Either can be left out.
+
+        **Examples:**
+        - `{prefix}debug warning`
+        - `{prefix}debug info cogs.modmail`
+        - `{prefix}debug core.thread`
+        """
+
+        level_number = None
+        if level is not None:
+            level_number = logging.getLevelName(level.upper())
+            if not isinstance(level_number, int):
+                # not a level, so it must be the logger name
+                if logger_name is not None:
+                    raise commands.BadArgument(f"`{level}` is not a valid logging level.")
+                level, level_number, logger_name = None, None, level
+
+        reader = LogTailReader(self.bot.log_file_path, level=level_number, logger_name=logger_name)
 
-        with open(self.bot.log_file_path, "r+", encoding="utf-8") as f:
-            logs = f.read().strip()
+        async def load_older():
+            return await self.bot.loop.run_in_executor(None, reader.read_pages, 5)
 
-        if not logs:
+        messages = await load_older()
+
+        if not messages:
+            if reader.filtered:
+                description = "There are no logs matching these filters."
+            else:
+                description = "You don't have any logs at the moment."
             embed = discord.Embed(
                 color=self.bot.main_color,
                 title="Debug Logs:",
-                description="You don't have any logs at the moment.",
+                description=description,
             )
             embed.set_footer(text="Go to your console to see your logs.")
             return await ctx.send(embed=embed)
 
-        messages = []
-
-        # Using Haskell formatting because it's similar to Python for exceptions
-        # and it does a fine job formatting the logs.
-        msg = "```Haskell\n"
-
-        for line in logs.splitlines(keepends=True):
-            if msg != "```Haskell\n":
-                if len(line) + len(msg) + 3 > 2000:
-                    msg += "```"
-                    messages.append(msg)
-                    msg = "```Haskell\n"
-            msg += line
-            if len(msg) + 3 > 2000:
-                msg = msg[:1992] + "[...]```"
-                messages.append(msg)
-                msg = "```Haskell\n"
-
-        if msg != "```Haskell\n":
-            msg += "```"
-            messages.append(msg)
-
         embed = discord.Embed(color=self.bot.main_color)
         embed.set_footer(text="Debug logs - Navigate using the reactions below.")
 
-        session = MessagePaginatorSession(ctx, *messages, embed=embed)
+        session = LazyMessagePaginatorSession(
+            ctx, *messages, load_older=load_older, has_older=not reader.exhausted, embed=embed
+        )
         session.current = len(messages) - 1
         return await session.run()
 
@@ -463,10 +481,8 @@ class Utility(commands.Cog):
 
         haste_url = os.environ.get("HASTE_URL", "https://hastebin.cc")
 
-        with open(self.bot.log_file_path, "rb+") as f:
-            logs = BytesIO(f.read().strip())
-
         try:
+            logs = iter_file_chunks(self.bot.log_file_path)
             async with self.bot.session.post(haste_url + "/documents", data=logs) as resp:
                 data = await resp.json()
                 try:
@@ -500,6 +516,271 @@ class Utility(commands.Cog):
             embed=discord.Embed(color=self.bot.main_color, description="Cached logs are now cleared.")
         )
 
+    @debug.command(name="loop")
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def debug_loop(self, ctx):
+        """
+        Shows how responsive the event loop is.
+
+        Lists the lag statistics of the last 5 minutes and the most recent times
+        the event loop was blocked for longer than `loop_lag_threshold`.
+        """
+        monitor = self.bot.loop_monitor
+        if monitor is None:
+            embed = discord.Embed(
+                title="Event Loop",
+                color=self.bot.error_color,
+                description="The event loop monitor is disabled, set `loop_lag_threshold` to enable it.",
+            )
+            return await ctx.send(embed=embed)
+
+        stats = monitor.stats()
+        embed = discord.Embed(title="Event Loop", color=self.bot.main_color)
+        if stats:
+            embed.description = (
+                f"Lag over the last 5 minutes: **{stats['current'] * 1000:.1f} ms** now, "
+                f"{stats['mean'] * 1000:.1f} ms mean, {stats['p50'] * 1000:.1f} ms p50, "
+                f"{stats['p95'] * 1000:.1f} ms p95, {stats['p99'] * 1000:.1f} ms p99.\n"
+                f"Highest lag since {discord.utils.format_dt(monitor.started_at, 'R')}: "
+                f"**{stats['max'] * 1000:.0f} ms**."
+            )
+        else:
+            embed.description = "No measurements yet."
+
+        stalls = list(monitor.stalls)[-5:]
+        if stalls:
+            embed.add_field(
+                name=f"Stalls over {monitor.threshold * 1000:.0f} ms ({monitor.stall_count} total)",
+                value="\n".join(
+                    f"{discord.utils.format_dt(stall.started_at, 'R')}: {stall.duration * 1000:.0f} ms"
+                    + (f" in `{stall.task}`" if stall.task else "")
+                    for stall in reversed(stalls)
+                ),
+                inline=False,
+            )
+            if stalls[-1].stack:
+                stack = stalls[-1].stack
+                if len(stack) > 1000:
+                    stack = "[...]" + stack[-995:]
+                embed.add_field(name="Last blocking stack", value=f"```py\n{stack}```", inline=False)
+        else:
+            embed.add_field(
+                name="Stalls", value=f"None over {monitor.threshold * 1000:.0f} ms.", inline=False
+            )
+
+        await ctx.send(embed=embed)
+
+    @debug.command(name="queries", aliases=["db"])
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def debug_queries(self, ctx, limit: int = 10):
+        """
+        Shows the slowest database queries since the bot started.
+
+        Queries are grouped by their shape, the method and the structure of its
+        arguments without the values. Shapes are sampled from 1 in 16 calls of each
+        method and from every slow call. Also lists the latency percentiles of the
+        most used database methods.
+        """
+        stats = self.bot.query_stats
+        limit = max(1, min(limit, 25))
+
+        embed = discord.Embed(
+            title="Database Queries",
+            color=self.bot.main_color,
+            description=f"Since {discord.utils.format_dt(stats.started_at, 'R')}, "
+            f"shapes sampled from 1 in {stats.SAMPLE_EVERY} calls and every slow call.",
+        )
+
+        slowest = stats.slowest(limit)
+        if not slowest:
+            embed.description += "\nNo database calls were made yet."
+            return await ctx.send(embed=embed)
+
+        lines = []
+        for shape, calls, mean, longest in slowest:
+            lines.append(
+                f"`{truncate(shape, 150)}`\n"
+                f"max **{longest * 1000:.0f} ms**, mean {mean * 1000:.0f} ms, {calls} sampled call(s)"
+            )
+        embed.description += "\n\n" + "\n".join(lines)
+        embed.description = truncate(embed.description, 4096)
+
+        methods = sorted(stats.methods.items(), key=lambda item: item[1]["calls"], reverse=True)[:10]
+        value = []
+        for method, method_stats in methods:
+            percentiles = stats.percentiles(method)
+            value.append(
+                f"`{method}` {method_stats['calls']} call(s), "
+                + ", ".join(f"{p} {d * 1000:.0f}" for p, d in percentiles.items())
+                + " ms"
+            )
+        embed.add_field(name="Most used methods", value=truncate("\n".join(value), 1024), inline=False)
+
+        await ctx.send(embed=embed)
+
+    @debug.command(name="profile")
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def debug_profile(self, ctx, seconds: float = 10):
+        """
+        Profiles the bot for a number of seconds.
+
+        The stack of the event loop is sampled in the background, while the bot keeps
+        running as usual. The result is sent as a file in the collapsed stack format,
+        which can be opened on https://www.speedscope.app or with flamegraph.pl.
+
+        The duration is limited to 120 seconds.
+        """
+        if self._profiling:
+            return await ctx.send(
+                embed=discord.Embed(color=self.bot.error_color, description="A profile is already running.")
+            )
+        seconds = max(1.0, min(seconds, 120.0))
+
+        self._profiling = True
+        try:
+            await ctx.send(
+                embed=discord.Embed(
+                    color=self.bot.main_color, description=f"Profiling for {seconds:g} seconds..."
+                )
+            )
+            sampler = StackSampler(threading.get_ident(), idle_stack=loop_idle_stack())
+            await self.bot.loop.run_in_executor(None, sampler.run, seconds)
+        finally:
+            self._profiling = False
+
+        if not sampler.samples:
+            return await ctx.send(
+                embed=discord.Embed(color=self.bot.error_color, description="No samples were taken.")
+            )
+
+        idle = sampler.idle_samples()
+        embed = discord.Embed(
+            title="Profile",
+            color=self.bot.main_color,
+            description=(
+                f"{sampler.samples} samples over {sampler.duration:.1f} seconds, "
+                f"{sampler.sampling_time / sampler.duration:.2%} overhead.\n"
+                f"The event loop was idle in {idle / sampler.samples:.1%} of the samples."
+            ),
+        )
+        busy = sampler.top_functions(idle=False)
+        if busy:
+            embed.add_field(
+                name="Busiest functions",
+                value=truncate(
+                    "\n".join(
+                        f"`{truncate(frame, 80)}` {count / sampler.samples:.1%}" for frame, count in busy
+                    ),
+                    1024,
+                ),
+                inline=False,
+            )
+
+        data = BytesIO(sampler.collapsed().encode("utf-8"))
+        filename = f"profile-{discord.utils.utcnow():%Y%m%d-%H%M%S}.folded"
+        await ctx.send(embed=embed, file=discord.File(data, filename=filename))
+
+    @debug.group(name="memory", aliases=["mem"], invoke_without_command=True)
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def debug_memory(self, ctx, limit: int = 10):
+        """
+        Shows where the bot allocates memory.
+
+        The first use starts tracing memory allocations, which makes the bot slightly
+        slower and use more memory, until `{prefix}debug memory stop` is used. Every use
+        takes a snapshot and shows the code that allocated the most memory still in use,
+        what grew the most since the previous snapshot, and the size of the bot's caches.
+        """
+        limit = max(1, min(limit, 20))
+        loop = self.bot.loop
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+
+        snapshot = await loop.run_in_executor(None, self._take_memory_snapshot)
+        previous, self._memory_snapshot = self._memory_snapshot, snapshot
+        previous_sizes = self._cache_sizes
+        self._cache_sizes = (discord.utils.utcnow(), self.bot.cache_sizes())
+
+        current, peak = tracemalloc.get_traced_memory()
+        embed = discord.Embed(
+            title="Memory",
+            color=self.bot.main_color,
+            description=f"Traced memory: **{utils.human_size(current)}**, peak {utils.human_size(peak)}.",
+        )
+        if started:
+            embed.description += (
+                "\nTracing was just started, memory allocated before is not included. "
+                f"Use `{self.bot.prefix}debug memory` again later to see what grows."
+            )
+
+        def site(stat):
+            frame = stat.traceback[0]
+            path = "/".join(frame.filename.replace("\\", "/").split("/")[-2:])
+            return f"`{truncate(path, 60)}:{frame.lineno}`"
+
+        top = await loop.run_in_executor(None, lambda: snapshot.statistics("lineno")[:limit])
+        if top:
+            embed.add_field(
+                name="Largest allocation sites",
+                value=truncate(
+                    "\n".join(f"{site(stat)} {utils.human_size(stat.size)} in {stat.count}" for stat in top),
+                    1024,
+                ),
+                inline=False,
+            )
+
+        if previous is not None:
+            diff = await loop.run_in_executor(None, lambda: snapshot.compare_to(previous, "lineno")[:limit])
+            growth = [stat for stat in diff if stat.size_diff > 0]
+            embed.add_field(
+                name=f"Growth since {previous_sizes[0]:%H:%M:%S} UTC",
+                value=truncate(
+                    "\n".join(
+                        f"{site(stat)} +{utils.human_size(stat.size_diff)} ({stat.count_diff:+})"
+                        for stat in growth
+                    )
+                    or "Nothing grew.",
+                    1024,
+                ),
+                inline=False,
+            )
+
+        sizes = self._cache_sizes[1]
+        old_sizes = previous_sizes[1] if previous_sizes is not None else {}
+        lines = []
+        for name, size in sizes.items():
+            line = f"{name}: **{size}**"
+            if name in old_sizes and size != old_sizes[name]:
+                line += f" ({size - old_sizes[name]:+})"
+            lines.append(line)
+        embed.add_field(name="Caches", value=truncate("\n".join(lines), 1024), inline=False)
+
+        await ctx.send(embed=embed)
+
+    @staticmethod
+    def _take_memory_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            )
+        )
+
+    @debug_memory.command(name="stop")
+    @checks.has_permissions(PermissionLevel.OWNER)
+    async def debug_memory_stop(self, ctx):
+        """Stops tracing memory allocations and discards the snapshots."""
+        tracemalloc.stop()
+        self._memory_snapshot = None
+        self._cache_sizes = None
+        await ctx.send(
+            embed=discord.Embed(
+                color=self.bot.main_color, description="Memory allocations are no longer traced."
+            )
+        )
+
     @commands.command(aliases=["presence"])
     @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
     async def activity(self, ctx, activity_type: str.lower, *, message: str = ""):
@@ -1060,6 +1341,7 @@ class Utility(commands.Cog):
                 )
                 embed.add_field(name=f"{name}` used to be:", value=utils.truncate(val, 1024))
                 self.bot.aliases.pop(name)
+                self.bot.config.mark_changed("aliases")
                 await self.bot.config.update()
                 return await ctx.send(embed=embed)
 
@@ -1191,6 +1473,7 @@ class Utility(commands.Cog):
                 embed.add_field(name=f"Step {i}:", value=utils.truncate(val, 1024))
 
         self.bot.aliases[name] = " && ".join(f'"{a}"' for a in save_aliases)
+        self.bot.config.mark_changed("aliases")
         await self.bot.config.update()
         return embed
 
@@ -1250,6 +1533,7 @@ class Utility(commands.Cog):
 
         if name in self.bot.aliases:
             self.bot.aliases.pop(name)
+            self.bot.config.mark_changed("aliases")
             await self.bot.config.update()
 
             embed = discord.Embed(
@@ -1905,6 +2189,7 @@ class Utility(commands.Cog):
 
             if valid:
                 self.bot.auto_triggers[keyword] = command
+                self.bot.config.mark_changed("auto_triggers")
                 await self.bot.config.update()
 
                 embed = discord.Embed(
@@ -1944,6 +2229,7 @@ class Utility(commands.Cog):
 
             if valid:
                 self.bot.auto_triggers[keyword] = command
+                self.bot.config.mark_changed("auto_triggers")
                 await self.bot.config.update()
 
                 embed = discord.Embed(
@@ -1974,6 +2260,7 @@ class Utility(commands.Cog):
             )
             await ctx.send(embed=embed)
         else:
+            self.bot.config.mark_changed("auto_triggers")
             await self.bot.config.update()
 
             embed = discord.Embed(
@@ -1987,22 +2274,17 @@ class Utility(commands.Cog):
     @checks.has_permissions(PermissionLevel.OWNER)
     async def autotrigger_test(self, ctx, *, text):
         """Tests a string against the current autotrigger setup"""
-        for keyword in self.bot.auto_triggers:
-            if self.bot.config.get("use_regex_autotrigger"):
-                check = re.search(keyword, text)
-                regex = True
-            else:
-                check = keyword.lower() in text.lower()
-                regex = False
-
-            if check:
-                alias = self.bot.auto_triggers[keyword]
-                embed = discord.Embed(
-                    title=f"{'Regex ' if regex else ''}Keyword Found",
-                    color=self.bot.main_color,
-                    description=f"autotrigger keyword `{keyword}` found. Command executed: `{alias}`",
-                )
-                return await ctx.send(embed=embed)
+        match = self.bot.match_auto_trigger(text)
+        if match is not None:
+            regex = self.bot.config.get("use_regex_autotrigger")
+            alias = self.bot.auto_triggers[match.trigger]
+            embed = discord.Embed(
+                title=f"{'Regex ' if regex else ''}Keyword Found",
+                color=self.bot.main_color,
+                description=f"autotrigger keyword `{match.trigger}` found at position {match.start}. "
+                f"Command executed: `{alias}`",
+            )
+            return await ctx.send(embed=embed)
 
         embed = discord.Embed(
             title="Keyword Not Found",
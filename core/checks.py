@@ -1,3 +1,5 @@
+import typing
+
 from discord.ext import commands
 
 from core.models import HostingMethod, PermissionLevel, getLogger
@@ -58,26 +60,69 @@ async def check_permissions(ctx, command_name) -> bool:
         logger.debug("Allowed due to administrator.")
         return True
 
-    command_permissions = ctx.bot.config["command_permissions"]
-    checkables = {*ctx.author.roles, ctx.author}
+    return ctx.bot.permission_index.refresh().allows(ctx.author, command_name, permission_level)
 
-    if command_name in command_permissions:
-        # -1 is for @everyone
-        if -1 in command_permissions[command_name] or any(
-            str(check.id) in command_permissions[command_name] for check in checkables
-        ):
-            return True
 
-    level_permissions = ctx.bot.config["level_permissions"]
+class PermissionIndex:
+    """
+    The `command_permissions` and `level_permissions` configurations, compiled for lookups.
+
+    Every role or user ID is mapped to the highest permission level it was
+    granted, and every command to the set of IDs allowed to use it. Checking
+    permissions then only needs the author's ID and role IDs. The index is
+    rebuilt when either configuration changes.
+    """
+
+    EVERYONE = -1
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._version = None
+        self.levels: typing.Dict[int, int] = {}
+        self.commands: typing.Dict[str, typing.FrozenSet[int]] = {}
+
+    def refresh(self) -> "PermissionIndex":
+        """Rebuild the index if the permissions have changed."""
+        config = self.bot.config
+        version = (config.generation("command_permissions"), config.generation("level_permissions"))
+        if version != self._version:
+            self._build()
+            self._version = version
+        return self
+
+    @staticmethod
+    def _ids(values) -> typing.Set[int]:
+        ids = set()
+        for value in values:
+            try:
+                ids.add(int(value))
+            except (TypeError, ValueError):
+                logger.warning("Invalid ID in permissions: %r.", value)
+        return ids
+
+    def _build(self) -> None:
+        self.commands = {
+            name: frozenset(self._ids(values))
+            for name, values in self.bot.config["command_permissions"].items()
+        }
+
+        level_permissions = self.bot.config["level_permissions"]
+        self.levels = {}
+        for level in PermissionLevel:
+            for id_ in self._ids(level_permissions.get(level.name, [])):
+                self.levels[id_] = max(level, self.levels.get(id_, PermissionLevel.INVALID))
+        logger.debug("Rebuilt the permission index.")
+
+    def allows(self, author, command_name: str, permission_level: PermissionLevel) -> bool:
+        """Whether the configured permissions allow `author` to use a command."""
+        ids = {self.EVERYONE, author.id, *(role.id for role in getattr(author, "roles", ()))}
+
+        allowed = self.commands.get(command_name)
+        if allowed is not None and not allowed.isdisjoint(ids):
+            return True
 
-    for level in PermissionLevel:
-        if level >= permission_level and level.name in level_permissions:
-            # -1 is for @everyone
-            if -1 in level_permissions[level.name] or any(
-                str(check.id) in level_permissions[level.name] for check in checkables
-            ):
-                return True
-    return False
+        levels = self.levels
+        return any(levels.get(id_, PermissionLevel.INVALID) >= permission_level for id_ in ids)
 
 
 def thread_only():
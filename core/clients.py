@@ -1,7 +1,13 @@
+import asyncio
+import functools
+import inspect
 import secrets
 import sys
+import time
+from collections import deque
+from itertools import islice
 from json import JSONDecodeError
-from typing import Any, Dict, Union, Optional
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
 
 import discord
 from discord import Member, DMChannel, TextChannel, Message
@@ -9,6 +15,7 @@ from discord.ext import commands
 
 from aiohttp import ClientResponseError, ClientResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, ReplaceOne
 from pymongo.errors import ConfigurationError
 
 from core.models import InvalidConfigError, getLogger
@@ -425,6 +432,24 @@ class ApiClient:
     async def edit_note(self, message_id: Union[int, str], message: str):
         return NotImplemented
 
+    async def get_snooze_deadlines(self) -> list:
+        return NotImplemented
+
+    async def get_scheduled_jobs(self) -> list:
+        return NotImplemented
+
+    async def update_scheduled_jobs(self, upserts: list, deletes: list):
+        return NotImplemented
+
+    async def save_snooze_chunk(self, snapshot_id: str, index: int, data: bytes, count: int):
+        return NotImplemented
+
+    async def get_snooze_chunk(self, snapshot_id: str, index: int) -> Optional[bytes]:
+        return NotImplemented
+
+    async def delete_snooze_snapshot(self, snapshot_id: str):
+        return NotImplemented
+
     def get_plugin_partition(self, cog):
         return NotImplemented
 
@@ -435,6 +460,242 @@ class ApiClient:
         return NotImplemented
 
 
+def _shape(value: Any, depth: int = 0) -> str:
+    """The structure of a value with the values themselves left out, as in a query shape."""
+    if isinstance(value, dict):
+        if depth >= 3:
+            return "{...}"
+        if value and all(str(k).isdigit() for k in value):
+            # keyed by IDs
+            return "{?: " + _shape(next(iter(value.values())), depth + 1) + "}"
+        return "{" + ", ".join(f"{k}: {_shape(v, depth + 1)}" for k, v in value.items()) + "}"
+    if isinstance(value, (list, tuple, set)):
+        if not value:
+            return "[]"
+        if depth >= 3:
+            return "[...]"
+        return "[" + _shape(next(iter(value)), depth + 1) + (", ..." if len(value) > 1 else "") + "]"
+    if value is None or isinstance(value, (str, bytes, int, float)):
+        return "?"
+    return type(value).__name__
+
+
+def query_shape(method: str, args: tuple, kwargs: dict) -> str:
+    """
+    Describe a call by the method and the structure of its arguments, so that calls that
+    only differ in their values (IDs, message contents) are grouped together.
+
+    ``post_log(123, {"open": False, "closer": {...}})`` becomes ``post_log(?, {open: ?, closer: {...}})``.
+    """
+    parts = [_shape(arg) for arg in args]
+    parts.extend(f"{name}={_shape(value)}" for name, value in kwargs.items())
+    return f"{method}({', '.join(parts)})"
+
+
+# Rough size of the fixed fields (IDs, timestamps, flags) stored with each of these.
+_MESSAGE_OVERHEAD = 128
+_USER_OVERHEAD = 64
+_ATTACHMENT_OVERHEAD = 64
+# Bounds of the walk over the arguments of a call in `payload_size`.
+_PAYLOAD_ITEMS = 16
+_PAYLOAD_DEPTH = 4
+
+
+def payload_size(value: Any, depth: int = 0) -> int:
+    """
+    An estimate of how many bytes `value` takes up when sent to the database.
+
+    Messages and users are estimated from the fields the client stores for them,
+    e.g. the content, author and attachments of a message. Embeds are not stored.
+    Only the first `_PAYLOAD_ITEMS` items of a container are measured, the size of
+    the others is extrapolated from them, and nothing below `_PAYLOAD_DEPTH` levels
+    is counted, so that measuring e.g. the whole config stays cheap.
+    """
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (bool, int, float)):
+        return 8
+    if depth >= _PAYLOAD_DEPTH:
+        return 0
+    if isinstance(value, dict):
+        if not value:
+            return 0
+        size = sum(len(str(k)) + payload_size(v, depth + 1) for k, v in islice(value.items(), _PAYLOAD_ITEMS))
+        return size * len(value) // min(len(value), _PAYLOAD_ITEMS)
+    if isinstance(value, (list, tuple, set)):
+        if not value:
+            return 0
+        size = sum(payload_size(v, depth + 1) for v in islice(value, _PAYLOAD_ITEMS))
+        return size * len(value) // min(len(value), _PAYLOAD_ITEMS)
+    if isinstance(value, Message):
+        return (
+            _MESSAGE_OVERHEAD
+            + len(value.content)
+            + payload_size(value.author, depth + 1)
+            + sum(_ATTACHMENT_OVERHEAD + len(a.filename) + len(a.url) for a in value.attachments)
+        )
+    if isinstance(value, discord.abc.User):
+        return _USER_OVERHEAD + len(value.name) + len(value.display_avatar.url)
+    if isinstance(getattr(value, "id", None), int):
+        # channels and other Discord objects are stored by ID
+        return len(str(value.id))
+    return 0
+
+
+def document_count(result: Any) -> int:
+    """How many documents a database call returned or changed."""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return 1
+    for attribute in ("modified_count", "deleted_count"):
+        count = getattr(result, attribute, None)
+        if isinstance(count, int):
+            return count
+    return 0
+
+
+class ApiCall(NamedTuple):
+    method: str
+    args: tuple
+    kwargs: dict
+    duration: float  # seconds
+    result: Any
+    error: Optional[BaseException]
+
+
+class InstrumentedApiClient:
+    """
+    Wraps an `ApiClient` and reports every call to one of its coroutine methods.
+
+    Everything else is passed through to the wrapped client unchanged, including the
+    `db` and `logs` collections, so queries run on them directly are not reported.
+
+    Parameters
+    ----------
+    client : ApiClient
+        The client to wrap.
+    observe : Callable[[ApiCall], None]
+        Called after each call with its arguments, duration and result.
+    """
+
+    def __init__(self, client: ApiClient, observe: Callable[[ApiCall], None]):
+        self._client = client
+        self._observe = observe
+
+    @property
+    def client(self) -> ApiClient:
+        return self._client
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await attr(*args, **kwargs)
+            except asyncio.CancelledError:
+                # the caller gave up waiting, the call did not fail
+                raise
+            except BaseException as e:
+                self._observe(ApiCall(name, args, kwargs, time.perf_counter() - start, None, e))
+                raise
+            self._observe(ApiCall(name, args, kwargs, time.perf_counter() - start, result, None))
+            return result
+
+        # cache the wrapper, so `__getattr__` is not called again for this method
+        self.__dict__[name] = wrapper
+        return wrapper
+
+
+class QueryStats:
+    """
+    Latency, document count and payload size statistics of the database calls.
+
+    Durations are kept per method for percentiles, and aggregated per query shape
+    (see `query_shape`) to find the slowest kinds of calls. Calls that take longer
+    than `slow_threshold` are logged with their shape.
+
+    Shapes and payload sizes take a walk over the arguments, so they are only
+    measured for one in `SAMPLE_EVERY` calls of each method and for every slow call.
+    ``payload_bytes`` is the total of the ``sampled`` calls.
+
+    Parameters
+    ----------
+    slow_threshold : float
+        Seconds after which a call is logged as slow, `0` to never log.
+    """
+
+    SAMPLES = 1024  # durations kept per method
+    SAMPLE_EVERY = 16
+    MAX_SHAPES = 256
+
+    def __init__(self, slow_threshold: float):
+        self.slow_threshold = slow_threshold
+        self.started_at = discord.utils.utcnow()
+        self.methods: Dict[str, Dict[str, Any]] = {}
+        # shape -> [calls, total seconds, max seconds]
+        self.shapes: Dict[str, List[float]] = {}
+
+    def record(self, call: ApiCall) -> None:
+        stats = self.methods.get(call.method)
+        if stats is None:
+            stats = self.methods[call.method] = {
+                "calls": 0,
+                "errors": 0,
+                "documents": 0,
+                "payload_bytes": 0,
+                "sampled": 0,
+                "durations": deque(maxlen=self.SAMPLES),
+            }
+        documents = document_count(call.result)
+        stats["calls"] += 1
+        stats["errors"] += call.error is not None
+        stats["documents"] += documents
+        stats["durations"].append(call.duration)
+
+        slow = self.slow_threshold and call.duration >= self.slow_threshold
+        if not slow and (stats["calls"] - 1) % self.SAMPLE_EVERY:
+            return
+
+        size = payload_size(call.args) + payload_size(call.kwargs)
+        stats["sampled"] += 1
+        stats["payload_bytes"] += size
+
+        shape = query_shape(call.method, call.args, call.kwargs)
+        entry = self.shapes.get(shape)
+        if entry is None and len(self.shapes) < self.MAX_SHAPES:
+            entry = self.shapes[shape] = [0, 0.0, 0.0]
+        if entry is not None:
+            entry[0] += 1
+            entry[1] += call.duration
+            entry[2] = max(entry[2], call.duration)
+
+        if slow:
+            logger.warning(
+                "Slow database call %s took %.0f ms (%d document(s), %d bytes sent).",
+                shape,
+                call.duration * 1000,
+                documents,
+                size,
+            )
+
+    def percentiles(self, method: str) -> Dict[str, float]:
+        """The p50, p95 and p99 durations of the recent calls of `method`, in seconds."""
+        durations = sorted(self.methods[method]["durations"])
+        if not durations:
+            return {}
+        return {f"p{p}": durations[min(len(durations) - 1, len(durations) * p // 100)] for p in (50, 95, 99)}
+
+    def slowest(self, limit: int = 10) -> List[Tuple[str, int, float, float]]:
+        """The `limit` query shapes with the longest calls as ``(shape, calls, mean, max)`` tuples."""
+        entries = sorted(self.shapes.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+        return [(shape, int(calls), total / calls, longest) for shape, (calls, total, longest) in entries]
+
+
 class MongoDBClient(ApiClient):
     def __init__(self, bot):
         mongo_uri = bot.config["connection_uri"]
@@ -484,6 +745,11 @@ class MongoDBClient(ApiClient):
                     ("key", "text"),
                 ]
             )
+
+        await coll.create_index("snooze_until", sparse=True)
+        await coll.create_index([("recipient.id", 1), ("closed_at", -1)])
+        await self.db.scheduled_jobs.create_index([("bot_id", 1), ("kind", 1), ("target", 1)], unique=True)
+        await self.db.snooze_snapshots.create_index([("snapshot_id", 1), ("index", 1)], unique=True)
         logger.debug("Successfully configured and verified database indexes.")
 
     async def validate_database_connection(self, *, ssl_retry=True):
@@ -749,6 +1015,45 @@ class MongoDBClient(ApiClient):
     async def edit_note(self, message_id: Union[int, str], message: str):
         await self.db.notes.update_one({"message_id": str(message_id)}, {"$set": {"message": message}})
 
+    async def get_snooze_deadlines(self) -> list:
+        return await self.logs.find(
+            {"snooze_until": {"$exists": True}, "snoozed": True},
+            {"recipient.id": 1, "snooze_until": 1},
+        ).to_list(None)
+
+    async def get_scheduled_jobs(self) -> list:
+        return await self.db.scheduled_jobs.find({"bot_id": self.bot.user.id}).to_list(None)
+
+    async def update_scheduled_jobs(self, upserts: list, deletes: list):
+        requests = [
+            ReplaceOne(
+                {"bot_id": self.bot.user.id, "kind": job["kind"], "target": str(job["target"])},
+                {**job, "bot_id": self.bot.user.id, "target": str(job["target"])},
+                upsert=True,
+            )
+            for job in upserts
+        ]
+        requests.extend(
+            DeleteOne({"bot_id": self.bot.user.id, "kind": kind, "target": str(target)})
+            for kind, target in deletes
+        )
+        if requests:
+            await self.db.scheduled_jobs.bulk_write(requests, ordered=False)
+
+    async def save_snooze_chunk(self, snapshot_id: str, index: int, data: bytes, count: int):
+        await self.db.snooze_snapshots.update_one(
+            {"snapshot_id": snapshot_id, "index": index},
+            {"$set": {"data": data, "count": count}},
+            upsert=True,
+        )
+
+    async def get_snooze_chunk(self, snapshot_id: str, index: int) -> Optional[bytes]:
+        doc = await self.db.snooze_snapshots.find_one({"snapshot_id": snapshot_id, "index": index})
+        return bytes(doc["data"]) if doc else None
+
+    async def delete_snooze_snapshot(self, snapshot_id: str):
+        await self.db.snooze_snapshots.delete_many({"snapshot_id": snapshot_id})
+
     def get_plugin_partition(self, cog):
         cls_name = cog.__class__.__name__
         return self.db.plugins[cls_name]
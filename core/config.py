@@ -148,6 +148,8 @@ class ConfigManager:
         "snooze_store_attachments": False,  # when True, store image attachments as base64 in snooze_data
         "snooze_attachment_max_bytes": 4_194_304,  # 4 MiB per attachment cap to avoid Mongo 16MB limit
         "unsnooze_history_limit": None,  # Limit number of messages replayed when unsnoozing (None = all messages)
+        # DM processing
+        "dm_overload_policy": "defer",  # 'defer', 'react' or 'drop' once dm_queue_limit DMs are in flight
         # --- THREAD CREATION MENU ---
         "thread_creation_menu_timeout": 30,  # Default interaction timeout for the thread-creation menu (in seconds)
         "thread_creation_menu_close_on_timeout": False,
@@ -184,7 +186,7 @@ class ConfigManager:
         "snippets": {},
         "notification_squad": {},
         "subscriptions": {},
-        "closures": {},
+        "closures": {},  # legacy, migrated to the scheduled jobs collection on startup
         # Thread creation menu
         "thread_creation_menu_enabled": False,
         "thread_creation_menu_options": {},  # main menu options mapping key -> {label, description, emoji, type, callback}
@@ -222,6 +224,18 @@ class ConfigManager:
         "discord_log_level": "INFO",
         # data collection
         "data_collection": True,
+        # DM processing
+        "dm_workers": 8,
+        "dm_queue_limit": 1000,
+        # event loop monitoring
+        "loop_lag_threshold": 500,  # milliseconds, 0 to disable
+        # metrics
+        "metrics_host": "127.0.0.1",
+        "metrics_port": None,  # serve Prometheus metrics on this port, disabled if not set
+        "slow_query_threshold": 500,  # milliseconds, database calls taking longer are logged, 0 to disable
+        # tracing
+        "trace_sample_rate": 0,  # share of relayed DMs traced, between 0 and 1
+        "trace_exporter": "log",  # 'log' or 'file' (OTLP JSON lines in temp/traces.jsonl)
     }
 
     colors = {
@@ -307,6 +321,7 @@ class ConfigManager:
     def __init__(self, bot):
         self.bot = bot
         self._cache = {}
+        self._generations: typing.Dict[str, int] = {}
         self.ready_event = asyncio.Event()
         self.config_help = {}
 
@@ -338,6 +353,7 @@ class ConfigManager:
 
     async def update(self):
         """Updates the config with data from the cache"""
+        self.bot.metrics.config_writes.inc()
         await self.bot.api.update_config(self.filter_default(self._cache))
 
     async def refresh(self) -> dict:
@@ -346,6 +362,7 @@ class ConfigManager:
             k = k.lower()
             if k in self.all_keys:
                 self._cache[k] = v
+                self.mark_changed(k)
         if not self.ready_event.is_set():
             self.ready_event.set()
             logger.debug("Successfully fetched configurations from database.")
@@ -360,6 +377,7 @@ class ConfigManager:
         if key not in self.all_keys:
             raise InvalidConfigError(f'Configuration "{key}" is invalid.')
         self._cache[key] = item
+        self.mark_changed(key)
 
     def __getitem__(self, key: str) -> typing.Any:
         # make use of the custom methods in func:get:
@@ -539,8 +557,23 @@ class ConfigManager:
         if key in self._cache:
             del self._cache[key]
         self._cache[key] = deepcopy(self.defaults[key])
+        self.mark_changed(key)
         return self._cache[key]
 
+    def mark_changed(self, key: str) -> None:
+        """
+        Record that a configuration was changed.
+
+        Setting or removing a configuration does this automatically, it only needs to be
+        called after mutating a value in place, e.g. ``config["aliases"][name] = value``.
+        """
+        key = key.lower()
+        self._generations[key] = self._generations.get(key, 0) + 1
+
+    def generation(self, key: str) -> int:
+        """A counter that changes whenever the configuration is changed, for invalidating caches."""
+        return self._generations.get(key.lower(), 0)
+
     def items(self) -> typing.Iterable:
         return self._cache.items()
 
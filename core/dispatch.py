@@ -0,0 +1,67 @@
+import typing
+
+from core.models import getLogger
+from core.utils import parse_alias
+
+logger = getLogger(__name__)
+
+
+class DispatchTable:
+    """
+    Prefixes and aliases compiled for command dispatch.
+
+    Aliases are parsed into their steps once, instead of on every invocation,
+    and prefixes are bucketed by their first character so matching a message
+    only compares against prefixes that can possibly match. The table is rebuilt
+    when the prefixes change or the aliases configuration is changed
+    (see `ConfigManager.mark_changed`). Snippets need no compiling, they are
+    looked up in the snippets configuration directly.
+
+    Parameters
+    ----------
+    bot : ModmailBot
+        The Modmail bot.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._version = None
+        self.prefixes: typing.List[str] = []
+        self._prefixes_by_char: typing.Dict[str, typing.List[str]] = {}
+        self.aliases: typing.Dict[str, typing.List[str]] = {}
+        self.builds = 0
+
+    def _current_version(self, prefixes: typing.Sequence[str]) -> tuple:
+        config = self.bot.config
+        return (
+            tuple(prefixes),
+            config.generation("aliases"),
+            # also catch in-place changes by plugins that do not mark them
+            len(self.bot.aliases),
+        )
+
+    def refresh(self, prefixes: typing.Sequence[str]) -> "DispatchTable":
+        """Rebuild the table if anything it was compiled from has changed."""
+        version = self._current_version(prefixes)
+        if version != self._version:
+            self._build(prefixes)
+            self._version = version
+        return self
+
+    def _build(self, prefixes: typing.Sequence[str]) -> None:
+        self.prefixes = list(prefixes)
+        self._prefixes_by_char = {}
+        for prefix in self.prefixes:
+            if prefix:
+                self._prefixes_by_char.setdefault(prefix[0], []).append(prefix)
+
+        self.aliases = {name: parse_alias(value) for name, value in self.bot.aliases.items()}
+        self.builds += 1
+        logger.debug("Compiled %d prefix(es) and %d alias(es).", len(self.prefixes), len(self.aliases))
+
+    def match_prefix(self, content: str) -> typing.Optional[str]:
+        """The first prefix that `content` starts with, in the order returned by `get_prefix`."""
+        for prefix in self._prefixes_by_char.get(content[:1], ()):
+            if content.startswith(prefix):
+                return prefix
+        return None
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import typing
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+# Matches the header of a record written with the plain file format,
+# "%(asctime)s %(name)s[%(lineno)d] - %(levelname)s: %(message)s".
+_RECORD_HEADER = re.compile(
+    r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} (?P<name>\S+)\[\d+\] - (?P<level>[A-Z]+): "
+)
+
+CODE_BLOCK_START = "```Haskell\n"
+CODE_BLOCK_END = "```"
+PAGE_SIZE = 2000 - len(CODE_BLOCK_START) - len(CODE_BLOCK_END)
+
+
+def _parse_header(line: str) -> typing.Optional[typing.Tuple[str, str]]:
+    """The logger name and level name of the record starting at `line`, `None` for a continuation line."""
+    if line.startswith("{"):
+        try:
+            data = orjson.loads(line) if orjson is not None else json.loads(line)
+        except ValueError:
+            return None
+        if isinstance(data, dict) and "level" in data:
+            return str(data.get("loggerName", "")), str(data["level"])
+        return None
+
+    match = _RECORD_HEADER.match(line)
+    if match is None:
+        return None
+    return match.group("name"), match.group("level")
+
+
+class LogTailReader:
+    """
+    Reads a log file backwards, one page at a time.
+
+    The file is read in chunks from its end, so only the part that is shown is
+    ever loaded. Lines of a multi-line record (such as a traceback) are kept
+    together and filtered with the record they belong to. Records appended after
+    the first read are not included, and reading stops if the file is rotated or
+    cleared in the meantime.
+
+    `read_pages` does blocking file I/O, call it in an executor.
+
+    Parameters
+    ----------
+    path : str
+        The path of the log file.
+    level : int, optional
+        Only include records of this level or above.
+    logger_name : str, optional
+        Only include records of this logger or its children.
+    chunk_size : int
+        The number of bytes read from the file at once.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        level: typing.Optional[int] = None,
+        logger_name: typing.Optional[str] = None,
+        chunk_size: int = 64 * 1024,
+    ):
+        self.path = path
+        self.level = level
+        self.logger_name = logger_name
+        self.chunk_size = chunk_size
+        self.exhausted = False
+
+        self._position: typing.Optional[int] = None
+        self._inode: typing.Optional[int] = None
+        self._partial = b""  # the start of the line cut off by the last chunk read
+        self._lines: typing.List[bytes] = []  # lines of the last chunk, not yet consumed
+        self._continuation: typing.List[str] = []  # lines of the current record, newest first
+        self._carry: typing.Optional[typing.List[str]] = None  # lines that did not fit the last page
+
+    @property
+    def filtered(self) -> bool:
+        return self.level is not None or self.logger_name is not None
+
+    def _matches(self, name: str, level_name: str) -> bool:
+        if self.level is not None:
+            level = logging.getLevelName(level_name)
+            if isinstance(level, int) and level < self.level:
+                return False
+        if self.logger_name is not None:
+            return name == self.logger_name or name.startswith(self.logger_name + ".")
+        return True
+
+    def _iter_lines(self, f) -> typing.Iterator[str]:
+        """Lines of the file, newest first."""
+        while True:
+            if self._lines:
+                line = self._lines.pop().decode("utf-8", errors="replace").rstrip("\r")
+                if line.strip():
+                    yield line
+            elif self._position:
+                start = max(0, self._position - self.chunk_size)
+                f.seek(start)
+                data = f.read(self._position - start) + self._partial
+                self._position = start
+                self._lines = data.split(b"\n")
+                self._partial = self._lines.pop(0) if start else b""
+            else:
+                return
+
+    def _iter_records(self, f) -> typing.Iterator[typing.List[str]]:
+        """Records that pass the filters as lists of lines, newest first."""
+        for line in self._iter_lines(f):
+            self._continuation.append(line)
+            header = _parse_header(line)
+            if header is None:
+                continue
+            record, self._continuation = self._continuation[::-1], []
+            if self._matches(*header):
+                yield record
+
+        # lines before the first complete record in the file
+        if self._continuation:
+            record, self._continuation = self._continuation[::-1], []
+            if not self.filtered:
+                yield record
+
+    def _next_page(self, records: typing.Iterator[typing.List[str]]) -> typing.Optional[str]:
+        lines = []  # newest first
+        size = 0
+        while True:
+            record, self._carry = self._carry or next(records, None), None
+            if record is None:
+                break
+
+            for i in range(len(record) - 1, -1, -1):
+                line = record[i] + "\n"
+                if len(line) > PAGE_SIZE:
+                    line = line[: PAGE_SIZE - 6] + "[...]\n"
+                if lines and size + len(line) > PAGE_SIZE:
+                    self._carry = record[: i + 1]
+                    return CODE_BLOCK_START + "".join(reversed(lines)) + CODE_BLOCK_END
+                lines.append(line)
+                size += len(line)
+
+        if not lines:
+            return None
+        return CODE_BLOCK_START + "".join(reversed(lines)) + CODE_BLOCK_END
+
+    def read_pages(self, count: int) -> typing.List[str]:
+        """
+        Read up to `count` pages older than the ones read so far.
+
+        Returns
+        -------
+        List[str]
+            The pages in chronological order, each a code block of at most 2000 characters.
+            Empty once the start of the file is reached.
+        """
+        if self.exhausted:
+            return []
+
+        pages = []
+        try:
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if self._position is None:
+                    self._position = stat.st_size
+                    self._inode = stat.st_ino
+                elif stat.st_ino != self._inode or stat.st_size < self._position:
+                    logger.debug("Log file %s was rotated or cleared while reading it.", self.path)
+                    self.exhausted = True
+                    return []
+
+                records = self._iter_records(f)
+                while len(pages) < count:
+                    page = self._next_page(records)
+                    if page is None:
+                        self.exhausted = True
+                        break
+                    pages.append(page)
+        except FileNotFoundError:
+            self.exhausted = True
+        return pages[::-1]
+
+
+async def iter_file_chunks(path: str, chunk_size: int = 64 * 1024) -> typing.AsyncIterator[bytes]:
+    """Read a file in chunks without blocking the event loop, e.g. to stream it in a request body."""
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(None, open, path, "rb")
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
@@ -0,0 +1,162 @@
+import asyncio
+import statistics
+import sys
+import threading
+import time
+import traceback
+import typing
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+
+class Stall(typing.NamedTuple):
+    started_at: datetime
+    duration: float  # seconds
+    task: typing.Optional[str]  # the task that was running, if one was
+    stack: typing.Optional[str]  # the stack of the event loop thread while it was blocked
+
+
+class LoopMonitor:
+    """
+    Measures how late the event loop runs its callbacks.
+
+    A task wakes up every `interval` seconds and records how much later than
+    scheduled it was woken up. A watchdog thread checks that the task keeps waking
+    up, and if it has not for longer than `threshold`, captures the stack of the
+    event loop thread and the task that is running, i.e. the code that is blocking
+    the loop. Stalls are logged once the loop is responsive again.
+
+    Parameters
+    ----------
+    threshold : float
+        Seconds of lag after which the loop is considered blocked.
+    interval : float
+        Seconds between two measurements.
+    """
+
+    HISTORY = 20  # number of stalls kept
+
+    def __init__(self, threshold: float, *, interval: float = 0.25):
+        self.threshold = threshold
+        self.interval = interval
+        self.samples: typing.Deque[float] = deque(maxlen=int(300 / interval))  # the last 5 minutes
+        self.stalls: typing.Deque[Stall] = deque(maxlen=self.HISTORY)
+        self.stall_count = 0
+        self.max_lag = 0.0
+        self.started_at: typing.Optional[datetime] = None
+
+        self._loop: typing.Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: typing.Optional[int] = None
+        self._task: typing.Optional[asyncio.Task] = None
+        self._watchdog: typing.Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._last_beat = 0.0
+        # (beat, task, stack) captured by the watchdog for the current stall
+        self._captured: typing.Optional[typing.Tuple[float, typing.Optional[str], str]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self.started_at = datetime.now(timezone.utc)
+
+        self._task = self._loop.create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="LoopMonitor", daemon=True)
+        self._watchdog.start()
+        logger.debug("Monitoring the event loop, threshold %.0f ms.", self.threshold * 1000)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            previous, self._last_beat = self._last_beat, now
+            self._record(max(0.0, now - expected), previous)
+
+    def _record(self, lag: float, previous_beat: float) -> None:
+        self.samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if lag < self.threshold:
+            return
+
+        captured, self._captured = self._captured, None
+        if captured is not None and captured[0] == previous_beat:
+            task, stack = captured[1:]
+        else:
+            task, stack = None, None
+        stall = Stall(datetime.now(timezone.utc) - timedelta(seconds=lag), lag, task, stack)
+        self.stalls.append(stall)
+        self.stall_count += 1
+
+        if stack is not None:
+            logger.warning(
+                "Event loop was blocked for %.0f ms by %s:\n%s", lag * 1000, task or "a callback", stack
+            )
+        else:
+            logger.warning("Event loop was blocked for %.0f ms.", lag * 1000)
+
+    def _watch(self) -> None:
+        check_interval = min(self.threshold / 2, 0.1)
+        while not self._stopped.wait(check_interval):
+            beat = self._last_beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or (self._captured is not None and self._captured[0] == beat):
+                continue
+            try:
+                self._captured = (beat, *self._capture())
+            except Exception:
+                logger.debug("Failed to capture the event loop stack.", exc_info=True)
+
+    def _capture(self) -> typing.Tuple[typing.Optional[str], str]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        frames = traceback.extract_stack(frame) if frame is not None else []
+        # skip the event loop internals the blocking callback was called from
+        for i in range(len(frames) - 1, -1, -1):
+            if frames[i].filename == asyncio.events.__file__ and frames[i].name == "_run":
+                frames = frames[i + 1 :]
+                break
+        stack = "".join(traceback.format_list(frames[-25:]))
+
+        task = asyncio.current_task(self._loop)
+        description = None
+        if task is not None:
+            coro = task.get_coro()
+            description = f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+        return description, stack
+
+    def stats(self) -> typing.Dict[str, float]:
+        """Lag statistics over the last 5 minutes in seconds, and since the start for `max` and `stalls`."""
+        samples = sorted(self.samples)
+        if not samples:
+            return {}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+        return {
+            "current": self.samples[-1],
+            "mean": statistics.fmean(samples),
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": self.max_lag,
+            "stalls": self.stall_count,
+        }
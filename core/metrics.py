@@ -0,0 +1,367 @@
+import asyncio
+import bisect
+import logging
+import math
+import time
+import typing
+from contextlib import contextmanager
+
+from aiohttp import web
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+LabelValues = typing.Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: typing.Dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Metric:
+    """
+    Base class of the metrics, a metric holds one value per combination of label values.
+
+    Parameters
+    ----------
+    name : str
+        The name of the metric.
+    documentation : str
+        What the metric measures, exported as its help text.
+    labelnames : Sequence[str]
+        The names of the labels the metric is partitioned by.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: typing.Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: typing.Dict[str, typing.Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues, **extra) -> typing.Dict[str, str]:
+        labels = dict(zip(self.labelnames, key))
+        labels.update(extra)
+        return labels
+
+    def samples(self) -> typing.Iterator[typing.Tuple[str, typing.Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> typing.List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """A value that only goes up, such as the number of DMs received."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: typing.Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: typing.Dict[LabelValues, float] = {}
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield self.name, self._labels(key), value
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down, such as a queue depth.
+
+    The value is read from `callback` when the metrics are collected. The callback
+    returns a number, or a mapping of label values to numbers if the gauge has labels.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: typing.Callable[[], typing.Union[float, typing.Mapping[LabelValues, float]]],
+        labelnames: typing.Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self):
+        try:
+            values = self.callback()
+        except Exception:
+            logger.debug("Failed to collect gauge %s.", self.name, exc_info=True)
+            return
+        if not self.labelnames:
+            yield self.name, {}, values
+            return
+        for key, value in values.items():
+            yield self.name, self._labels(key), value
+
+
+class Histogram(Metric):
+    """A distribution of observed values, such as request latencies in seconds."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: typing.Sequence[str] = (),
+        buckets: typing.Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: [count per bucket..., count over the last bucket], sum
+        self._counts: typing.Dict[LabelValues, typing.List[int]] = {}
+        self._sums: typing.Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how many seconds the body of the with statement took."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", self._labels(key, le=_format_value(bound)), cumulative
+            yield f"{self.name}_sum", self._labels(key), self._sums[key]
+            yield f"{self.name}_count", self._labels(key), cumulative
+
+
+class MetricsRegistry:
+    """A collection of metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics: typing.Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class RateLimitHandler(logging.Handler):
+    """
+    Counts the rate limits discord.py logs, it does not expose them in any other way.
+
+    Every 429 of the bot's HTTP client is logged as a route rate limit, and a global
+    one is logged again right after. Route rate limits are therefore only counted once
+    the event loop is back in control, unless the global warning followed, in which
+    case the 429 is counted as global alone. Webhook rate limits are logged by the
+    webhook adapter. Attach the handler to the ``discord.http`` and
+    ``discord.webhook.async_`` loggers.
+    """
+
+    LOGGERS = ("discord.http", "discord.webhook.async_")
+
+    def __init__(self, counter: Counter):
+        super().__init__(logging.WARNING)
+        self.counter = counter
+        self._pending = 0  # route rate limits that may still turn out to be global
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not isinstance(record.msg, str):
+            return
+        if record.msg.startswith("We are being rate limited."):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.counter.inc(scope="route")
+                return
+            self._pending += 1
+            if self._pending == 1:
+                loop.call_soon(self._flush)
+        elif record.msg.startswith("Global rate limit has been hit."):
+            self._pending = max(0, self._pending - 1)
+            self.counter.inc(scope="global")
+        elif record.msg.startswith("Webhook ID") and "is rate limited" in record.msg:
+            self.counter.inc(scope="webhook")
+
+    def _flush(self) -> None:
+        if self._pending:
+            self.counter.inc(self._pending, scope="route")
+            self._pending = 0
+
+
+class ModmailMetrics(MetricsRegistry):
+    """
+    The metrics of the Modmail bot.
+
+    Counters and histograms are updated where the events happen, gauges are read
+    from the bot when the metrics are collected.
+
+    Parameters
+    ----------
+    bot : ModmailBot
+        The Modmail bot.
+    """
+
+    def __init__(self, bot):
+        super().__init__()
+        self.bot = bot
+
+        self.dms_received = self.register(
+            Counter("modmail_dms_received_total", "DMs received from recipients.")
+        )
+        self.dms_relayed = self.register(
+            Counter("modmail_dms_relayed_total", "DMs relayed to a thread channel.")
+        )
+        self.thread_send_seconds = self.register(
+            Histogram(
+                "modmail_thread_send_seconds",
+                "Time taken by Thread.reply and Thread.send.",
+                ["method"],
+            )
+        )
+        self.api_call_seconds = self.register(
+            # queries run on bot.api.db or bot.api.logs directly are not included
+            Histogram("modmail_api_call_seconds", "Time taken by ApiClient method calls.", ["method"])
+        )
+        self.thread_cache_lookups = self.register(
+            Counter(
+                "modmail_thread_cache_lookups_total",
+                "Thread lookups by whether the thread was cached.",
+                ["result"],
+            )
+        )
+        self.config_writes = self.register(
+            Counter("modmail_config_writes_total", "Configuration writes to the database.")
+        )
+        self.rate_limits = self.register(
+            Counter("modmail_discord_rate_limits_total", "Discord HTTP rate limits hit.", ["scope"])
+        )
+        self.register(
+            Gauge(
+                "modmail_dm_queue_depth",
+                "DMs waiting to be processed.",
+                lambda: self.bot.dm_workers.stats()["queued"],
+            )
+        )
+        self.register(
+            Gauge(
+                "modmail_threads",
+                "Cached threads by state.",
+                self._thread_counts,
+                ["state"],
+            )
+        )
+        if self.bot.loop_monitor is not None:
+            samples = self.bot.loop_monitor.samples
+            self.register(
+                Gauge(
+                    "modmail_event_loop_lag_seconds",
+                    "The most recently measured event loop lag.",
+                    lambda: samples[-1] if samples else 0,
+                )
+            )
+
+        self._rate_limit_handler = RateLimitHandler(self.rate_limits)
+        for name in RateLimitHandler.LOGGERS:
+            logging.getLogger(name).addHandler(self._rate_limit_handler)
+
+    def _thread_counts(self) -> typing.Dict[LabelValues, int]:
+        snoozed = sum(1 for thread in self.bot.threads if thread.snoozed)
+        return {("open",): len(self.bot.threads) - snoozed, ("snoozed",): snoozed}
+
+
+class MetricsServer:
+    """
+    Serves the metrics over HTTP at ``/metrics``, for Prometheus to scrape.
+
+    Parameters
+    ----------
+    registry : MetricsRegistry
+        The metrics to serve.
+    host : str
+        The address to bind to.
+    port : int
+        The port to listen on.
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str, port: int):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: typing.Optional[web.AppRunner] = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        try:
+            await site.start()
+        except OSError as e:
+            logger.error("Failed to serve metrics on %s:%s: %s", self.host, self.port, e)
+            await self.stop()
+            return
+        logger.info("Serving metrics on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
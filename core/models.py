@@ -1,16 +1,22 @@
+import atexit
+import contextlib
+import copy
 import json
 import logging
 import os
+import queue
 import re
 import sys
+import time
 import _string
 
 from difflib import get_close_matches
 from enum import IntEnum
 from logging import FileHandler, StreamHandler, Handler
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from contextvars import ContextVar
 from string import Formatter
-from typing import Dict, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 import discord
 from discord.ext import commands
@@ -21,6 +27,11 @@ try:
 except ImportError:
     Fore = Style = type("Dummy", (object,), {"__getattr__": lambda self, item: ""})()
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 if ".heroku" in os.environ.get("PYTHONHOME", ""):
     # heroku
@@ -75,10 +86,34 @@ class ModmailLogger(logging.Logger):
             )
 
 
+log_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+
+@contextlib.contextmanager
+def logging_context(**fields):
+    """
+    Attach fields, such as ``thread_id`` or ``command``, to every record logged in this block.
+
+    The fields are included in JSON formatted logs. `None` values are ignored.
+    """
+    token = log_context.set({**log_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        log_context.reset(token)
+
+
+def update_log_context(**fields) -> None:
+    """Like `logging_context`, but for the remainder of the current task."""
+    log_context.set({**log_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+
+
 class JsonFormatter(logging.Formatter):
     """
     Formatter that outputs JSON strings after parsing the LogRecord.
 
+    Fields set with `logging_context` when the record was logged are added under ``context``.
+
     Parameters
     ----------
     fmt_dict : Optional[Dict[str, str]]
@@ -137,6 +172,15 @@ class JsonFormatter(logging.Formatter):
         if record.stack_info:
             message_dict["stack_info"] = self.formatStack(record.stack_info)
 
+        # Records written by the log queue carry the context they were logged in.
+        context = getattr(record, "log_context", None)
+        if context is None:
+            context = log_context.get()
+        if context:
+            message_dict["context"] = context
+
+        if orjson is not None:
+            return orjson.dumps(message_dict, default=str).decode("utf-8")
         return json.dumps(message_dict, default=str)
 
 
@@ -249,26 +293,161 @@ def create_log_handler(
     return handler
 
 
+class LogQueueHandler(QueueHandler):
+    """
+    Puts log records on a bounded queue for a `LogQueueListener` to write.
+
+    Records are tagged with the `route` of the handler, which decides which
+    handlers the listener writes them to. When the queue is full, records are
+    dropped and counted instead of blocking the event loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue, route: str):
+        super().__init__(log_queue)
+        self.route = route
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the default, keep the record unformatted so the listener's handlers can
+        # apply their own formatters. Only the arguments are merged, as they may change
+        # once the call returns.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.log_route = self.route
+        record.log_context = log_context.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogQueueListener(QueueListener):
+    """
+    Writes queued log records from a dedicated thread.
+
+    Dropped records are reported in the log at most every `REPORT_INTERVAL` seconds.
+
+    Parameters
+    ----------
+    log_queue : queue.Queue
+        The queue shared with the `LogQueueHandler` instances.
+    routes : Dict[str, List[Handler]]
+        The handlers to write records to, by the route of the queue handler.
+    """
+
+    REPORT_INTERVAL = 10
+
+    def __init__(self, log_queue: queue.Queue, routes: Dict[str, List[Handler]]):
+        super().__init__(log_queue, respect_handler_level=True)
+        self.routes = routes
+        self.queue_handlers: List[LogQueueHandler] = []
+        self._reported_drops = 0
+        self._last_report = 0.0
+
+    @property
+    def dropped(self) -> int:
+        return sum(h.dropped for h in self.queue_handlers)
+
+    def handle(self, record: logging.LogRecord) -> None:
+        if time.monotonic() - self._last_report >= self.REPORT_INTERVAL:
+            self._report_drops()
+        self._emit(record)
+
+    def _report_drops(self) -> None:
+        self._last_report = time.monotonic()
+        dropped = self.dropped
+        if dropped != self._reported_drops:
+            count, self._reported_drops = dropped - self._reported_drops, dropped
+            self._emit(
+                logging.makeLogRecord(
+                    {
+                        "name": __name__,
+                        "levelno": logging.WARNING,
+                        "levelname": "WARNING",
+                        "msg": f"The log queue was full, {count} record(s) were dropped.",
+                        "log_route": "modmail",
+                    }
+                )
+            )
+
+    def _emit(self, record: logging.LogRecord) -> None:
+        for handler in self.routes.get(getattr(record, "log_route", None), ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def enqueue_sentinel(self) -> None:
+        # The queue may be full, wait for room rather than losing the sentinel.
+        self.queue.put(self._sentinel)
+
+    def stop(self) -> None:
+        """Write all queued records, stop the thread and flush the handlers."""
+        if self._thread is None:
+            return
+        super().stop()
+        self._report_drops()
+        for handler in {h for handlers in self.routes.values() for h in handlers}:
+            handler.flush()
+
+
 logging.setLoggerClass(ModmailLogger)
 log_level = logging.INFO
 loggers = set()
 
+# Bound on records waiting to be written, beyond which records are dropped.
+LOG_QUEUE_SIZE = 10000
+
 ch = create_log_handler(level=log_level)
 ch_debug: Optional[RotatingFileHandler] = None
+queue_handler: Optional[LogQueueHandler] = None
+log_listener: Optional[LogQueueListener] = None
 
 
 def getLogger(name=None) -> ModmailLogger:
     logger = logging.getLogger(name)
     logger.setLevel(log_level)
-    logger.addHandler(ch)
-    if ch_debug is not None:
-        logger.addHandler(ch_debug)
+    if queue_handler is not None:
+        logger.addHandler(queue_handler)
+    else:
+        logger.addHandler(ch)
+        if ch_debug is not None:
+            logger.addHandler(ch_debug)
     loggers.add(logger)
     return logger
 
 
+def stop_logging() -> None:
+    """
+    Write out all queued log records and stop the writer thread. Called on shutdown.
+
+    Loggers write directly to their handlers afterwards.
+    """
+    global queue_handler, log_listener
+    if log_listener is None:
+        return
+    listener, log_listener, queue_handler = log_listener, None, None
+
+    for handler in listener.queue_handlers:
+        for log in (*loggers, logging.getLogger("discord")):
+            if handler in log.handlers:
+                log.removeHandler(handler)
+                for target in listener.routes[handler.route]:
+                    log.addHandler(target)
+    listener.stop()
+
+
+def log_queue_depth() -> int:
+    """The number of log records waiting to be written."""
+    if log_listener is None:
+        return 0
+    return log_listener.queue.qsize()
+
+
 def configure_logging(bot) -> None:
-    global ch_debug, log_level, ch
+    global ch_debug, log_level, ch, queue_handler, log_listener
 
     stream_log_format, file_log_format = (
         bot.config["stream_log_format"],
@@ -311,7 +490,6 @@ def configure_logging(bot) -> None:
 
     for log in loggers:
         log.setLevel(log_level)
-        log.addHandler(ch_debug)
 
     # Set up discord.py logging
     d_level_text = bot.config["discord_log_level"].upper()
@@ -334,8 +512,24 @@ def configure_logging(bot) -> None:
         logger.info("Discord logging level (logfile): %s.", logging.getLevelName(d_level))
     else:
         logger.info("Discord logging level: %s.", logging.getLevelName(d_level))
-    d_logger.addHandler(stream_handler)
-    d_logger.addHandler(ch_debug)
+
+    # From here on records are written by a dedicated thread, so disk I/O,
+    # formatting and rollovers no longer happen on the event loop.
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    log_listener = LogQueueListener(
+        log_queue,
+        {"modmail": [ch, ch_debug], "discord": [stream_handler, ch_debug]},
+    )
+    queue_handler = LogQueueHandler(log_queue, "modmail")
+    d_queue_handler = LogQueueHandler(log_queue, "discord")
+    log_listener.queue_handlers = [queue_handler, d_queue_handler]
+    log_listener.start()
+    atexit.register(stop_logging)
+
+    for log in loggers:
+        log.removeHandler(ch)
+        log.addHandler(queue_handler)
+    d_logger.addHandler(d_queue_handler)
 
     logger.debug("Successfully configured logging.")
 
@@ -474,6 +668,25 @@ class DummyMessage:
         return
 
 
+class MessageRoute(NamedTuple):
+    """
+    How a guild message is handled, resolved once per message.
+
+    Built by `ModmailBot.route_message` and passed from `on_message` to
+    `process_commands`, so the thread lookup and the prefix, snippet and alias
+    parsing are not repeated.
+    """
+
+    thread: Optional[Any]  # the Thread of the channel, if it is a thread channel
+    contexts: Tuple[commands.Context, ...]
+    permissions: discord.Permissions  # of the author in the channel
+
+    @property
+    def is_command(self) -> bool:
+        """Whether the message invokes a command, snippet or alias."""
+        return any(ctx.command for ctx in self.contexts)
+
+
 class PermissionLevel(IntEnum):
     OWNER = 5
     ADMINISTRATOR = 4
@@ -117,7 +117,7 @@ class PaginatorSession:
         """
         Create a base `Message`.
         """
-        if len(self.pages) == 1:
+        if self.first_page() == self.last_page():
             self.view = None
             self.running = False
         else:
@@ -381,9 +381,12 @@ class MessagePaginatorSession(PaginatorSession):
         else:
             raise TypeError("Page must be a str object.")
 
+    def _page_count(self) -> str:
+        return str(len(self.pages))
+
     def _set_footer(self):
         if self.embed is not None:
-            footer_text = f"Page {self.current + 1} of {len(self.pages)}"
+            footer_text = f"Page {self.current + 1} of {self._page_count()}"
             if self.footer_text:
                 footer_text = footer_text + " • " + self.footer_text
 
@@ -401,3 +404,53 @@ class MessagePaginatorSession(PaginatorSession):
     def _show_page(self, page) -> typing.Dict:
         self._set_footer()
         return dict(content=page, embed=self.embed)
+
+
+class LazyMessagePaginatorSession(MessagePaginatorSession):
+    """
+    A `MessagePaginatorSession` that loads older pages on demand.
+
+    The session starts with the most recent pages and calls `load_older` whenever
+    the user navigates past the first loaded page, until it returns no pages.
+
+    Parameters
+    ----------
+    ctx : Context
+        The context of the command.
+    load_older : Callable[[], Awaitable[List[str]]]
+        Returns the pages that precede the loaded ones, in chronological order.
+    has_older : bool
+        Whether there may be pages before `messages`.
+    """
+
+    def __init__(
+        self,
+        ctx: commands.Context,
+        *messages,
+        load_older,
+        has_older: bool = True,
+        embed: Embed = None,
+        **options,
+    ):
+        super().__init__(ctx, *messages, embed=embed, **options)
+        self.load_older = load_older
+        self.has_older = has_older
+
+    async def show_page(self, index: int) -> typing.Optional[typing.Dict]:
+        if index < 0 and self.has_older:
+            older = await self.load_older()
+            if older:
+                self.pages[:0] = older
+                self.current += len(older)
+                index += len(older)
+            else:
+                self.has_older = False
+            index = max(index, 0)
+        return await super().show_page(index)
+
+    def first_page(self):
+        """Returns the index of the first page, -1 if older pages can be loaded"""
+        return -1 if self.has_older else 0
+
+    def _page_count(self) -> str:
+        return f"{len(self.pages)}+" if self.has_older else str(len(self.pages))
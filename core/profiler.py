@@ -0,0 +1,138 @@
+import asyncio
+import collections
+import inspect
+import sys
+import time
+import typing
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def loop_idle_stack() -> typing.Optional[typing.Tuple[str, ...]]:
+    """
+    The stack the calling thread is left with while its event loop waits for events.
+
+    Must be called from a coroutine running on the loop. The stock asyncio loops wait
+    in `selectors`, which `StackSampler` recognises by itself, so `None` is returned
+    for them. Loops implemented in C, like uvloop's, leave no Python frame of their
+    own: the stack ends at the frame that started the loop, e.g. in `asyncio.run`.
+    """
+    if isinstance(asyncio.get_running_loop(), asyncio.BaseEventLoop):
+        return None
+    frame = sys._getframe(1)
+    # the coroutines of the running task sit right on top of that frame
+    while frame is not None and frame.f_code.co_flags & inspect.CO_COROUTINE:
+        frame = frame.f_back
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class StackSampler:
+    """
+    A statistical profiler that samples the stack of one thread, e.g. the event loop's.
+
+    Sampling runs in the calling thread, call `run` in an executor. The interval
+    between samples is stretched if taking them costs more than `max_overhead` of
+    the time, so profiling a busy bot never slows it down noticeably.
+
+    Parameters
+    ----------
+    thread_id : int
+        The identifier of the thread to profile, as returned by `threading.get_ident`.
+    interval : float
+        Seconds between samples.
+    max_overhead : float
+        The largest share of time spent sampling.
+    idle_stack : Tuple[str, ...], optional
+        The stack of the thread while its event loop is idle, if the loop does not
+        wait in `selectors`. See `loop_idle_stack`.
+    """
+
+    def __init__(
+        self,
+        thread_id: int,
+        *,
+        interval: float = 0.005,
+        max_overhead: float = 0.02,
+        idle_stack: typing.Optional[typing.Tuple[str, ...]] = None,
+    ):
+        self.thread_id = thread_id
+        self.idle_stack = idle_stack
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.stacks: typing.Counter[typing.Tuple[str, ...]] = collections.Counter()
+        self.samples = 0
+        self.sampling_time = 0.0
+        self.duration = 0.0
+        self._labels: typing.Dict[typing.Any, str] = {}
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = _frame_label(code)
+            stack.append(label)
+            frame = frame.f_back
+        stack.reverse()
+        self.stacks[tuple(stack)] += 1
+        self.samples += 1
+
+    def run(self, duration: float) -> "StackSampler":
+        """Sample the thread for `duration` seconds."""
+        start = time.perf_counter()
+        deadline = start + duration
+        while True:
+            before = time.perf_counter()
+            if before >= deadline:
+                break
+            self._sample()
+            cost = time.perf_counter() - before
+            self.sampling_time += cost
+            time.sleep(max(self.interval, cost * (1 / self.max_overhead - 1)))
+        self.duration = time.perf_counter() - start
+        return self
+
+    def collapsed(self) -> str:
+        """
+        The samples in the collapsed stack format, one ``frame;frame;frame count`` line per stack.
+
+        It can be rendered by flamegraph.pl, speedscope, or other flame graph tools.
+        """
+        return "".join(
+            f"{';'.join(frame.replace(';', ':') for frame in stack)} {count}\n"
+            for stack, count in self.stacks.most_common()
+        )
+
+    def is_idle(self, stack: typing.Tuple[str, ...]) -> bool:
+        """Whether the event loop was waiting for events in `stack`."""
+        if self.idle_stack is not None:
+            return stack == self.idle_stack
+        return len(stack) > 1 and stack[-1].startswith("select (") and stack[-2].startswith("_run_once (")
+
+    def top_functions(self, limit: int = 10, *, idle: bool = True) -> typing.List[typing.Tuple[str, int]]:
+        """
+        The functions the thread was running in the most samples, not counting the ones they called.
+
+        Samples taken while the event loop was idle are left out if `idle` is `False`.
+        """
+        counter = collections.Counter()
+        for stack, count in self.stacks.items():
+            if idle or not self.is_idle(stack):
+                counter[stack[-1]] += count
+        return counter.most_common(limit)
+
+    def idle_samples(self) -> int:
+        """Samples taken while the event loop was waiting for events."""
+        return sum(count for stack, count in self.stacks.items() if self.is_idle(stack))
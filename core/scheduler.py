@@ -0,0 +1,260 @@
+import asyncio
+import heapq
+import itertools
+import time
+import typing
+from datetime import datetime, timezone
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+
+class DeadlineScheduler:
+    """
+    Runs a callback when deadlines are reached, from a single background task.
+
+    Deadlines are kept in a min-heap keyed by an arbitrary hashable key, and the
+    task sleeps until the earliest one is due (or until an earlier deadline is
+    scheduled). Rescheduling or cancelling a key is O(log n): the previous heap
+    entry is left in place and skipped once it surfaces.
+
+    Parameters
+    ----------
+    bot : ModmailBot
+        The Modmail bot.
+    callback : Callable[[Hashable], Awaitable[None]]
+        Awaited with the key of every deadline that is reached.
+    name : str
+        Used in log messages.
+    """
+
+    def __init__(self, bot, callback: typing.Callable[..., typing.Awaitable[None]], *, name: str):
+        self.bot = bot
+        self.callback = callback
+        self.name = name
+        self._heap: typing.List[typing.Tuple[float, int, typing.Hashable]] = []
+        self._deadlines: typing.Dict[typing.Hashable, float] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: typing.Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key) -> bool:
+        return key in self._deadlines
+
+    def get(self, key) -> typing.Optional[datetime]:
+        """Get the deadline of a key, if one is scheduled."""
+        ts = self._deadlines.get(key)
+        return datetime.fromtimestamp(ts, timezone.utc) if ts is not None else None
+
+    def schedule(self, key, when: datetime) -> None:
+        """Schedule or move the deadline of `key`."""
+        ts = when.timestamp()
+        self._deadlines[key] = ts
+        heapq.heappush(self._heap, (ts, next(self._counter), key))
+
+        # Drop entries left behind by rescheduling once they dominate the heap.
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(t, n, k) for t, n, k in self._heap if self._deadlines.get(k) == t]
+            heapq.heapify(self._heap)
+
+        if self._heap[0][0] == ts:
+            self._wakeup.set()
+
+    def cancel(self, key) -> bool:
+        """Cancel the deadline of `key`. Returns whether one was scheduled."""
+        return self._deadlines.pop(key, None) is not None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _pop_stale(self) -> None:
+        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    async def _run(self) -> None:
+        await self.bot.wait_until_ready()
+        while True:
+            self._pop_stale()
+            self._wakeup.clear()
+
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, key = heapq.heappop(self._heap)
+            del self._deadlines[key]
+            self.bot.loop.create_task(self._fire(key))
+
+    async def _fire(self, key) -> None:
+        try:
+            await self.callback(key)
+        except Exception:
+            logger.error("Scheduled %s callback for %s failed.", self.name, key, exc_info=True)
+
+
+class JobScheduler:
+    """
+    Durable scheduled jobs, such as delayed and automatic thread closures.
+
+    Jobs live in memory and are timed by a `DeadlineScheduler`. Persistence is
+    write-behind: scheduling, rescheduling or cancelling a job only marks it dirty,
+    and dirty jobs are written to the database in one batch every `flush_interval`
+    seconds and on shutdown. All pending jobs are loaded with a single query at startup.
+
+    A job is identified by its kind and target (e.g. ``("auto_close", recipient_id)``),
+    scheduling the same pair again moves the existing job instead of adding one.
+
+    Parameters
+    ----------
+    bot : ModmailBot
+        The Modmail bot.
+    flush_interval : float
+        How often dirty jobs are written to the database, in seconds.
+    """
+
+    def __init__(self, bot, *, flush_interval: float = 5):
+        self.bot = bot
+        self.flush_interval = flush_interval
+        self._jobs: typing.Dict[typing.Tuple[str, int], dict] = {}
+        self._dirty: typing.Dict[typing.Tuple[str, int], typing.Optional[dict]] = {}
+        self._handlers: typing.Dict[str, typing.Callable[[int, dict], typing.Awaitable[None]]] = {}
+        self._timers = DeadlineScheduler(bot, self._run_job, name="job")
+        self._flush_task: typing.Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._started = False
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def register(self, kind: str, handler: typing.Callable[[int, dict], typing.Awaitable[None]]) -> None:
+        """Register the coroutine function run with ``(target, data)`` when a job of `kind` is due."""
+        self._handlers[kind] = handler
+
+    def get(self, kind: str, target: int) -> typing.Optional[dict]:
+        """Get a pending job, if there is one."""
+        return self._jobs.get((kind, target))
+
+    def schedule(self, kind: str, target: int, when: datetime, **data) -> dict:
+        """Schedule a job, or move the pending job with the same kind and target."""
+        key = (kind, target)
+        job = {"kind": kind, "target": target, "run_at": when, "data": data}
+        self._jobs[key] = job
+        self._dirty[key] = job
+        self._timers.schedule(key, when)
+        return job
+
+    def cancel(self, kind: str, target: int) -> bool:
+        """Cancel a pending job. Returns whether there was one."""
+        key = (kind, target)
+        self._timers.cancel(key)
+        if self._jobs.pop(key, None) is None:
+            return False
+        self._dirty[key] = None
+        return True
+
+    async def start(self) -> None:
+        """Load pending jobs and start running them. Subsequent calls do nothing."""
+        if self._started:
+            return
+        self._started = True
+
+        for doc in await self.bot.api.get_scheduled_jobs():
+            run_at = doc["run_at"]
+            if run_at.tzinfo is None:
+                run_at = run_at.replace(tzinfo=timezone.utc)
+            key = (doc["kind"], int(doc["target"]))
+            if key in self._jobs:
+                # Scheduled again before the stored jobs were loaded
+                continue
+            job = {"kind": doc["kind"], "target": int(doc["target"]), "run_at": run_at, "data": doc["data"]}
+            self._jobs[key] = job
+            self._timers.schedule(key, run_at)
+
+        await self._migrate_closures()
+
+        logger.info("There are %d scheduled job(s) pending.", len(self._jobs))
+        self._timers.start()
+        self._flush_task = self.bot.loop.create_task(self._flush_loop())
+
+    async def _migrate_closures(self) -> None:
+        """Move closures stored in the config by older versions into the job store."""
+        closures = self.bot.config["closures"]
+        if not closures:
+            return
+
+        for recipient_id, items in closures.items():
+            auto_close = items.get("auto_close", False)
+            self.schedule(
+                "auto_close" if auto_close else "close",
+                int(recipient_id),
+                datetime.fromisoformat(items["time"]).astimezone(timezone.utc),
+                closer_id=items["closer_id"],
+                silent=items["silent"],
+                delete_channel=items["delete_channel"],
+                message=items["message"],
+                auto_close=auto_close,
+            )
+        logger.info("Migrated %d closure(s) from the config to scheduled jobs.", len(closures))
+        await self.flush()
+        self.bot.config["closures"] = {}
+        await self.bot.config.update()
+
+    async def stop(self) -> None:
+        """Stop running jobs and persist any pending changes."""
+        self._timers.stop()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._started:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write dirty jobs to the database in one batch."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, {}
+            upserts = [job for job in dirty.values() if job is not None]
+            deletes = [(kind, target) for (kind, target), job in dirty.items() if job is None]
+            try:
+                await self.bot.api.update_scheduled_jobs(upserts, deletes)
+            except Exception:
+                logger.error("Failed to persist scheduled jobs.", exc_info=True)
+                # Keep the changes for the next flush, unless they were superseded meanwhile.
+                for key, job in dirty.items():
+                    self._dirty.setdefault(key, job)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def _run_job(self, key: typing.Tuple[str, int]) -> None:
+        job = self._jobs.pop(key, None)
+        if job is None:
+            return
+        self._dirty[key] = None
+
+        handler = self._handlers.get(job["kind"])
+        if handler is None:
+            logger.warning("No handler registered for scheduled %s job, dropping it.", job["kind"])
+            return
+        await handler(job["target"], job["data"])
@@ -0,0 +1,288 @@
+import json
+import re
+import time
+import typing
+import zlib
+
+import discord
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+# How many messages go into one compressed snapshot chunk. Each chunk is stored as its
+# own document, so this also bounds the memory used while capturing or restoring.
+SNAPSHOT_CHUNK_SIZE = 100
+
+
+def serialize_message(bot, message: discord.Message) -> dict:
+    """Convert a thread channel message into the dict stored in a snooze snapshot."""
+    embed_author = message.embeds[0].author if message.embeds else None
+    author_name = getattr(embed_author, "name", None) or ""
+
+    if author_name.startswith("📝 Note") or author_name.startswith("📝 Persistent Note"):
+        type_ = "mod_only"
+    else:
+        type_ = None
+
+    if message.author == bot.user:
+        name = author_name.split(" (")[0] if embed_author else None
+        avatar = getattr(embed_author, "icon_url", None) if embed_author else None
+    else:
+        name = getattr(message.author, "name", None)
+        avatar = message.author.display_avatar.url
+
+    return {
+        "author_id": message.author.id,
+        "content": message.content,
+        "attachments": [a.url for a in message.attachments],
+        "embeds": [e.to_dict() for e in message.embeds],
+        "created_at": message.created_at.isoformat(),
+        "type": type_,
+        "author_name": name,
+        "author_avatar": avatar,
+    }
+
+
+def is_genesis_message(message: dict) -> bool:
+    """Whether a snapshot message is the thread's genesis (info) message."""
+    return any(
+        field.get("name") == "Roles"
+        for embed in message.get("embeds") or []
+        if embed
+        for field in embed.get("fields") or []
+    )
+
+
+def encode_chunk(messages: typing.List[dict]) -> bytes:
+    return zlib.compress(json.dumps(messages, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_chunk(data: bytes) -> typing.List[dict]:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+async def capture_history(
+    bot,
+    snapshot_id: str,
+    channel: discord.TextChannel,
+    *,
+    progress: typing.Optional[typing.Callable[[int], typing.Awaitable[None]]] = None,
+) -> dict:
+    """
+    Stream the history of a thread channel into the snapshot store.
+
+    Messages are read oldest first and written in compressed chunks of
+    `SNAPSHOT_CHUNK_SIZE`, so only one chunk is held in memory at a time.
+
+    Parameters
+    ----------
+    bot : ModmailBot
+        The Modmail bot.
+    snapshot_id : str
+        The identifier to store the chunks under.
+    channel : discord.TextChannel
+        The channel to capture.
+    progress : Callable[[int], Awaitable[None]], optional
+        Called with the running message count after every stored chunk.
+
+    Returns
+    -------
+    dict
+        Snapshot metadata to keep on the log document.
+    """
+    await bot.api.delete_snooze_snapshot(snapshot_id)
+
+    chunk = []
+    chunks = 0
+    count = 0
+
+    async def flush():
+        nonlocal chunk, chunks
+        await bot.api.save_snooze_chunk(snapshot_id, chunks, encode_chunk(chunk), len(chunk))
+        chunks += 1
+        chunk = []
+        if progress is not None:
+            try:
+                await progress(count)
+            except Exception:
+                logger.debug("Failed to report snooze capture progress.", exc_info=True)
+
+    async for message in channel.history(limit=None, oldest_first=True):
+        chunk.append(serialize_message(bot, message))
+        count += 1
+        if len(chunk) >= SNAPSHOT_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+
+    logger.debug("Captured %d messages in %d chunks for snapshot %s.", count, chunks, snapshot_id)
+    return {"id": snapshot_id, "chunks": chunks, "count": count}
+
+
+async def iter_snapshot(bot, snooze_data: dict) -> typing.AsyncIterator[dict]:
+    """
+    Lazily yield the messages saved with a snooze, oldest first.
+
+    Chunks are fetched and decompressed one at a time. Snoozes saved before
+    snapshots were chunked still carry their messages inline, those are yielded as is.
+    """
+    snapshot = snooze_data.get("snapshot")
+    if not snapshot:
+        for message in snooze_data.get("messages") or []:
+            yield message
+        return
+
+    for index in range(snapshot.get("chunks", 0)):
+        data = await bot.api.get_snooze_chunk(snapshot["id"], index)
+        if data is None:
+            logger.warning("Snooze snapshot %s is missing chunk %d.", snapshot["id"], index)
+            continue
+        for message in decode_chunk(data):
+            yield message
+
+
+class SnapshotReplayer:
+    """
+    Replays snapshot messages into a thread channel using as few requests as possible.
+
+    Consecutive messages from the same author are packed together, up to 10 embeds
+    (and Discord's 6000 character embed budget) or 2000 characters of content per
+    message. Messages are posted through a temporary channel webhook so the original
+    author names and avatars are kept. Webhook requests go through discord.py's
+    webhook adapter, which waits on the per-route rate-limit headers instead of
+    running into 429s.
+
+    If a webhook cannot be created or used, the remaining batches are handed to
+    `fallback`, a coroutine function accepting the same keyword arguments as
+    `discord.abc.Messageable.send`.
+    """
+
+    MAX_EMBEDS = 10
+    MAX_EMBED_CHARS = 6000
+    MAX_CONTENT = 2000
+    WEBHOOK_NAME = "Modmail Replay"
+
+    def __init__(self, channel: discord.TextChannel, *, fallback):
+        self.channel = channel
+        self.fallback = fallback
+        self.webhook: typing.Optional[discord.Webhook] = None
+        self._webhook_failed = False
+
+        self._author = None
+        self._lines: typing.List[str] = []
+        self._content_len = 0
+        self._embeds: typing.List[discord.Embed] = []
+        self._embed_chars = 0
+
+        self.messages = 0
+        self.requests = 0
+        self._started = None
+        self.elapsed = 0.0
+
+    @staticmethod
+    def _webhook_username(name: typing.Optional[str]) -> str:
+        # Webhook names are limited to 80 characters and may not contain "discord" or "clyde".
+        name = (name or "Unknown").strip() or "Unknown"
+        for banned in ("discord", "clyde"):
+            name = re.sub(banned, lambda m: m.group(0)[0] + "\u200b" + m.group(0)[1:], name, flags=re.I)
+        return name[:80]
+
+    async def add(
+        self,
+        *,
+        username: typing.Optional[str],
+        avatar_url: typing.Optional[str],
+        content: typing.Optional[str] = None,
+        embeds: typing.Optional[typing.List[discord.Embed]] = None,
+    ) -> None:
+        """Queue a message for replay, sending the current batch if it is full."""
+        if self._started is None:
+            self._started = time.perf_counter()
+
+        embeds = (embeds or [])[: self.MAX_EMBEDS]
+        content = (content or "")[: self.MAX_CONTENT]
+        embed_chars = sum(len(e) for e in embeds)
+        author = (username, avatar_url)
+
+        if (
+            author != self._author
+            or len(self._embeds) + len(embeds) > self.MAX_EMBEDS
+            or self._embed_chars + embed_chars > self.MAX_EMBED_CHARS
+            or self._content_len + len(content) + 1 > self.MAX_CONTENT
+            # keep content and embeds of different messages in their original order
+            or (content and self._embeds)
+        ):
+            await self.flush()
+
+        self._author = author
+        if content:
+            self._lines.append(content)
+            self._content_len += len(content) + 1
+        self._embeds.extend(embeds)
+        self._embed_chars += embed_chars
+        self.messages += 1
+
+    async def flush(self) -> None:
+        """Send the pending batch."""
+        if not self._lines and not self._embeds:
+            return
+
+        kwargs = {
+            "content": "\n".join(self._lines) or None,
+            "embeds": self._embeds,
+            "allowed_mentions": discord.AllowedMentions.none(),
+        }
+        username, avatar_url = self._author
+        self._lines, self._content_len, self._embeds, self._embed_chars = [], 0, [], 0
+
+        webhook = await self._get_webhook()
+        if webhook is not None:
+            try:
+                await webhook.send(
+                    username=self._webhook_username(username),
+                    avatar_url=avatar_url or discord.utils.MISSING,
+                    wait=True,
+                    **kwargs,
+                )
+            except discord.HTTPException as e:
+                logger.warning("Replay webhook send failed, falling back to regular messages: %s", e)
+                self._webhook_failed = True
+            else:
+                self.requests += 1
+                return
+
+        await self.fallback(**kwargs)
+        self.requests += 1
+
+    async def _get_webhook(self) -> typing.Optional[discord.Webhook]:
+        if self.webhook is None and not self._webhook_failed:
+            try:
+                self.webhook = await self.channel.create_webhook(
+                    name=self.WEBHOOK_NAME, reason="Replaying unsnoozed thread history"
+                )
+            except discord.HTTPException as e:
+                logger.info("Could not create a replay webhook, sending regular messages: %s", e)
+                self._webhook_failed = True
+        if self._webhook_failed:
+            return None
+        return self.webhook
+
+    async def close(self) -> None:
+        """Flush the last batch and remove the temporary webhook."""
+        try:
+            await self.flush()
+        finally:
+            if self._started is not None:
+                self.elapsed = time.perf_counter() - self._started
+            if self.webhook is not None:
+                try:
+                    await self.webhook.delete(reason="Finished replaying unsnoozed thread history")
+                except discord.HTTPException:
+                    logger.debug("Failed to delete replay webhook.", exc_info=True)
+                self.webhook = None
+
+    @property
+    def throughput(self) -> float:
+        """Replayed messages per second."""
+        return self.messages / self.elapsed if self.elapsed else 0.0
@@ -0,0 +1,193 @@
+import asyncio
+import base64
+import io
+import json
+import multiprocessing
+import os
+import typing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import discord
+from lottie.importers import importers as l_importers
+from lottie.exporters import exporters as l_exporters
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+IMGUR_UPLOAD_URL = "https://api.imgur.com/3/image"
+IMGUR_CLIENT_ID = "50e96145ac5e085"
+
+
+def lottie_to_png(data: bytes) -> bytes:
+    """Render the first frame of a lottie animation to PNG bytes.
+
+    This runs inside the sticker render process pool, so it has to stay a
+    picklable module-level function.
+    """
+    importer = l_importers.get("lottie")
+    exporter = l_exporters.get("png")
+    with io.BytesIO() as stream:
+        stream.write(data)
+        stream.seek(0)
+        an = importer.process(stream)
+
+    with io.BytesIO() as stream:
+        exporter.process(an, stream)
+        stream.seek(0)
+        return stream.read()
+
+
+class StickerCache:
+    """
+    Cache of rendered lottie stickers, keyed by sticker ID.
+
+    Discord never changes the content behind a sticker ID, so once a sticker has
+    been rendered and uploaded its URL can be reused forever. URLs are kept in an
+    in-memory LRU that is mirrored to an index file, and the rendered PNGs are
+    kept on disk so a failed upload never needs a second render. Rendering runs
+    in a dedicated, size-capped process pool.
+
+    Parameters
+    ----------
+    bot : ModmailBot
+        The Modmail bot.
+    directory : str
+        Where rendered PNGs and the URL index are stored.
+    max_workers : int
+        Size cap of the render process pool.
+    max_entries : int
+        How many stickers are remembered before the least recently used
+        ones are evicted, together with their PNGs.
+    """
+
+    def __init__(self, bot, directory: str, *, max_workers: int = 2, max_entries: int = 1024):
+        self.bot = bot
+        self.directory = directory
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self._index_path = os.path.join(directory, "index.json")
+        self._urls: "OrderedDict[int, str]" = OrderedDict()
+        self._pending: typing.Dict[int, asyncio.Task] = {}
+        self._index_lock = asyncio.Lock()
+        self._executor: typing.Optional[ProcessPoolExecutor] = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def _load_index(self) -> None:
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            logger.warning("Sticker cache index is unreadable, starting with an empty cache.", exc_info=True)
+            return
+
+        for sticker_id, url in index.items():
+            self._urls[int(sticker_id)] = url
+        while len(self._urls) > self.max_entries:
+            self._urls.popitem(last=False)
+
+    def _write_index(self, index: typing.Dict[str, str]) -> None:
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _png_path(self, sticker_id: int) -> str:
+        return os.path.join(self.directory, f"{sticker_id}.png")
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # By now the bot runs other threads (log listener, loop watchdog), and a
+            # forked child could inherit one of their locks held, so spawn instead.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def get_url(self, sticker: discord.StickerItem) -> str:
+        """
+        Get a URL of the rendered sticker, rendering and uploading it if needed.
+
+        Concurrent requests for the same sticker share a single render.
+        """
+        url = self._urls.get(sticker.id)
+        if url is not None:
+            self._urls.move_to_end(sticker.id)
+            return url
+
+        task = self._pending.get(sticker.id)
+        if task is None:
+            task = self.bot.loop.create_task(self._resolve(sticker))
+            self._pending[sticker.id] = task
+            task.add_done_callback(lambda _: self._pending.pop(sticker.id, None))
+        return await asyncio.shield(task)
+
+    async def _resolve(self, sticker: discord.StickerItem) -> str:
+        loop = self.bot.loop
+        png_path = self._png_path(sticker.id)
+
+        try:
+            img_data = await loop.run_in_executor(None, _read_file, png_path)
+        except FileNotFoundError:
+            async with self.bot.session.get(sticker.url) as resp:
+                data = await resp.read()
+            img_data = await loop.run_in_executor(self.executor, lottie_to_png, data)
+            await loop.run_in_executor(None, _write_file, png_path, img_data)
+            logger.debug("Rendered lottie sticker %s.", sticker.id)
+
+        async with self.bot.session.post(
+            IMGUR_UPLOAD_URL,
+            headers={"Authorization": f"Client-ID {IMGUR_CLIENT_ID}"},
+            data={"image": base64.b64encode(img_data).decode()},
+        ) as resp:
+            result = await resp.json()
+            url = result["data"]["link"]
+
+        self._urls[sticker.id] = url
+        evicted = []
+        while len(self._urls) > self.max_entries:
+            evicted.append(self._urls.popitem(last=False)[0])
+        async with self._index_lock:
+            index = {str(k): v for k, v in self._urls.items()}
+            await loop.run_in_executor(None, self._store, index, [self._png_path(i) for i in evicted])
+        return url
+
+    def _store(self, index: typing.Dict[str, str], evicted: typing.List[str]) -> None:
+        for path in evicted:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        try:
+            self._write_index(index)
+        except OSError:
+            logger.warning("Failed to write the sticker cache index.", exc_info=True)
+
+    def close(self) -> None:
+        """Shut down the render process pool."""
+        for task in self._pending.values():
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file(path: str, data: bytes) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
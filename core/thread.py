@@ -1,13 +1,12 @@
 import asyncio
 import copy
-import base64
 import functools
-import io
 import re
 import time
 import traceback
 import typing
 import warnings
+from collections import OrderedDict
 from datetime import timedelta, datetime, timezone
 from types import SimpleNamespace
 
@@ -16,11 +15,12 @@ import isodate
 import discord
 from discord.ext import commands
 from discord.ext.commands import MissingRequiredArgument, CommandError
-from lottie.importers import importers as l_importers
-from lottie.exporters import exporters as l_exporters
 
 from core.models import DMDisabled, DummyMessage, PermissionLevel, getLogger
 from core import checks
+from core.snooze import SnapshotReplayer, capture_history, is_genesis_message, iter_snapshot
+from core.tracing import traced
+from core.workers import blocking_wait
 from core.utils import (
     is_image_url,
     parse_channel_topic,
@@ -39,6 +39,25 @@ from core.utils import (
 
 logger = getLogger(__name__)
 
+# Upper bound on how many recipient DMs a single relay may have in flight at once,
+# and how long any one of them may take before it is counted as failed.
+RECIPIENT_FANOUT_CONCURRENCY = 5
+RECIPIENT_SEND_TIMEOUT = 30
+
+
+def _timed(method: str):
+    """Observe the duration of a `Thread` method in the `thread_send_seconds` metric."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            with self.bot.metrics.thread_send_seconds.time(method=method):
+                return await func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
 
 class Thread:
     """Represents a discord Modmail thread"""
@@ -65,8 +84,6 @@ class Thread:
         self._genesis_message = None
         self._ready_event = asyncio.Event()
         self.wait_tasks = []
-        self.close_task = None
-        self.auto_close_task = None
         self._cancelled = False
         self._dm_menu_msg_id = None
         self._dm_menu_channel_id = None
@@ -92,7 +109,8 @@ class Thread:
         task = self.bot.loop.create_task(asyncio.wait_for(self._ready_event.wait(), timeout=25))
         self.wait_tasks.append(task)
         try:
-            await task
+            async with blocking_wait():
+                await task
         except asyncio.TimeoutError:
             logger.warning("Waiting for thread setup timed out.")
         finally:
@@ -136,6 +154,16 @@ class Thread:
         else:
             self._ready_event.clear()
 
+    @property
+    def close_task(self) -> typing.Optional[dict]:
+        """The pending scheduled close of this thread, if any."""
+        return self.bot.jobs.get("close", self.id)
+
+    @property
+    def auto_close_task(self) -> typing.Optional[dict]:
+        """The pending automatic close of this thread, if any."""
+        return self.bot.jobs.get("auto_close", self.id)
+
     @property
     def cancelled(self) -> bool:
         return self._cancelled
@@ -147,9 +175,11 @@ class Thread:
             for i in self.wait_tasks:
                 i.cancel()
 
-    async def snooze(self, moderator=None, command_used=None, snooze_for=None):
+    async def snooze(self, moderator=None, command_used=None, snooze_for=None, *, progress=None):
         """
         Save channel/category/position/messages to DB, mark as snoozed.
+        Messages are streamed into a chunked snapshot, `progress` is awaited with the
+        number of messages saved so far after each chunk.
         Behavior is configurable:
         - delete (default): delete the channel and store all data for full restore later
         - move: move channel to a configured snoozed category and hide it (keeps channel alive)
@@ -193,6 +223,10 @@ class Thread:
                 if log_entry and "key" in log_entry:
                     self.log_key = log_entry["key"]
 
+        # Stream the channel history into the chunked snapshot store instead of
+        # embedding every message in the log document.
+        snapshot = await capture_history(self.bot, str(self.id), channel, progress=progress)
+
         now = datetime.now(timezone.utc)
         self.snooze_data = {
             "category_id": channel.category_id,
@@ -202,42 +236,7 @@ class Thread:
             "slowmode_delay": channel.slowmode_delay,
             "nsfw": channel.nsfw,
             "overwrites": [(role.id, perm._values) for role, perm in channel.overwrites.items()],
-            "messages": [
-                {
-                    "author_id": m.author.id,
-                    "content": m.content,
-                    "attachments": [a.url for a in m.attachments],
-                    "embeds": [e.to_dict() for e in m.embeds],
-                    "created_at": m.created_at.isoformat(),
-                    "type": (
-                        "mod_only"
-                        if (
-                            m.embeds
-                            and getattr(m.embeds[0], "author", None)
-                            and (
-                                getattr(m.embeds[0].author, "name", "").startswith("📝 Note")
-                                or getattr(m.embeds[0].author, "name", "").startswith("📝 Persistent Note")
-                            )
-                        )
-                        else None
-                    ),
-                    "author_name": (
-                        getattr(m.embeds[0].author, "name", "").split(" (")[0]
-                        if m.embeds and m.embeds[0].author and m.author == self.bot.user
-                        else getattr(m.author, "name", None)
-                        if m.author != self.bot.user
-                        else None
-                    ),
-                    "author_avatar": (
-                        getattr(m.embeds[0].author, "icon_url", None)
-                        if m.embeds and m.embeds[0].author and m.author == self.bot.user
-                        else m.author.display_avatar.url
-                        if m.author != self.bot.user
-                        else None
-                    ),
-                }
-                async for m in channel.history(limit=None, oldest_first=True)
-            ],
+            "snapshot": snapshot,
             "snoozed_by": getattr(moderator, "name", None) if moderator else None,
             "snooze_command": command_used,
             "log_key": self.log_key,
@@ -525,41 +524,34 @@ class Thread:
         self.log_key = self.snooze_data.get("log_key")
 
         # Replay messages only if we re-created the channel (delete behavior or move fallback)
+        replay_stats = None
         if behavior != "move" or (behavior == "move" and not self.snooze_data.get("moved", False)):
             # Get history limit from config (0 or None = show all)
             history_limit = self.bot.config.get("unsnooze_history_limit")
-            all_messages = self.snooze_data.get("messages", [])
 
-            # Separate genesis, notes, and regular messages
+            # First pass over the snapshot: find the genesis message, collect notes and count
+            # the regular messages. Regular messages are streamed again when they are replayed,
+            # so the snapshot is never loaded into memory as a whole.
             genesis_msg = None
             notes = []
-            regular_messages = []
-
-            for msg in all_messages:
-                msg_type = msg.get("type")
-                # Check if it's the genesis message (has Roles field)
-                if msg.get("embeds"):
-                    for embed_dict in msg.get("embeds", []):
-                        if embed_dict.get("fields"):
-                            for field in embed_dict.get("fields", []):
-                                if field.get("name") == "Roles":
-                                    genesis_msg = msg
-                                    break
-                            if genesis_msg:
-                                break
-                # Check if it's a note
-                if msg_type == "mod_only":
+            regular_count = 0
+
+            async for msg in iter_snapshot(self.bot, self.snooze_data):
+                if is_genesis_message(msg):
+                    genesis_msg = msg
+                elif msg.get("type") == "mod_only":
                     notes.append(msg)
-                elif genesis_msg != msg:
-                    regular_messages.append(msg)
+                else:
+                    regular_count += 1
 
             # Apply limit if set
             limited = False
+            skip = 0
             if history_limit:
                 try:
                     history_limit = int(history_limit)
-                    if history_limit > 0 and len(regular_messages) > history_limit:
-                        regular_messages = regular_messages[-history_limit:]
+                    if history_limit > 0 and regular_count > history_limit:
+                        skip = regular_count - history_limit
                         limited = True
                 except (ValueError, TypeError):
                     pass
@@ -602,124 +594,108 @@ class Thread:
                     allowed_mentions=discord.AllowedMentions.none(),
                 )
 
-            # Build list of remaining messages to show
-            messages_to_show = []
-            messages_to_show.extend(notes)
-            messages_to_show.extend(regular_messages)
+            # Remaining messages to show: notes first, then the (limited) regular messages
+            async def messages_to_show():
+                for note in notes:
+                    yield note
+                seen = 0
+                async for snapshot_msg in iter_snapshot(self.bot, self.snooze_data):
+                    if is_genesis_message(snapshot_msg) or snapshot_msg.get("type") == "mod_only":
+                        continue
+                    seen += 1
+                    if seen > skip:
+                        yield snapshot_msg
 
-            for msg in messages_to_show:
-                try:
-                    author = self.bot.get_user(msg["author_id"]) or await self.bot.get_or_fetch_user(
-                        msg["author_id"]
-                    )
-                except discord.NotFound:
-                    author = None
+            replayer = SnapshotReplayer(channel, fallback=_safe_send_to_channel)
+            recipient_ids = {r.id for r in self.recipients}
+            authors = {}
 
-                content = msg.get("content")
-                embeds = [discord.Embed.from_dict(e) for e in msg.get("embeds", []) if e]
-                attachments = msg.get("attachments", [])
+            try:
+                async for msg in messages_to_show():
+                    content = msg.get("content")
+                    embeds = [discord.Embed.from_dict(e) for e in msg.get("embeds", []) if e]
+                    attachments = msg.get("attachments", [])
 
-                # Only send if there is something to send
-                if not content and not embeds and not attachments:
-                    continue
+                    # Only send if there is something to send
+                    if not content and not embeds and not attachments:
+                        continue
+
+                    author_id = msg["author_id"]
+                    if author_id not in authors:
+                        try:
+                            authors[author_id] = await self.bot.get_or_fetch_user(author_id)
+                        except discord.NotFound:
+                            authors[author_id] = None
+                    author = authors[author_id]
 
-                author_is_mod = msg["author_id"] not in [r.id for r in self.recipients]
-                if author_is_mod:
                     # Prefer stored author_name/avatar
-                    username = (
-                        msg.get("author_name")
-                        or (getattr(author, "name", None) if author else None)
-                        or "Unknown"
+                    username = msg.get("author_name") or getattr(author, "name", None) or "Unknown"
+                    avatar_url = msg.get("author_avatar") or (
+                        author.display_avatar.url if author and hasattr(author, "display_avatar") else None
                     )
-                    user_id = msg.get("author_id")
+
                     if embeds:
-                        # Ensure embeds show author details
-                        embeds[0].set_author(
-                            name=f"{username} ({user_id})",
-                            icon_url=msg.get("author_avatar")
-                            or (
-                                author.display_avatar.url
-                                if author and hasattr(author, "display_avatar")
-                                else None
-                            ),
-                        )
-                        # If there were attachment URLs, include them as a field so mods can access them
-                        if attachments:
-                            try:
-                                embeds[0].add_field(
-                                    name="Attachments",
-                                    value="\n".join(attachments),
-                                    inline=False,
-                                )
-                            except Exception as e:
-                                logger.info(
-                                    "Failed to add attachments field while replaying unsnoozed messages: %s",
-                                    e,
-                                )
-                        await _safe_send_to_channel(
-                            embeds=embeds,
-                            allowed_mentions=discord.AllowedMentions.none(),
-                        )
+                        if author_id not in recipient_ids:
+                            # Ensure embeds show author details
+                            embeds[0].set_author(name=f"{username} ({author_id})", icon_url=avatar_url)
+                            # If there were attachment URLs, include them as a field so mods can access them
+                            if attachments:
+                                try:
+                                    embeds[0].add_field(
+                                        name="Attachments",
+                                        value="\n".join(attachments),
+                                        inline=False,
+                                    )
+                                except Exception as e:
+                                    logger.info("Failed to add attachments field while replaying: %s", e)
+                        await replayer.add(username=username, avatar_url=avatar_url, embeds=embeds)
                     else:
                         # Plain-text path (no embeds): prefix with username and user id
-                        header = f"**{username} ({user_id})**"
+                        header = f"**{username} ({author_id})**"
                         body = content or ""
                         if attachments and not body:
                             # no content; include attachment URLs on new lines
                             body = "\n".join(attachments)
                         formatted = f"{header}: {body}" if body else header
-                        await _safe_send_to_channel(
-                            content=formatted,
-                            allowed_mentions=discord.AllowedMentions.none(),
-                        )
-                else:
-                    # Recipient message: include attachment URLs if content is empty
-                    # When no embeds, prefix plain text with username and user id
-                    username = (
-                        msg.get("author_name")
-                        or (getattr(author, "name", None) if author else None)
-                        or "Unknown"
-                    )
-                    user_id = msg.get("author_id")
-                    if embeds:
-                        await _safe_send_to_channel(
-                            content=None,
-                            embeds=embeds or None,
-                            allowed_mentions=discord.AllowedMentions.none(),
-                        )
-                    else:
-                        header = f"**{username} ({user_id})**"
-                        body = content or ""
-                        if attachments and not body:
-                            body = "\n".join(attachments)
-                        formatted = f"{header}: {body}" if body else header
-                        await _safe_send_to_channel(
-                            content=formatted,
-                            allowed_mentions=discord.AllowedMentions.none(),
-                        )
+                        await replayer.add(username=username, avatar_url=avatar_url, content=formatted)
+            finally:
+                await replayer.close()
+
+            if replayer.messages:
+                replay_stats = (
+                    f"Restored {replayer.messages} messages in {replayer.requests} requests "
+                    f"({replayer.elapsed:.1f}s, {replayer.throughput:.1f} msg/s)"
+                )
+                logger.info("Unsnooze replay for thread %s: %s.", self.id, replay_stats)
         self.snoozed = False
         # Store snooze_data for notification before clearing
         snooze_data_for_notify = self.snooze_data
         self.snooze_data = None
         # Update channel_id in DB and clear snooze_data (robust: try log_key first)
+        unset = {"snoozed": "", "snooze_data": "", "snooze_until": ""}
         if self.log_key:
             result = await self.bot.api.logs.update_one(
                 {"key": self.log_key},
-                {"$set": {"channel_id": str(channel.id)}, "$unset": {"snoozed": "", "snooze_data": ""}},
+                {"$set": {"channel_id": str(channel.id)}, "$unset": unset},
             )
         else:
             result = await self.bot.api.logs.update_one(
                 {"recipient.id": str(self.id)},
-                {"$set": {"channel_id": str(channel.id)}, "$unset": {"snoozed": "", "snooze_data": ""}},
+                {"$set": {"channel_id": str(channel.id)}, "$unset": unset},
             )
             if result.modified_count == 0:
                 result = await self.bot.api.logs.update_one(
                     {"channel_id": str(channel.id)},
                     {
                         "$set": {"channel_id": str(channel.id)},
-                        "$unset": {"snoozed": "", "snooze_data": ""},
+                        "$unset": unset,
                     },
                 )
+        if snooze_data_for_notify.get("snapshot"):
+            try:
+                await self.bot.api.delete_snooze_snapshot(snooze_data_for_notify["snapshot"]["id"])
+            except Exception:
+                logger.warning("Failed to delete snooze snapshot for thread %s.", self.id, exc_info=True)
         import logging
 
         logging.info(f"[UNSNOOZE] DB update result: {result.modified_count}")
@@ -743,13 +719,18 @@ class Thread:
         snooze_command = snooze_data_for_notify.get("snooze_command") if snooze_data_for_notify else None
         if snoozed_by or snooze_command:
             info = f"Snoozed by: {snoozed_by or 'Unknown'} | Command: {snooze_command or '?snooze'}"
+            if replay_stats:
+                info += f" | {replay_stats}"
             await channel.send(info, allowed_mentions=discord.AllowedMentions.none())
+        elif replay_stats:
+            await channel.send(replay_stats, allowed_mentions=discord.AllowedMentions.none())
 
         # Ensure channel is set before processing commands
         self._channel = channel
 
         # Mark unsnooze as complete
         self._unsnoozing = False
+        self.bot.dispatch("thread_unsnoozed", self)
 
         # Process queued commands
         await self._process_command_queue()
@@ -1033,10 +1014,6 @@ class Thread:
 
         return embed
 
-    async def _close_after(self, after, closer, silent, delete_channel, message):
-        await asyncio.sleep(after)
-        return self.bot.loop.create_task(self._close(closer, silent, delete_channel, message, True))
-
     async def close(
         self,
         *,
@@ -1049,32 +1026,20 @@ class Thread:
     ) -> None:
         """Close a thread now or after a set time in seconds"""
 
-        # restarts the after timer
-        await self.cancel_closure(auto_close)
-
         if after > 0:
-            # TODO: Add somewhere to clean up broken closures
-            #  (when channel is already deleted)
-            now = discord.utils.utcnow()
-            items = {
-                # 'initiation_time': now.isoformat(),
-                "time": (now + timedelta(seconds=after)).isoformat(),
-                "closer_id": closer.id,
-                "silent": silent,
-                "delete_channel": delete_channel,
-                "message": message,
-                "auto_close": auto_close,
-            }
-            self.bot.config["closures"][str(self.id)] = items
-            await self.bot.config.update()
-
-            task = asyncio.create_task(self._close_after(after, closer, silent, delete_channel, message))
-
-            if auto_close:
-                self.auto_close_task = task
-            else:
-                self.close_task = task
+            # Scheduling again moves the pending close of the same kind, which restarts the timer.
+            self.bot.jobs.schedule(
+                "auto_close" if auto_close else "close",
+                self.id,
+                discord.utils.utcnow() + timedelta(seconds=after),
+                closer_id=closer.id,
+                silent=silent,
+                delete_channel=delete_channel,
+                message=message,
+                auto_close=auto_close,
+            )
         else:
+            await self.cancel_closure(auto_close)
             await self._close(closer, silent, delete_channel, message)
 
     async def _close(self, closer, silent=False, delete_channel=True, message=None, scheduled=False):
@@ -1102,12 +1067,13 @@ class Thread:
 
         # Logging
         if self.channel:
+            closed_at = discord.utils.utcnow()
             log_data = await self.bot.api.post_log(
                 self.channel.id,
                 {
                     "open": False,
                     "title": match_title(self.channel.topic),
-                    "closed_at": str(discord.utils.utcnow()),
+                    "closed_at": str(closed_at),
                     "nsfw": self.channel.nsfw,
                     "close_message": message,
                     "closer": {
@@ -1119,6 +1085,7 @@ class Thread:
                     },
                 },
             )
+            self.manager.record_closed(self.id, closed_at)
         else:
             log_data = None
 
@@ -1268,16 +1235,10 @@ class Thread:
                 logger.debug("Failed removing view from DM menu message: %s", inner_e)
 
     async def cancel_closure(self, auto_close: bool = False, all: bool = False) -> None:
-        if self.close_task is not None and (not auto_close or all):
-            self.close_task.cancel()
-            self.close_task = None
-        if self.auto_close_task is not None and (auto_close or all):
-            self.auto_close_task.cancel()
-            self.auto_close_task = None
-
-        to_update = self.bot.config["closures"].pop(str(self.id), None)
-        if to_update is not None:
-            await self.bot.config.update()
+        if not auto_close or all:
+            self.bot.jobs.cancel("close", self.id)
+        if auto_close or all:
+            self.bot.jobs.cancel("auto_close", self.id)
 
     async def _restart_close_timer(self):
         """
@@ -1584,6 +1545,8 @@ class Thread:
 
         return msg
 
+    @_timed("reply")
+    @traced("thread.reply")
     async def reply(
         self,
         message: discord.Message,
@@ -1655,27 +1618,20 @@ class Thread:
                 )
             )
 
-        user_msg_tasks = []
         tasks = []
 
-        for user in self.recipients:
-            user_msg_tasks.append(
-                self.send(
-                    message,
-                    destination=user,
-                    from_mod=True,
-                    anonymous=anonymous,
-                    plain=plain,
-                    content_override=content,
-                )
-            )
+        delivered, failed = await self.send_to_recipients(
+            message,
+            self.recipients,
+            from_mod=True,
+            anonymous=anonymous,
+            plain=plain,
+            content_override=content,
+        )
 
-        try:
-            user_msg = await asyncio.gather(*user_msg_tasks)
-        except Exception as e:
-            logger.error("Message delivery failed:", exc_info=True)
+        if not delivered:
             user_msg = None
-            if isinstance(e, discord.Forbidden):
+            if failed and all(isinstance(error, discord.Forbidden) for _, error in failed):
                 description = (
                     "Your message could not be delivered as "
                     "the recipient is only accepting direct "
@@ -1695,6 +1651,7 @@ class Thread:
                 )
             )
         else:
+            user_msg = [sent for _, sent in delivered]
             # Send the same thing in the thread channel.
             try:
                 msg = await self.send(
@@ -1725,6 +1682,9 @@ class Thread:
                     "Thread channel message failed to send; skipping append_log. Channel may be missing."
                 )
 
+            if failed:
+                tasks.append(self.channel.send(embed=self._delivery_failure_embed(failed)))
+
             # Cancel closing if a thread message is sent.
             if self.close_task is not None:
                 await self.cancel_closure()
@@ -1741,6 +1701,79 @@ class Thread:
         self.bot.dispatch("thread_reply", self, True, message, anonymous, plain)
         return (user_msg, msg)  # sent_to_user, sent_to_thread_channel
 
+    async def send_to_recipients(
+        self,
+        message: discord.Message,
+        recipients: typing.Iterable[typing.Union[discord.User, discord.Member]],
+        **kwargs,
+    ) -> typing.Tuple[list, list]:
+        """Relay a message to several recipients concurrently.
+
+        Deliveries run with bounded parallelism and each one has its own timeout,
+        so a slow or rate-limited DM does not hold up the other recipients. Errors
+        are captured per recipient instead of aborting the whole fan-out.
+
+        Parameters
+        ----------
+        message: discord.Message
+            The message being relayed.
+        recipients: Iterable[Union[discord.User, discord.Member]]
+            The users to deliver the message to.
+        **kwargs
+            Forwarded to :meth:`send`.
+
+        Returns
+        -------
+        Tuple[List[Tuple[User, Message]], List[Tuple[User, Exception]]]
+            The successful deliveries and the failed ones, in recipient order.
+        """
+        semaphore = asyncio.Semaphore(RECIPIENT_FANOUT_CONCURRENCY)
+
+        async def deliver(user):
+            async with semaphore:
+                return await asyncio.wait_for(
+                    self.send(message, destination=user, **kwargs), RECIPIENT_SEND_TIMEOUT
+                )
+
+        recipients = list(recipients)
+        results = await asyncio.gather(*(deliver(user) for user in recipients), return_exceptions=True)
+
+        delivered, failed = [], []
+        for user, result in zip(recipients, results):
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                if isinstance(result, asyncio.TimeoutError):
+                    logger.warning("Delivery to %s timed out after %ss.", user, RECIPIENT_SEND_TIMEOUT)
+                else:
+                    logger.error("Message delivery to %s failed:", user, exc_info=result)
+                failed.append((user, result))
+            else:
+                delivered.append((user, result))
+        return delivered, failed
+
+    def _delivery_failure_embed(self, failed) -> discord.Embed:
+        """Summarise the recipients a relayed message could not be delivered to."""
+        lines = []
+        for user, error in failed:
+            if isinstance(error, discord.Forbidden):
+                reason = "not accepting DMs"
+            elif isinstance(error, asyncio.TimeoutError):
+                reason = "timed out"
+            else:
+                reason = type(error).__name__
+            lines.append(f"{getattr(user, 'mention', user)} ({reason})")
+        return discord.Embed(
+            color=self.bot.error_color,
+            title="Partial delivery",
+            description=truncate(
+                "Your message could not be delivered to:\n" + "\n".join(lines),
+                max=4096,
+            ),
+        )
+
+    @_timed("send")
+    @traced("thread.send")
     async def send(
         self,
         message: discord.Message,
@@ -1964,19 +1997,6 @@ class Thread:
         ]
         images.extend(image_urls)
 
-        def lottie_to_png(data):
-            importer = l_importers.get("lottie")
-            exporter = l_exporters.get("png")
-            with io.BytesIO() as stream:
-                stream.write(data)
-                stream.seek(0)
-                an = importer.process(stream)
-
-            with io.BytesIO() as stream:
-                exporter.process(an, stream)
-                stream.seek(0)
-                return stream.read()
-
         for i in message.stickers:
             if i.format in (
                 discord.StickerFormatType.png,
@@ -1991,26 +2011,9 @@ class Thread:
                     )
                 )
             elif i.format == discord.StickerFormatType.lottie:
-                # save the json lottie representation
+                # render to a png, reusing earlier renders of the same sticker
                 try:
-                    async with self.bot.session.get(i.url) as resp:
-                        data = await resp.read()
-
-                    # convert to a png
-                    img_data = await self.bot.loop.run_in_executor(
-                        None, functools.partial(lottie_to_png, data)
-                    )
-                    b64_data = base64.b64encode(img_data).decode()
-
-                    # upload to imgur
-                    async with self.bot.session.post(
-                        "https://api.imgur.com/3/image",
-                        headers={"Authorization": "Client-ID 50e96145ac5e085"},
-                        data={"image": b64_data},
-                    ) as resp:
-                        result = await resp.json()
-                        url = result["data"]["link"]
-
+                    url = await self.bot.sticker_cache.get_url(i)
                 except Exception:
                     traceback.print_exc()
                     images.append((None, i.name, True))
@@ -2212,6 +2215,9 @@ class Thread:
             await asyncio.gather(*additional_images)
             self.ready = True
 
+        if not from_mod and destination == self.channel:
+            # copies sent to the other recipients are not counted again
+            self.bot.metrics.dms_relayed.inc()
         return msg
 
     async def get_notifications(self) -> str:
@@ -2355,10 +2361,48 @@ class Thread:
 class ThreadManager:
     """Class that handles storing, finding and creating Modmail threads."""
 
+    # How many users' last closed thread are remembered for the thread cooldown.
+    LAST_CLOSED_CACHE_SIZE = 10000
+
     def __init__(self, bot):
         self.bot = bot
         self.cache = {}
         self.closing = set()
+        self._last_closed: "OrderedDict[int, typing.Optional[datetime]]" = OrderedDict()
+
+    def record_closed(self, user_id: int, closed_at: typing.Optional[datetime]) -> None:
+        """Remember when the latest thread of a user was closed."""
+        self._last_closed[user_id] = closed_at
+        self._last_closed.move_to_end(user_id)
+        while len(self._last_closed) > self.LAST_CLOSED_CACHE_SIZE:
+            self._last_closed.popitem(last=False)
+
+    async def get_last_closed(self, user_id: int) -> typing.Optional[datetime]:
+        """
+        When the latest thread of a user was closed, if they had one.
+
+        The result is cached, and kept up to date when threads are closed,
+        so only the first lookup for a user queries the logs.
+        """
+        try:
+            closed_at = self._last_closed[user_id]
+        except KeyError:
+            pass
+        else:
+            self._last_closed.move_to_end(user_id)
+            return closed_at
+
+        last_log = await self.bot.api.get_latest_user_logs(user_id)
+        closed_at = None
+        if last_log is not None and last_log.get("closed_at"):
+            try:
+                closed_at = datetime.fromisoformat(last_log["closed_at"]).astimezone(timezone.utc)
+            except ValueError:
+                logger.warning("Invalid closed_at in the latest log of user %s.", user_id, exc_info=True)
+        # A thread may have been closed while the logs were queried.
+        if user_id not in self._last_closed:
+            self.record_closed(user_id, closed_at)
+        return self._last_closed.get(user_id, closed_at)
 
     async def populate_cache(self) -> None:
         for channel in self.bot.modmail_guild.text_channels:
@@ -2373,6 +2417,7 @@ class ThreadManager:
     def __getitem__(self, item: str) -> Thread:
         return self.cache[item]
 
+    @traced("threads.find")
     async def find(
         self,
         *,
@@ -2399,6 +2444,7 @@ class ThreadManager:
             recipient_id = recipient.id
 
         thread = self.cache.get(recipient_id)
+        self.bot.metrics.thread_cache_lookups.inc(result="miss" if thread is None else "hit")
         if thread is not None:
             try:
                 await thread.wait_until_ready()
@@ -2466,6 +2512,18 @@ class ThreadManager:
 
         return thread
 
+    async def _run_scheduled_close(self, recipient_id: int, data: dict) -> None:
+        """Close a thread whose scheduled or automatic close is due."""
+        thread = await self.find(recipient_id=recipient_id)
+        if thread is None:
+            # If the channel is deleted
+            logger.debug("Failed to close thread for recipient %s.", recipient_id)
+            return
+
+        logger.debug("Closing thread for recipient %s.", recipient_id)
+        closer = await self.bot.get_or_fetch_user(data["closer_id"])
+        await thread._close(closer, data["silent"], data["delete_channel"], data["message"], True)
+
     async def _find_from_channel(self, channel):
         """
         Tries to find a thread from a channel channel topic,
@@ -2483,7 +2541,9 @@ class ThreadManager:
             return None
 
         if user_id in self.cache:
+            self.bot.metrics.thread_cache_lookups.inc(result="hit")
             return self.cache[user_id]
+        self.bot.metrics.thread_cache_lookups.inc(result="miss")
 
         try:
             recipient = await self.bot.get_or_fetch_user(user_id)
@@ -2506,6 +2566,7 @@ class ThreadManager:
 
         return thread
 
+    @traced("threads.create")
     async def create(
         self,
         recipient: typing.Union[discord.Member, discord.User],
@@ -2610,7 +2671,9 @@ class ThreadManager:
                 ),
                 view=view,
             )
-            await view.wait()
+            # the user may take a while, let other users' DMs through meanwhile
+            async with blocking_wait():
+                await view.wait()
             if view.value is None:
                 thread.cancelled = True
                 self.bot.loop.create_task(
@@ -0,0 +1,284 @@
+import asyncio
+import functools
+import json
+import os
+import random
+import threading
+import time
+import typing
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+current_span: ContextVar[typing.Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """The spans of one traced operation, exported together once its root span finishes."""
+
+    __slots__ = ("tracer", "trace_id", "spans", "wall_anchor_ns", "perf_anchor", "exported")
+
+    def __init__(self, tracer: "Tracer"):
+        self.tracer = tracer
+        self.trace_id = os.urandom(16).hex()
+        self.spans: typing.List[Span] = []
+        # Spans are timed with `time.perf_counter`, these convert them to wall clock time.
+        self.wall_anchor_ns = time.time_ns()
+        self.perf_anchor = time.perf_counter()
+        self.exported = False
+
+    def wall_time_ns(self, perf_time: float) -> int:
+        return self.wall_anchor_ns + int((perf_time - self.perf_anchor) * 1e9)
+
+
+class Span:
+    """
+    A timed stage of a traced operation.
+
+    Parameters
+    ----------
+    trace : Trace
+        The trace the span belongs to.
+    name : str
+        What the span measures.
+    parent : Span, optional
+        The span this is a stage of, `None` for the root span of the trace.
+    start : float, optional
+        When the span started, as returned by `time.perf_counter`. Defaults to now.
+    attributes : Dict[str, Any]
+        Additional information about the span.
+    """
+
+    __slots__ = ("trace", "name", "span_id", "parent", "start", "end", "attributes", "error")
+
+    def __init__(
+        self,
+        trace: Trace,
+        name: str,
+        parent: typing.Optional["Span"] = None,
+        start: typing.Optional[float] = None,
+        attributes: typing.Optional[typing.Dict[str, typing.Any]] = None,
+    ):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent = parent
+        self.start = time.perf_counter() if start is None else start
+        self.end: typing.Optional[float] = None
+        self.attributes = attributes or {}
+        self.error: typing.Optional[str] = None
+        trace.spans.append(self)
+
+    @property
+    def duration(self) -> float:
+        return ((self.end if self.end is not None else time.perf_counter()) - self.start) * 1000
+
+    def child(self, name: str, **attributes) -> "Span":
+        return Span(self.trace, name, self, attributes=attributes)
+
+    def finish(self, end: typing.Optional[float] = None) -> None:
+        if self.end is not None:
+            return
+        self.end = time.perf_counter() if end is None else end
+        if self.parent is None:
+            self.trace.tracer.export(self.trace)
+
+
+class Tracer:
+    """
+    Samples operations to trace and exports their spans.
+
+    A sampled operation is traced from its root span, started with `start`. Stages of
+    it are traced with `span` or `traced`, which find their parent through a context
+    variable and do nothing when the operation is not sampled. When the root span
+    finishes, the trace is exported to the log as a breakdown of its stages, or
+    appended to `path` as a line of OTLP JSON.
+
+    Parameters
+    ----------
+    sample_rate : float
+        The share of operations that are traced, between 0 and 1.
+    exporter : str
+        ``"log"`` or ``"file"``.
+    path : str, optional
+        The file the traces are written to by the ``"file"`` exporter.
+    """
+
+    EXPORTERS = ("log", "file")
+
+    def __init__(self, sample_rate: float, exporter: str = "log", path: typing.Optional[str] = None):
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        if exporter not in self.EXPORTERS:
+            logger.warning("Invalid trace exporter %s, using log.", exporter)
+            exporter = "log"
+        if exporter == "file" and path is None:
+            raise ValueError("`path` must be set to export traces to a file.")
+        self.exporter = exporter
+        self.path = path
+        self._write_lock = threading.Lock()
+
+        self.sampled = 0
+        self.exported = 0
+
+    def start(self, name: str, **attributes) -> typing.Optional[Span]:
+        """Start the root span of an operation, or return `None` if it is not sampled."""
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return None
+        self.sampled += 1
+        return Span(Trace(self), name, attributes=attributes)
+
+    def export(self, trace: Trace) -> None:
+        if trace.exported:
+            return
+        trace.exported = True
+        self.exported += 1
+
+        if self.exporter == "log":
+            logger.info("Trace %s:\n%s", trace.trace_id, format_trace(trace))
+            return
+
+        line = _dumps(to_otlp(trace))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(line)
+        else:
+            loop.run_in_executor(None, self._write, line)
+
+    def _write(self, line: str) -> None:
+        with self._write_lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError:
+                logger.warning("Failed to write a trace to %s.", self.path, exc_info=True)
+
+
+def _dumps(data) -> str:
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, separators=(",", ":"))
+
+
+def format_trace(trace: Trace) -> str:
+    """The spans of `trace` as an indented tree with their durations."""
+    children: typing.Dict[typing.Optional[str], typing.List[Span]] = {}
+    for span in trace.spans:
+        children.setdefault(span.parent.span_id if span.parent else None, []).append(span)
+
+    lines = []
+
+    def walk(parent_id, depth):
+        for span in sorted(children.get(parent_id, ()), key=lambda s: s.start):
+            line = f"{'  ' * depth}{span.name}: {span.duration:.1f} ms"
+            if span.attributes:
+                line += " (" + ", ".join(f"{k}={v}" for k, v in span.attributes.items()) + ")"
+            if span.error:
+                line += f" [error: {span.error}]"
+            lines.append(line)
+            walk(span.span_id, depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def to_otlp(trace: Trace) -> typing.Dict[str, typing.Any]:
+    """`trace` in the OTLP JSON format, as written by the OpenTelemetry collector's file exporter."""
+    spans = []
+    for span in trace.spans:
+        end = span.end if span.end is not None else time.perf_counter()
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent.span_id if span.parent else "",
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(trace.wall_time_ns(span.start)),
+            "endTimeUnixNano": str(trace.wall_time_ns(end)),
+            "attributes": [{"key": k, "value": {"stringValue": str(v)}} for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {},
+        }
+        spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "modmail"}}]},
+                "scopeSpans": [{"scope": {"name": "modmail"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Trace the body of the with statement as a stage of the current span, if there is one."""
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = parent.child(name, **attributes)
+    token = current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        current_span.reset(token)
+        child.finish()
+
+
+def traced(name: str):
+    """Trace every call of the decorated coroutine function as a stage of the current span."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if current_span.get() is None:
+                return await func(*args, **kwargs)
+            with span(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def activate(active: typing.Optional[Span], *, finish: bool = False):
+    """
+    Make `active` the current span in the body of the with statement, e.g. to continue
+    a trace in another task. With `finish`, the span is finished on exit.
+    """
+    if active is None:
+        yield None
+        return
+
+    token = current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.error = type(e).__name__
+        raise
+    finally:
+        current_span.reset(token)
+        if finish:
+            active.finish()
+
+
+def record_span(name: str, start: float, end: float, **attributes) -> None:
+    """Add an already finished stage to the current span, timed with `time.perf_counter`."""
+    parent = current_span.get()
+    if parent is None:
+        return
+    Span(parent.trace, name, parent, start, attributes).end = end
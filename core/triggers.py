@@ -0,0 +1,217 @@
+import re
+import typing
+from collections import deque
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+_REPEATS = tuple(
+    getattr(sre_parse, name)
+    for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_parse, name)
+)
+
+
+def required_literal(pattern: str) -> typing.Optional[str]:
+    """
+    The longest piece of text that every match of `pattern` contains, lowercased.
+
+    Returns `None` if no such text could be determined, e.g. for case-insensitive
+    patterns or patterns that are an alternation at the top level.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+
+    best = ""
+
+    def walk(items):
+        nonlocal best
+        run = []
+        for op, av in items:
+            if op == sre_parse.LITERAL:
+                run.append(chr(av))
+                continue
+
+            if len(run) > len(best):
+                best = "".join(run)
+            run = []
+
+            if op == sre_parse.SUBPATTERN:
+                _, add_flags, _, sub = av
+                if not add_flags & re.IGNORECASE:
+                    walk(sub)
+            elif op in _REPEATS and av[0] >= 1:
+                walk(av[2])
+        if len(run) > len(best):
+            best = "".join(run)
+
+    walk(parsed)
+    return best.lower() or None
+
+
+class TriggerMatch(typing.NamedTuple):
+    trigger: str  # the auto trigger key
+    start: int
+    end: int
+    text: str  # the matched text
+
+
+class AhoCorasick:
+    """
+    Finds occurrences of many keywords in a single pass over a text.
+
+    Parameters
+    ----------
+    keywords : Sequence[str]
+        The keywords, a match reports the index of the keyword in this sequence.
+    """
+
+    def __init__(self, keywords: typing.Sequence[str]):
+        self._goto: typing.List[typing.Dict[str, int]] = [{}]
+        self._fail: typing.List[int] = [0]
+        # (keyword index, keyword length) of every keyword ending at a node,
+        # including those reachable through failure links.
+        self._out: typing.List[typing.List[typing.Tuple[int, int]]] = [[]]
+        self.max_length = 0
+
+        for index, keyword in enumerate(keywords):
+            if not keyword:
+                continue
+            node = 0
+            for char in keyword:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((index, len(keyword)))
+            self.max_length = max(self.max_length, len(keyword))
+
+        # Nodes at depth 1 fail back to the root, build the rest breadth-first.
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> typing.Iterator[typing.Tuple[int, int, int]]:
+        """Yield ``(keyword index, start, end)`` of every occurrence, ordered by end position."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for pos, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index, length in out[node]:
+                yield index, pos + 1 - length, pos + 1
+
+    def first(self, text: str) -> typing.Optional[typing.Tuple[int, int, int]]:
+        """
+        The first occurrence of the keyword listed first among those found in `text`.
+
+        Scanning stops early once the first keyword has been found.
+        """
+        best = None
+        for index, start, end in self.iter_matches(text):
+            # occurrences of the same keyword are yielded left to right
+            if best is None or index < best[0]:
+                best = (index, start, end)
+                if index == 0:
+                    break
+        return best
+
+
+class TriggerMatcher:
+    """
+    All auto triggers compiled into a single matcher.
+
+    In keyword mode, the lowercased keywords are searched for in one pass with
+    Aho-Corasick. In regex mode, every pattern is compiled once, and a literal that
+    each match of the pattern must contain is extracted from it. One Aho-Corasick
+    pass over the text finds the patterns whose literal is present, and only those
+    (plus the patterns without such a literal) are searched.
+
+    When several triggers match, the one defined first wins, as it did when the
+    triggers were tried one after another. The match reported for it is its
+    first one in the text.
+
+    Parameters
+    ----------
+    triggers : Iterable[str]
+        The trigger keywords or patterns, in definition order.
+    regex : bool
+        Whether the triggers are regular expressions.
+    """
+
+    def __init__(self, triggers: typing.Iterable[str], *, regex: bool):
+        self.triggers = list(triggers)
+        self.regex = regex
+        self._patterns: typing.Dict[int, typing.Pattern] = {}
+        self._literal_triggers: typing.List[typing.List[int]] = []
+        self._unfiltered: typing.List[int] = []
+
+        if regex:
+            self._automaton = self._compile_regex()
+        else:
+            self._automaton = AhoCorasick([t.lower() for t in self.triggers])
+
+    def __len__(self) -> int:
+        return len(self.triggers)
+
+    def _compile_regex(self) -> AhoCorasick:
+        literals: typing.Dict[str, int] = {}
+        for index, pattern in enumerate(self.triggers):
+            try:
+                self._patterns[index] = re.compile(pattern)
+            except re.error as e:
+                logger.warning("Autotrigger %r is not a valid regex and is ignored: %s", pattern, e)
+                continue
+
+            literal = required_literal(pattern)
+            if literal is None:
+                self._unfiltered.append(index)
+                continue
+            if literal not in literals:
+                literals[literal] = len(self._literal_triggers)
+                self._literal_triggers.append([])
+            self._literal_triggers[literals[literal]].append(index)
+
+        return AhoCorasick(list(literals))
+
+    def match(self, text: str) -> typing.Optional[TriggerMatch]:
+        """Find the trigger that matches `text`, if any."""
+        lowered = text.lower()
+        if not self.regex:
+            found = self._automaton.first(lowered)
+            if found is None:
+                return None
+            index, start, end = found
+            return TriggerMatch(self.triggers[index], start, end, lowered[start:end])
+
+        candidates = set(self._unfiltered)
+        for literal, _, _ in self._automaton.iter_matches(lowered):
+            candidates.update(self._literal_triggers[literal])
+
+        for index in sorted(candidates):
+            m = self._patterns[index].search(text)
+            if m is not None:
+                return TriggerMatch(self.triggers[index], m.start(), m.end(), m.group(0))
+        return None
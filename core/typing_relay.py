@@ -0,0 +1,96 @@
+import time
+import typing
+
+import discord
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+
+class TypingRelay:
+    """
+    Relays typing indicators between recipients and thread channels.
+
+    A typing indicator shown by Discord lasts about 10 seconds, so once one was
+    triggered for a source (a recipient's DM or a thread channel) further typing
+    events from that source are ignored until the indicator would have expired.
+    Suppressed events never look up the thread or make an HTTP request. Every
+    destination has its own cooldown as well, so several recipients of a group
+    thread typing at once only trigger the thread channel once. The relay never
+    touches the database: recipients are checked with `ModmailBot.check_blocked`
+    without updating the config.
+
+    Parameters
+    ----------
+    bot : ModmailBot
+        The Modmail bot.
+    cooldown : float
+        Seconds after a relayed indicator during which the same source is ignored.
+    """
+
+    def __init__(self, bot, *, cooldown: float = 9.5):
+        self.bot = bot
+        self.cooldown = cooldown
+        self._expires: typing.Dict[typing.Tuple[str, int], float] = {}
+
+        # counters
+        self.relayed = 0
+        self.suppressed = 0
+        self.blocked = 0
+        self.failed = 0
+
+    def _claim(self, key: typing.Tuple[str, int]) -> bool:
+        """Start the cooldown for `key`, or return `False` if it is still cooling down."""
+        now = time.monotonic()
+        if self._expires.get(key, 0) > now:
+            self.suppressed += 1
+            return False
+
+        if len(self._expires) > 1024:
+            self._expires = {k: v for k, v in self._expires.items() if v > now}
+        self._expires[key] = now + self.cooldown
+        return True
+
+    async def _trigger(self, kind: str, destination: typing.Union[discord.TextChannel, discord.User]) -> None:
+        if not self._claim((kind, destination.id)):
+            return
+        try:
+            await destination.typing()
+        except Exception:
+            self.failed += 1
+            logger.debug("Failed to trigger typing indicator in %s.", destination, exc_info=True)
+        else:
+            self.relayed += 1
+
+    async def from_recipient(self, user: discord.User) -> None:
+        """Show that a recipient is typing in their thread channel."""
+        if not self._claim(("dm", user.id)):
+            return
+
+        thread = await self.bot.threads.find(recipient=user)
+        if thread and thread.channel:
+            await self._trigger("to_channel", thread.channel)
+
+    async def from_staff(self, channel: discord.TextChannel) -> None:
+        """Show the recipients of a thread that staff are typing in its channel."""
+        if not self._claim(("thread", channel.id)):
+            return
+
+        thread = await self.bot.threads.find(channel=channel)
+        if thread is None or not thread.recipient:
+            return
+
+        for user in thread.recipients:
+            if self.bot.check_blocked(user, update=False):
+                self.blocked += 1
+                continue
+            await self._trigger("to_user", user)
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {
+            "relayed": self.relayed,
+            "suppressed": self.suppressed,
+            "blocked": self.blocked,
+            "failed": self.failed,
+        }
@@ -1,6 +1,7 @@
 import base64
 import functools
 import contextlib
+import hashlib
 import re
 import typing
 from datetime import datetime, timezone
@@ -22,6 +23,7 @@ __all__ = [
     "is_image_url",
     "parse_image_url",
     "human_join",
+    "human_size",
     "days",
     "cleanup_code",
     "parse_channel_topic",
@@ -32,6 +34,7 @@ __all__ = [
     "create_not_found_embed",
     "parse_alias",
     "normalize_alias",
+    "expand_alias",
     "format_description",
     "trigger_typing",
     "safe_typing",
@@ -46,6 +49,8 @@ __all__ = [
     "ConfirmThreadCreationView",
     "DummyParam",
     "extract_forwarded_content",
+    "random_channel_name",
+    "ChannelNameIndex",
 ]
 
 
@@ -207,6 +212,15 @@ def human_join(seq: typing.Sequence[str], delim: str = ", ", final: str = "or")
     return delim.join(seq[:-1]) + f" {final} {seq[-1]}"
 
 
+def human_size(size: float) -> str:
+    """Format a number of bytes with a binary unit, e.g. ``1.5 MiB``."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024 or unit == "GiB":
+            break
+        size /= 1024
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
 def days(day: typing.Union[str, int]) -> str:
     """
     Humanize the number of days.
@@ -403,7 +417,11 @@ def parse_alias(alias, *, split=True):
 
 
 def normalize_alias(alias, message=""):
-    aliases = parse_alias(alias)
+    return expand_alias(parse_alias(alias), message)
+
+
+def expand_alias(aliases, message=""):
+    """Like `normalize_alias`, but with the steps of the alias already parsed."""
     contents = parse_alias(message, split=False)
 
     final_aliases = []
@@ -743,3 +761,93 @@ class DummyParam:
     def __init__(self, name):
         self.name = name
         self.displayed_name = name
+
+
+@functools.lru_cache(maxsize=4096)
+def random_channel_name(secret: str, user_id: int) -> str:
+    """
+    The channel name used for a user when `use_random_channel_name` is enabled.
+
+    The name only depends on the bot token and the user ID, so it is memoized.
+    """
+    to_hash = secret + str(user_id)
+    return hashlib.md5(to_hash.encode("utf8"), usedforsecurity=False).hexdigest()[-8:]
+
+
+class ChannelNameIndex:
+    """
+    Counts the text channels of the Modmail guild by name.
+
+    The index is built from the guild's channel cache once and is then kept up
+    to date from channel create, update and delete events, so checking whether
+    a channel name is taken does not need to walk every channel in the guild.
+    """
+
+    def __init__(self):
+        self._guild_id: typing.Optional[int] = None
+        self._counts: typing.Dict[str, int] = {}
+        self._names: typing.Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def invalidate(self) -> None:
+        """Rebuild the index from the channel cache on next use."""
+        self._guild_id = None
+
+    def _ensure(self, guild: discord.Guild) -> None:
+        if self._guild_id == guild.id:
+            return
+        self._guild_id = guild.id
+        self._counts = {}
+        self._names = {}
+        for channel in guild.text_channels:
+            self._add(channel)
+
+    def _tracks(self, channel) -> bool:
+        return isinstance(channel, discord.TextChannel) and channel.guild.id == self._guild_id
+
+    def _add(self, channel: discord.TextChannel) -> None:
+        self._names[channel.id] = channel.name
+        self._counts[channel.name] = self._counts.get(channel.name, 0) + 1
+
+    def _discard(self, channel_id: int) -> None:
+        name = self._names.pop(channel_id, None)
+        if name is None:
+            return
+        count = self._counts.get(name, 0) - 1
+        if count > 0:
+            self._counts[name] = count
+        else:
+            self._counts.pop(name, None)
+
+    def channel_created(self, channel) -> None:
+        if self._tracks(channel):
+            self._discard(channel.id)
+            self._add(channel)
+
+    def channel_updated(self, channel) -> None:
+        if self._tracks(channel) and self._names.get(channel.id) != channel.name:
+            self._discard(channel.id)
+            self._add(channel)
+
+    def channel_deleted(self, channel) -> None:
+        if self._tracks(channel):
+            self._discard(channel.id)
+
+    def is_taken(self, guild: discord.Guild, name: str, exclude_channel=None) -> bool:
+        """Whether a text channel named `name` exists, ignoring `exclude_channel`."""
+        self._ensure(guild)
+        count = self._counts.get(name, 0)
+        if exclude_channel is not None and self._names.get(exclude_channel.id) == name:
+            count -= 1
+        return count > 0
+
+    def unique_name(self, guild: discord.Guild, name: str, exclude_channel=None) -> str:
+        """`name`, or `name_1`, `name_2`, ... if it is already used by another channel."""
+        new_name = name
+        counter = 1
+        while self.is_taken(guild, new_name, exclude_channel):
+            new_name = f"{name}_{counter}"  # multiple channels with same name
+            counter += 1
+        return new_name
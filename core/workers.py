@@ -0,0 +1,220 @@
+import asyncio
+import contextlib
+import time
+import typing
+from collections import deque
+from contextvars import ContextVar
+
+from core.models import getLogger, logging_context
+from core.tracing import activate, current_span, record_span
+
+logger = getLogger(__name__)
+
+
+class OverloadPolicy:
+    """What a `KeyedWorkerPool` does with new items once it is full."""
+
+    DEFER = "defer"  # wait until there is room again
+    REACT = "react"  # reject the item and let the submitter notify the author
+    DROP = "drop"  # silently reject the item
+
+    ALL = (DEFER, REACT, DROP)
+
+
+class _Slot:
+    """The concurrency slot of a `KeyedWorkerPool` held by the item being processed."""
+
+    __slots__ = ("pool", "task", "held")
+
+    def __init__(self, pool: "KeyedWorkerPool"):
+        self.pool = pool
+        self.task = asyncio.current_task()
+        self.held = True
+
+    def release(self) -> None:
+        self.held = False
+        self.pool._active -= 1
+        self.pool._waiting += 1
+        self.pool._running.release()
+
+    async def acquire(self) -> None:
+        try:
+            await self.pool._running.acquire()
+        finally:
+            self.pool._waiting -= 1
+        self.held = True
+        self.pool._active += 1
+
+
+_current_slot: ContextVar[typing.Optional[_Slot]] = ContextVar("worker_slot", default=None)
+
+
+@contextlib.asynccontextmanager
+async def blocking_wait():
+    """
+    Give up the slot of the `KeyedWorkerPool` item being processed while waiting.
+
+    Use it around waits that can take long and need no processing, e.g. for a user
+    to press a button, so that other keys can run meanwhile. Later items of the
+    same key still wait for this one. Outside of a pool handler this does nothing.
+    """
+    slot = _current_slot.get()
+    # tasks created by the handler inherit the variable, but not the slot
+    if slot is None or not slot.held or slot.task is not asyncio.current_task():
+        yield
+        return
+    slot.release()
+    try:
+        yield
+    finally:
+        await slot.acquire()
+
+
+class KeyedWorkerPool:
+    """
+    Processes items concurrently, but in order per key.
+
+    The items of a key (e.g. a DM author ID) are chained: a task that only lives
+    while the key has items handles them one after another, in the order they were
+    submitted. Items of different keys run in parallel, at most `workers` at a time.
+    A handler that waits for a long time should do so in `blocking_wait`, so that it
+    only holds up its own key.
+    The number of items queued or being processed is bounded by `limit`; once it
+    is reached, `submit` applies the overload policy.
+
+    Parameters
+    ----------
+    handler : Callable[[Any], Awaitable[None]]
+        Awaited with every submitted item.
+    workers : int
+        Maximum number of items processed at the same time.
+    limit : int
+        Maximum number of items in flight.
+    name : str
+        Used in log messages.
+    """
+
+    def __init__(
+        self,
+        handler: typing.Callable[[typing.Any], typing.Awaitable[None]],
+        *,
+        workers: int,
+        limit: int,
+        name: str,
+    ):
+        self.handler = handler
+        self.name = name
+        self.workers = max(1, workers)
+        self.limit = max(1, limit)
+        self._slots = asyncio.Semaphore(self.limit)
+        self._running = asyncio.Semaphore(self.workers)
+        # key -> items not started yet, and the task processing them
+        self._pending: typing.Dict[int, typing.Deque[typing.Tuple[float, typing.Any, typing.Any]]] = {}
+        self._tasks: typing.Dict[int, asyncio.Task] = {}
+        self._in_flight = 0
+        self._active = 0
+        self._waiting = 0  # items in `blocking_wait`
+        self._overloaded = False
+
+        # metrics
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.deferred = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def __len__(self) -> int:
+        """Number of items in flight."""
+        return self._in_flight
+
+    def stop(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._pending.clear()
+
+    async def submit(self, key: int, item: typing.Any, *, policy: str = OverloadPolicy.DEFER) -> bool:
+        """
+        Queue an item after the other items of `key`.
+
+        Returns
+        -------
+        bool
+            `False` if the pool was full and the item was rejected by the policy.
+        """
+        if self._slots.locked():
+            if not self._overloaded:
+                # Only log once per overload, a raid would flood the log otherwise.
+                logger.warning(
+                    "%s pool is full (%d in flight), applying the %s policy.", self.name, len(self), policy
+                )
+                self._overloaded = True
+            if policy != OverloadPolicy.DEFER:
+                self.rejected += 1
+                return False
+            self.deferred += 1
+        else:
+            self._overloaded = False
+
+        await self._slots.acquire()
+        self._in_flight += 1
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = deque()
+            self._tasks[key] = asyncio.create_task(self._process(key, pending), name=f"{self.name}-{key}")
+        # the current span, if the item is traced, continues in the key's task
+        pending.append((time.perf_counter(), current_span.get(), item))
+        return True
+
+    async def _process(self, key: int, pending: typing.Deque) -> None:
+        try:
+            while pending:
+                await self._running.acquire()
+                slot = _Slot(self)
+                enqueued_at, span, item = pending.popleft()
+                started_at = time.perf_counter()
+                wait = started_at - enqueued_at
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                self._active += 1
+                token = _current_slot.set(slot)
+                try:
+                    # Resets anything the handler adds to the log context once it is done.
+                    with logging_context(worker=self.name, worker_key=key), activate(span, finish=True):
+                        record_span("queue_wait", enqueued_at, started_at)
+                        await self.handler(item)
+                except Exception:
+                    self.failed += 1
+                    logger.error("Error processing %s item:", self.name, exc_info=True)
+                finally:
+                    _current_slot.reset(token)
+                    if slot.held:
+                        self._active -= 1
+                        self._running.release()
+                    self.processed += 1
+                    self._in_flight -= 1
+                    self._slots.release()
+        finally:
+            # nothing can be submitted between the last check of `pending` and here
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+                del self._tasks[key]
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        """A snapshot of the pool metrics."""
+        return {
+            "workers": self.workers,
+            "limit": self.limit,
+            "in_flight": len(self),
+            "active": self._active,
+            "waiting": self._waiting,
+            "queued": len(self) - self._active - self._waiting,
+            "keys": len(self._pending),
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "deferred": self.deferred,
+            "avg_wait": self.total_wait / self.processed if self.processed else 0.0,
+            "max_wait": self.max_wait,
+        }
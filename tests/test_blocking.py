@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+from benchmarks.fakes import OfflineModmail
+
+
+def run_with_thread(test):
+    async def main():
+        env = await OfflineModmail.create(4)
+        try:
+            await test(env, next(iter(env.bot.threads)))
+        finally:
+            await env.close()
+
+    asyncio.run(main())
+
+
+def typing_requests(env):
+    return env.http.requests["POST /channels/{channel_id}/typing"]
+
+
+def test_expired_temporary_block_does_not_suppress_typing():
+    async def test(env, thread):
+        bot = env.bot
+        user_id = str(thread.id)
+        reason = f"Spam until <t:{int(time.time()) - 60}:f>."
+        bot.blocked_users[user_id] = reason
+
+        assert not bot.check_blocked(thread.recipient, update=False)
+        assert bot.blocked_users[user_id] == reason
+
+        await bot.typing_relay.from_staff(thread.channel)
+        assert bot.typing_relay.blocked == 0
+        assert typing_requests(env) == 1
+
+        assert not await bot.is_blocked(thread.recipient)
+        assert user_id not in bot.blocked_users
+
+    run_with_thread(test)
+
+
+def test_active_temporary_block_suppresses_typing():
+    async def test(env, thread):
+        bot = env.bot
+        bot.blocked_users[str(thread.id)] = f"Spam until <t:{int(time.time()) + 3600}:f>."
+
+        await bot.typing_relay.from_staff(thread.channel)
+        assert bot.typing_relay.blocked == 1
+        assert typing_requests(env) == 0
+        assert await bot.is_blocked(thread.recipient)
+
+    run_with_thread(test)
+
+
+def test_account_age_suppresses_typing_without_blocking():
+    async def test(env, thread):
+        bot = env.bot
+        bot.config["account_age"] = "P10000D"
+
+        assert bot.check_blocked(thread.recipient, update=False)
+        assert str(thread.id) not in bot.blocked_users
+
+        await bot.typing_relay.from_staff(thread.channel)
+        assert bot.typing_relay.blocked == 1
+        assert typing_requests(env) == 0
+
+        assert await bot.is_blocked(thread.recipient)
+        assert bot.blocked_users[str(thread.id)].startswith("System Message: New Account.")
+
+    run_with_thread(test)
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from core.clients import ApiCall, InstrumentedApiClient, QueryStats, payload_size
+
+
+class SlowClient:
+    async def get_log(self, channel_id):
+        await asyncio.sleep(10)
+
+    async def delete_log_entry(self, key):
+        raise KeyError(key)
+
+
+def test_cancelled_calls_are_not_recorded():
+    calls = []
+    api = InstrumentedApiClient(SlowClient(), calls.append)
+
+    async def main():
+        task = asyncio.create_task(api.get_log(1))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        with pytest.raises(KeyError):
+            await api.delete_log_entry("abc")
+
+    asyncio.run(main())
+    assert [(call.method, type(call.error)) for call in calls] == [("delete_log_entry", KeyError)]
+
+
+def test_shapes_are_sampled():
+    stats = QueryStats(slow_threshold=0.5)
+    fast = ApiCall("get_log", ("1",), {}, 0.001, {}, None)
+    for _ in range(QueryStats.SAMPLE_EVERY * 2):
+        stats.record(fast)
+    stats.record(ApiCall("get_log", ("1",), {}, 1.0, {}, None))
+
+    method = stats.methods["get_log"]
+    assert method["calls"] == QueryStats.SAMPLE_EVERY * 2 + 1
+    assert method["sampled"] == 3  # the first of each batch, and the slow call
+    assert stats.slowest() == [("get_log(?)", 3, pytest.approx(1.002 / 3), 1.0)]
+
+
+def test_payload_size_extrapolates_large_containers():
+    small = {str(i): "x" * 10 for i in range(10)}
+    assert payload_size(small) == sum(len(k) + 10 for k in small)
+    large = {f"{i:04}": "x" * 10 for i in range(1000)}
+    assert payload_size(large) == 14 * 1000
+    # containers nested deeper than four levels are not counted
+    assert payload_size({"a": {"b": {"c": {"d": {"e": "deep"}}}}}) == 4
@@ -0,0 +1,36 @@
+import asyncio
+import logging
+
+from core.metrics import Counter, RateLimitHandler
+
+ROUTE = "We are being rate limited. %s %s responded with 429. Retrying in %.2f seconds."
+GLOBAL = "Global rate limit has been hit. Retrying in %.2f seconds."
+WEBHOOK = "Webhook ID %s is rate limited. Retrying in %.2f seconds."
+
+
+def test_rate_limits_are_counted_once_per_429():
+    async def main():
+        counter = Counter("rate_limits", "Rate limits.", ["scope"])
+        handler = RateLimitHandler(counter)
+        http = logging.getLogger("discord.http")
+        webhook = logging.getLogger("discord.webhook.async_")
+        http.addHandler(handler)
+        webhook.addHandler(handler)
+        try:
+            # discord.py logs a global rate limit as a route one first
+            http.warning(ROUTE, "POST", "/channels/1/messages", 1.0)
+            http.warning(GLOBAL, 1.0)
+            http.warning(ROUTE, "POST", "/channels/1/messages", 1.0)
+            await asyncio.sleep(0)
+            http.warning(ROUTE, "POST", "/channels/1/messages", 1.0)
+            webhook.warning(WEBHOOK, 1, 1.0)
+            await asyncio.sleep(0)
+        finally:
+            http.removeHandler(handler)
+            webhook.removeHandler(handler)
+
+        assert counter.get(scope="global") == 1
+        assert counter.get(scope="route") == 2
+        assert counter.get(scope="webhook") == 1
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import asyncio
+
+from benchmarks.fakes import OfflineModmail
+from core.thread import Thread
+
+
+def test_alias_step_after_close_does_not_reply(monkeypatch):
+    replies = []
+
+    async def reply(self, message, *args, **kwargs):
+        replies.append(message.content)
+
+    monkeypatch.setattr(Thread, "reply", reply)
+
+    async def main():
+        env = await OfflineModmail.create(10, aliases={"closereply": "close && reply Bye"})
+        bot = env.bot
+        try:
+            bot.config["owners"] = str(env.moderator.id)
+            bot.config["log_channel_id"] = str(bot.modmail_guild.text_channels[-1].id)
+            errors = []
+
+            async def on_command_error(ctx, error):
+                errors.append(ctx.command.name)
+
+            bot.add_listener(on_command_error)
+
+            thread = next(iter(bot.threads))
+            message = env.channel_message(thread.channel, env.moderator, "?closereply")
+            route = await bot.route_message(message)
+            assert [ctx.command.name for ctx in route.contexts] == ["close", "reply"]
+
+            await bot.process_commands(message, route=route)
+            assert bot.get_channel(thread.channel.id) is None
+            await asyncio.sleep(0.05)  # error listeners run in tasks of their own
+            assert replies == []
+            assert errors == ["reply"]
+        finally:
+            await env.close()
+
+    asyncio.run(main())
+
+
+def test_alias_steps_share_an_open_thread(monkeypatch):
+    replies = []
+
+    async def reply(self, message, *args, **kwargs):
+        replies.append((self.id, message.content))
+
+    monkeypatch.setattr(Thread, "reply", reply)
+
+    async def main():
+        env = await OfflineModmail.create(10, aliases={"twice": "reply One && reply Two"})
+        bot = env.bot
+        try:
+            bot.config["owners"] = str(env.moderator.id)
+            thread = next(iter(bot.threads))
+            message = env.channel_message(thread.channel, env.moderator, "?twice")
+            await bot.process_commands(message)
+            assert [thread_id for thread_id, _ in replies] == [thread.id, thread.id]
+        finally:
+            await env.close()
+
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+import re
+
+from core.triggers import TriggerMatcher
+
+
+def first_defined(triggers, text, *, regex):
+    """The trigger the per-trigger scan of previous versions picked."""
+    if regex:
+        return next((t for t in triggers if re.search(t, text)), None)
+    return next((t for t in triggers if t.lower() in text.lower()), None)
+
+
+def test_keyword_first_defined_wins():
+    matcher = TriggerMatcher(["billing", "hi"], regex=False)
+    match = matcher.match("billing hi, my invoice is wrong")
+    assert match.trigger == "billing"
+    assert (match.start, match.end, match.text) == (0, 7, "billing")
+
+
+def test_keyword_position_of_later_match():
+    matcher = TriggerMatcher(["refund", "hello"], regex=False)
+    match = matcher.match("Hello there, I want a REFUND")
+    assert match.trigger == "refund"
+    assert (match.start, match.text) == (22, "refund")
+
+
+def test_keyword_no_match():
+    assert TriggerMatcher(["billing"], regex=False).match("hello") is None
+
+
+def test_regex_first_defined_wins():
+    matcher = TriggerMatcher([r"bill(ing)?", r"h[iey]"], regex=True)
+    match = matcher.match("hey, billing question")
+    assert match.trigger == r"bill(ing)?"
+    assert (match.start, match.end, match.text) == (5, 12, "billing")
+
+
+def test_regex_unfiltered_pattern_keeps_its_priority():
+    # no required literal, so this one is searched without the prefilter
+    matcher = TriggerMatcher([r"\d{4}", r"order"], regex=True)
+    assert matcher.match("order 1234").trigger == r"\d{4}"
+
+
+def test_matches_per_trigger_scan():
+    triggers = ["ban", "appeal", "ban appeal", "a", "help"]
+    texts = ["I want to appeal my ban", "help", "nothing", "ban appeal please", "BAN"]
+    matcher = TriggerMatcher(triggers, regex=False)
+    for text in texts:
+        match = matcher.match(text)
+        assert (match and match.trigger) == first_defined(triggers, text, regex=False)
+
+    patterns = [r"ap+eal", r"b[a4]n", r"(?i)help", r"\w+"]
+    matcher = TriggerMatcher(patterns, regex=True)
+    for text in texts + ["HELP", "b4n"]:
+        match = matcher.match(text)
+        assert (match and match.trigger) == first_defined(patterns, text, regex=True)
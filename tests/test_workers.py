@@ -0,0 +1,170 @@
+import asyncio
+import json
+import logging
+
+from core.models import JsonFormatter, log_context
+from core.workers import KeyedWorkerPool, OverloadPolicy, blocking_wait
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 5))
+
+
+async def drain(pool):
+    while len(pool):
+        await asyncio.sleep(0)
+
+
+def test_items_of_a_key_run_in_order():
+    async def main():
+        seen = []
+
+        async def handler(item):
+            key, n = item
+            await asyncio.sleep(0.001 * (5 - n))
+            seen.append(item)
+
+        pool = KeyedWorkerPool(handler, workers=4, limit=100, name="test")
+        for n in range(5):
+            for key in (1, 2, 3):
+                await pool.submit(key, (key, n))
+        await drain(pool)
+        for key in (1, 2, 3):
+            assert [n for k, n in seen if k == key] == list(range(5))
+        assert pool.stats()["processed"] == 15
+        assert pool.stats()["keys"] == 0
+
+    run(main())
+
+
+def test_waiting_keys_do_not_hold_up_others():
+    async def main():
+        release = asyncio.Event()
+        done = []
+
+        async def handler(item):
+            if item.startswith("slow"):
+                async with blocking_wait():
+                    await release.wait()
+            done.append(item)
+
+        pool = KeyedWorkerPool(handler, workers=2, limit=100, name="test")
+        # more waiting keys than workers
+        for key in range(1, 6):
+            await pool.submit(key, f"slow {key}")
+        await pool.submit(1, "after slow 1")
+        await pool.submit(6, "fast")
+        while "fast" not in done:
+            await asyncio.sleep(0)
+        assert done == ["fast"]
+        assert pool.stats()["waiting"] == 5
+
+        release.set()
+        await drain(pool)
+        assert done.index("after slow 1") > done.index("slow 1")
+        assert pool.stats()["waiting"] == 0 and pool.stats()["active"] == 0
+
+    run(main())
+
+
+def test_waiting_still_counts_towards_the_limit():
+    async def main():
+        release = asyncio.Event()
+
+        async def handler(item):
+            async with blocking_wait():
+                await release.wait()
+
+        pool = KeyedWorkerPool(handler, workers=1, limit=2, name="test")
+        await pool.submit(1, 1)
+        await pool.submit(2, 2)
+        assert not await pool.submit(3, 3, policy=OverloadPolicy.DROP)
+        release.set()
+        await drain(pool)
+
+    run(main())
+
+
+def test_blocking_wait_outside_a_pool():
+    async def main():
+        async with blocking_wait():
+            await asyncio.sleep(0)
+
+    run(main())
+
+
+def test_log_context_has_worker_and_key():
+    async def main():
+        contexts = []
+
+        async def handler(item):
+            record = logging.LogRecord("test", logging.INFO, __file__, 0, "relayed", (), None)
+            contexts.append(json.loads(JsonFormatter().format(record))["context"])
+
+        pool = KeyedWorkerPool(handler, workers=2, limit=10, name="DM")
+        await pool.submit(42, 1)
+        await drain(pool)
+        assert contexts == [{"worker": "DM", "worker_key": 42}]
+        assert log_context.get() == {}
+
+    run(main())
+
+
+def test_concurrency_is_capped():
+    async def main():
+        active = peak = 0
+
+        async def handler(item):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.001)
+            active -= 1
+
+        pool = KeyedWorkerPool(handler, workers=3, limit=100, name="test")
+        for key in range(20):
+            await pool.submit(key, key)
+        await drain(pool)
+        assert peak == 3
+
+    run(main())
+
+
+def test_overload_policies():
+    async def main():
+        release = asyncio.Event()
+
+        async def handler(item):
+            await release.wait()
+
+        pool = KeyedWorkerPool(handler, workers=1, limit=2, name="test")
+        assert await pool.submit(1, 1)
+        assert await pool.submit(2, 2)
+        assert not await pool.submit(3, 3, policy=OverloadPolicy.REACT)
+        assert not await pool.submit(3, 3, policy=OverloadPolicy.DROP)
+        deferred = asyncio.create_task(pool.submit(3, 3))
+        await asyncio.sleep(0.01)
+        assert not deferred.done()
+        assert pool.stats()["queued"] == 1 and pool.stats()["active"] == 1
+
+        release.set()
+        assert await deferred
+        await drain(pool)
+        stats = pool.stats()
+        assert (stats["processed"], stats["rejected"], stats["deferred"]) == (3, 2, 1)
+
+    run(main())
+
+
+def test_handler_errors_are_counted():
+    async def main():
+        async def handler(item):
+            raise ValueError(item)
+
+        pool = KeyedWorkerPool(handler, workers=1, limit=10, name="test")
+        await pool.submit(1, 1)
+        await pool.submit(1, 2)
+        await drain(pool)
+        assert pool.stats()["failed"] == 2
+
+    run(main())